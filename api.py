@@ -1,38 +1,185 @@
 import flask
 import flask.scaffold
 import json
+import mimetypes
+import signal
+import sys
+import time
 import webbrowser
-from flask_restful import reqparse, Api, Resource
+from flask_restful import inputs, reqparse, Api, Resource
+from werkzeug.utils import safe_join
+from werkzeug.wsgi import wrap_file
 from crux_processor import video_per_second as vps
+from crux_processor import catalog, events, jobs, metrics, profiling, static_assets
 import os
 
 flask.helpers._endpoint_from_view_func = flask.scaffold._endpoint_from_view_func
 
-# Instantiate Stream
-vps_request_stream = vps.Stream()
-
-# Instantiate MultithreadRun with the Stream instance
-vps_multi = vps.MultithreadRun(stream_instance=vps_request_stream)
-
 # Instantiate RequestUiSearch
 vps_request_search = vps.RequestUiSearch()
 
+# Set by start_services() in server processes only. corpus_search's spawned workers
+# import this module as __mp_main__, and must not claim jobs, poll events or write metrics.
+vps_request_stream = None
+vps_multi = None
+video_catalog = None
+job_scheduler = None
+
+
+def run_processing_job(job):
+    # Publish the job's messages on its own channel; /stream subscribers on "all" still see them.
+    # job.options holds per-job RequestSpeech settings such as profile=True. Every write of
+    # job state goes through the job's lease, so the job stops if it is requeued elsewhere.
+    return vps_multi.processSpeech(
+        job.video_name,
+        progress_callback=job.update_progress,
+        stream_instance=vps_request_stream.channel(job.id),
+        job_lease=job,
+        **job.options
+    )
+
+
+def runs_alone(job):
+    # tracemalloc is process-wide: a profiled job shares its process with no other job
+    return bool(job.options.get("profile"))
+
+
+# Process videos on a bounded worker pool so /api/Process returns immediately. The queue
+# is shared through jobs.DEFAULT_STORE_PATH, so each server process runs process_workers
+# jobs at most and any process can report on any job. The pool starts in start_services().
+process_workers = int(os.environ.get("VIDSCRIBE_PROCESS_WORKERS", 2))
+process_queue_depth = int(os.environ.get("VIDSCRIBE_PROCESS_QUEUE_DEPTH", 16))
+drain_timeout = float(os.environ.get("VIDSCRIBE_DRAIN_TIMEOUT", 300))
+
+
+def start_services():
+    """
+    Starts this server process's event poller, job scheduler and metrics writer, and
+    opens the video catalog. Called by the entry points (__main__ below and gunicorn's
+    post_worker_init), never at import.
+    """
+    global vps_request_stream, vps_multi, video_catalog, job_scheduler
+    if job_scheduler is not None:
+        return
+    # Job progress events go through a local SQLite table, so a client connected to any
+    # server process sees the events of jobs running in every process
+    vps_request_stream = events.SharedEventBroker(events.DEFAULT_EVENTS_PATH)
+    vps_multi = vps.MultithreadRun(stream_instance=vps_request_stream)
+    # The video library; imports videoConfig.json the first time
+    video_catalog = catalog.open_catalog()
+    job_scheduler = jobs.JobScheduler(run_processing_job, max_workers=process_workers, max_queue=process_queue_depth,
+                                      runs_alone=runs_alone)
+    # Each process publishes its metrics snapshot for /metrics, whichever process serves it
+    metrics.REGISTRY.add_collector(lambda: metrics.SSE_SUBSCRIBERS.set(vps_request_stream.subscriber_count()))
+    metrics.REGISTRY.autosave()
+
+
+def shutdown(timeout=drain_timeout):
+    """
+    Graceful stop for this process: ends open event streams, stops taking jobs and waits
+    up to timeout seconds for running ones. Jobs that outlast it are requeued and resume
+    from their checkpoint in another process. Returns the number requeued.
+    """
+    if job_scheduler is None:
+        return 0
+    vps_request_stream.close()
+    requeued = job_scheduler.shutdown(timeout)
+    metrics.REGISTRY.write_snapshot()
+    return requeued
+
+
+class VidscribeFlask(flask.Flask):
+    """
+    Serves public/ with precompressed variants and a cache policy: HTML pages are
+    revalidated on every load and reference their assets by content hash, so those
+    assets can be cached as immutable; results JSON gets a short TTL plus ETag.
+    """
+
+    def send_static_file(self, filename):
+        path = safe_join(self.static_folder, filename)
+        if path is None or not os.path.isfile(path) or static_assets.is_private(self.static_folder, path):
+            flask.abort(404)
+        request = flask.request
+        if filename.endswith('.html'):
+            with open(path, 'r', encoding='utf-8') as f:
+                response = flask.make_response(asset_versions.stamp_html(f.read()))
+            response.cache_control.no_cache = True
+            response.add_etag()
+            return response.make_conditional(request)
+
+        version = request.args.get('v')
+        versioned = version is not None and version == asset_versions.version(filename)
+        send_path, encoding = static_assets.pick_variant(path, request.accept_encodings)
+        response = flask.send_file(
+            send_path, mimetype=mimetypes.guess_type(path)[0] or 'application/octet-stream',
+            download_name=os.path.basename(path), conditional=True, etag=True,
+            max_age=static_assets.cache_max_age(filename, versioned)
+        )
+        if versioned:
+            response.cache_control.immutable = True
+        if encoding:
+            response.content_encoding = encoding
+        if encoding or static_assets.has_variants(path):
+            response.vary.add('Accept-Encoding')
+        return response
+
+
 port = 4000
 static_folder = 'public'
 url = f"http://localhost:{port}/{static_folder}"
-app = flask.Flask(__name__, static_folder=static_folder)
+app = VidscribeFlask(__name__, static_folder=static_folder)
+asset_versions = static_assets.AssetVersions(app.static_folder)
+# Behind nginx/Apache, let the proxy send video files itself (X-Sendfile) instead of the app
+app.config['USE_X_SENDFILE'] = os.environ.get("VIDSCRIBE_X_SENDFILE") == "1"
 api = Api(app)
 
 
 @app.route('/stream')
 def stream():
-    return flask.Response(vps_request_stream.event_stream(),
-                          mimetype="text/event-stream")
+    # Optional ?channel=<job_id>; EventSource resends Last-Event-ID when it reconnects
+    channel = flask.request.args.get('channel', events.ALL_CHANNELS)
+    last_event_id = flask.request.headers.get('Last-Event-ID', flask.request.args.get('lastEventId'))
+    try:
+        last_event_id = int(last_event_id) if last_event_id is not None else None
+    except ValueError:
+        last_event_id = None
+    return flask.Response(vps_request_stream.event_stream(channel, last_event_id),
+                          mimetype="text/event-stream",
+                          headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@app.route('/public/js/videoConfig.js')
+def video_config_js():
+    # The UI's slot globals (var VIDEO1 = "<name>";), rendered from the catalog
+    js = "".join(f"var {slot} = {json.dumps(name)};\n" for slot, name in video_catalog.slots().items())
+    response = flask.make_response(js)
+    response.mimetype = "application/javascript"
+    response.cache_control.no_cache = True
+    response.add_etag()
+    return response.make_conditional(flask.request)
+
+
+@app.route('/metrics')
+def prometheus_metrics():
+    # Totals across every server process, in the Prometheus text format
+    response = flask.make_response(metrics.render(metrics.REGISTRY.collect()))
+    response.headers['Content-Type'] = metrics.CONTENT_TYPE
+    return response
+
+
+@app.before_request
+def start_timer():
+    flask.g.request_start = time.perf_counter()
 
 
 # Allow CORS for all domains (for demo purposes)
 @app.after_request
 def after_request(response):
+    if 'request_start' in flask.g:
+        # Labelled by route pattern, so /api/Jobs/<job_id> is one series
+        rule = flask.request.url_rule.rule if flask.request.url_rule else "unmatched"
+        metrics.HTTP_SECONDS.observe(time.perf_counter() - flask.g.request_start,
+                                     endpoint=rule, method=flask.request.method)
     response.headers.add('Access-Control-Allow-Origin', '*')
     response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
     response.headers.add('Access-Control-Allow-Methods', 'GET,PUT,POST,DELETE')
@@ -49,6 +196,8 @@ parser.add_argument('v1', type=str, location='form')
 parser.add_argument('v2', type=str, location='form')
 parser.add_argument('v3', type=str, location='form')
 parser.add_argument('word1', type=str, location='form')
+parser.add_argument('detail', type=str, location='form')
+parser.add_argument('profile', type=inputs.boolean, location='form', default=False)
 
 
 class Process(Resource):
@@ -62,14 +211,58 @@ class Process(Resource):
         if not video_name:
             return {"error": "No video name provided."}, 400
 
-        # Start processing in a separate thread
-        vps_multi.processSpeech(video_name)
-
+        # Queue processing on the job scheduler; duplicates join the active job
+        options = {"profile": True} if args123.get('profile') else None
+        try:
+            job, created = job_scheduler.submit(video_name, options)
+        except jobs.QueueFullError as e:
+            return {"error": str(e)}, 503
+        if created:
+            # A worker may already have claimed the job; the catalog keeps its later state then
+            video_catalog.set_processing(video_name, catalog.QUEUED, job_id=job.id)
+
+        job_status = job.to_dict()
         return {
-            "status": "completed",
-            "message": f"{video_name} speech processing completed.",
-            "video_name": video_name
-        }, 201
+            "status": job_status["status"],
+            "job_id": job.id,
+            "message": f"{video_name} speech processing {'queued' if created else 'already in progress'}.",
+            "video_name": video_name,
+            "profile": bool(job.options.get("profile"))
+        }, 202
+
+
+class Jobs(Resource):
+
+    def get(self, job_id=None):
+        if job_id is None:
+            return {
+                "queue_depth": job_scheduler.queue_depth(),
+                "jobs": [job.to_dict() for job in job_scheduler.list()]
+            }
+        job = job_scheduler.get(job_id)
+        if job is None:
+            return {"error": "Job not found."}, 404
+        return job.to_dict()
+
+
+# Catalog listing arguments (query parameters)
+videos_parser = reqparse.RequestParser()
+videos_parser.add_argument('page', type=int, location='args', default=1)
+videos_parser.add_argument('page_size', type=int, location='args', default=50)
+videos_parser.add_argument('status', type=str, location='args')
+videos_parser.add_argument('q', type=str, location='args')
+
+
+class Videos(Resource):
+
+    def get(self, name=None):
+        if name is None:
+            args = videos_parser.parse_args()
+            return video_catalog.list_videos(args['page'], args['page_size'], args['status'], args['q'])
+        video = video_catalog.get_video(name)
+        if video is None:
+            return {"error": "Video not found."}, 404
+        return video
 
 
 class SearchList(Resource):
@@ -86,10 +279,65 @@ class SearchList(Resource):
         if not ui_search_input or not all(video_set.values()):
             return {"error": "Invalid search input or video set."}, 400
 
+        # detail=1 returns every matched term per clip instead of the search UI's format
+        if args.get('detail') in ('1', 'true'):
+            return vps_request_search.find_matches(ui_search_input, video_set), 201
         video_clean_words = vps_request_search.uiSearch(ui_search_input, video_set)
         return video_clean_words, 201
 
 
+# Corpus search arguments are accepted as query parameters (GET) or form fields (POST)
+search_parser = reqparse.RequestParser()
+search_parser.add_argument('q', type=str, location=('args', 'form'))
+search_parser.add_argument('videos', type=str, location=('args', 'form'), default='all')
+search_parser.add_argument('page', type=int, location=('args', 'form'), default=1)
+search_parser.add_argument('page_size', type=int, location=('args', 'form'), default=50)
+
+
+class CorpusSearch(Resource):
+
+    def search(self):
+        args = search_parser.parse_args()
+        if not args.get('q'):
+            return {"error": "No search terms provided."}, 400
+        # "all" searches every transcript; otherwise a comma-separated list of video names
+        videos = args['videos']
+        if videos != 'all':
+            videos = [video.strip() for video in videos.split(',') if video.strip()]
+        return vps_request_search.corpus_search(args['q'], videos, args['page'], args['page_size'])
+
+    def get(self):
+        return self.search()
+
+    def post(self):
+        return self.search()
+
+
+# Profile listing arguments (query parameters)
+profiles_parser = reqparse.RequestParser()
+profiles_parser.add_argument('video', type=str, location='args')
+
+
+class Profiles(Resource):
+
+    def get(self, profile_id=None, file_name=None):
+        # /api/Profiles lists, /api/Profiles/<id> describes, /api/Profiles/<id>/<file> downloads
+        if profile_id is None:
+            return {"profiles": profiling.list_profiles(vps.RequestSpeech.profile_dir,
+                                                        profiles_parser.parse_args().get('video'))}
+        path = profiling.profile_file(vps.RequestSpeech.profile_dir, profile_id, file_name or "profile.json")
+        if path is None:
+            return {"error": "Profile not found."}, 404
+        if file_name is None:
+            with open(path) as f:
+                profile = json.load(f)
+            profile["files"] = [name for name in profiling.PROFILE_FILES
+                                if profiling.profile_file(vps.RequestSpeech.profile_dir, profile_id, name)]
+            return profile
+        # Profiles are written relative to the working directory, like results-json
+        return flask.send_file(os.path.abspath(path), as_attachment=True, download_name=f"{profile_id}-{file_name}")
+
+
 class Root(Resource):
 
     def get(self):
@@ -102,13 +350,59 @@ class SearchUI(Resource):
         return app.send_static_file('searchui.html')
 
 
+class RangeFile(object):
+    """
+    A file read from its current position up to length bytes. fileno() and tell() reach
+    the file itself, so sendfile-capable servers still send the range zero-copy.
+    """
+
+    def __init__(self, f, length):
+        self.file = f
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size is None or size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size) if size else b''
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def tell(self):
+        return self.file.tell()
+
+    def close(self):
+        self.file.close()
+
+
+def send_media(path):
+    """
+    Sends a media file with byte-range (206), ETag/Last-Modified and 304 support, so
+    players can start and seek without downloading the whole file. Responses go out
+    through the server's wsgi.file_wrapper, which sendfile-capable servers (gunicorn,
+    waitress, ...) transmit zero-copy.
+    """
+    response = flask.send_file(path, conditional=True, etag=True)
+    file_wrapper = flask.request.environ.get('wsgi.file_wrapper')
+    if response.status_code == 206 and file_wrapper is not None and not app.config['USE_X_SENDFILE']:
+        # Werkzeug copies ranges through Python; hand the server the file positioned at
+        # the range start instead, bounded to the range for servers that read it to the end
+        content_range = response.content_range
+        response.response.close()
+        f = open(path, 'rb')
+        f.seek(content_range.start)
+        response.response = wrap_file(flask.request.environ, RangeFile(f, content_range.stop - content_range.start))
+    return response
+
+
 class VideosStarter(Resource):
 
     def get(self, video):
-        print(f"Serving video: {video}")
         video_path = os.path.join(app.static_folder, 'videos', video)
         if os.path.isfile(video_path):
-            return app.send_static_file(os.path.join('videos', video))
+            return send_media(video_path)
         else:
             return {"error": "Video not found."}, 404
 
@@ -116,6 +410,11 @@ class VideosStarter(Resource):
 # Set up the API resource routing
 api.add_resource(Process, '/api/Process')
 api.add_resource(SearchList, '/api/Words')
+api.add_resource(CorpusSearch, '/api/Search')
+api.add_resource(Jobs, '/api/Jobs', '/api/Jobs/<string:job_id>')
+api.add_resource(Videos, '/api/Videos', '/api/Videos/<string:name>')
+api.add_resource(Profiles, '/api/Profiles', '/api/Profiles/<string:profile_id>',
+                 '/api/Profiles/<string:profile_id>/<string:file_name>')
 
 # Static Pages/files
 api.add_resource(VideosStarter, '/api/Video/starter/<string:video>')
@@ -123,6 +422,15 @@ api.add_resource(Root, '/public/')
 api.add_resource(SearchUI, '/public/search')
 
 if __name__ == '__main__':
+    start_services()
+    # Refresh precompressed variants of any static files edited since the last build
+    static_assets.build(app.static_folder)
     # Open the URL in the default web browser
     webbrowser.open_new(url)
-    app.run(port=port, debug=False, threaded=True)
+    # Single-process development server; see gunicorn.conf.py for the multi-process one
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        app.run(port=port, debug=False, threaded=True)
+    finally:
+        print("Shutting down: waiting for running jobs...")
+        shutdown()
@@ -0,0 +1,69 @@
+"""
+Compares sequential and concurrent multi-URL downloads in download_video.download_multiple_videos.
+
+Generates parts of different lengths with ffmpeg, serves them from the throttled local
+HTTP server of tests/test_download.py (a stand-in for a remote host's per-connection
+bandwidth), then downloads them with 1 worker and with --workers workers. Correctness
+(part order, failed parts, audio-only mode) is covered by the tests.
+
+Usage:
+    python benchmarks/bench_download.py --parts 6 --workers 4 --kbps 2000
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import download_video
+from tests.test_download import make_part, serve
+
+
+def timed_download(urls, name, workers):
+    start = time.perf_counter()
+    info = download_video.download_multiple_videos(urls, name, workers=workers)
+    return info, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time sequential vs concurrent multi-part downloads.')
+    parser.add_argument('--parts', type=int, default=6, help='Number of parts')
+    parser.add_argument('--workers', type=int, default=4, help='Concurrent downloads to compare against 1')
+    parser.add_argument('--kbps', type=int, default=2000, help='Per-connection bandwidth of the test server')
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="bench-download-")
+    serve_dir = os.path.join(work_dir, "serve")
+    os.makedirs(serve_dir)
+    lengths = [4 + 2 * n for n in range(args.parts)]
+    for n, seconds in enumerate(lengths):
+        make_part(os.path.join(serve_dir, f"part{n}.mp4"), seconds)
+    server = serve(serve_dir, args.kbps * 1000 // 8)
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    urls = [f"{base}/part{n}.mp4" for n in range(args.parts)]
+
+    os.chdir(work_dir)
+    os.makedirs("public/videos", exist_ok=True)
+    os.makedirs("public/img", exist_ok=True)
+    results = []
+    for workers in (1, args.workers):
+        info, seconds = timed_download(urls, f"bench-{workers}", workers)
+        results.append({"workers": workers, "seconds": round(seconds, 2), "ok": info is not None})
+    server.shutdown()
+
+    print(json.dumps({
+        "parts": args.parts,
+        "part_seconds": lengths,
+        "kbps_per_connection": args.kbps,
+        "results": results,
+        "speedup": round(results[0]["seconds"] / results[1]["seconds"], 2) if results[1]["seconds"] else None,
+    }, indent=4))
+    return 0 if all(r["ok"] for r in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,71 @@
+"""
+Compares per-clip moviepy extraction with the single-pass ffmpeg extraction used by
+RequestSpeech.processSpeech.
+
+Generates a synthetic video (test pattern + tone) with ffmpeg, then times both
+extraction paths on it.
+
+Usage:
+    python benchmarks/bench_extraction.py --minutes 10
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import moviepy.editor as mp
+from crux_processor import video_per_second as vps
+
+
+def make_synthetic_video(path, seconds):
+    subprocess.run([
+        'ffmpeg', '-y', '-v', 'error',
+        '-f', 'lavfi', '-i', f'testsrc=size=320x240:rate=10:duration={seconds}',
+        '-f', 'lavfi', '-i', f'sine=frequency=440:sample_rate=44100:duration={seconds}',
+        '-c:v', 'libx264', '-preset', 'ultrafast',
+        '-c:a', 'aac', '-ac', '2', '-shortest',
+        path
+    ], check=True)
+
+
+def time_extraction(mode, movie_path, work_dir, movie_name):
+    asc_dir = os.path.join(work_dir, mode)
+    os.makedirs(asc_dir, exist_ok=True)
+    rs = vps.RequestSpeech()
+    full_movie = mp.VideoFileClip(movie_path)
+    try:
+        total_duration = full_movie.duration
+        clip_length = int(total_duration // rs.clip_duration) + (1 if total_duration % rs.clip_duration else 0)
+        start = time.perf_counter()
+        if mode == "ffmpeg":
+            clips = rs.ffmpeg_extract_clips(movie_path, asc_dir, movie_name, clip_length, total_duration)
+        else:
+            clips = rs.moviepy_extract_clips(full_movie, asc_dir, movie_name, clip_length, total_duration)
+        elapsed = time.perf_counter() - start
+    finally:
+        full_movie.close()
+    return {"mode": mode, "clips": len(clips), "expected_clips": clip_length, "seconds": round(elapsed, 3)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time moviepy vs single-pass ffmpeg clip extraction.')
+    parser.add_argument('--minutes', type=float, default=10, help='Length of the synthetic video')
+    args = parser.parse_args()
+
+    movie_name = "bench-extraction"
+    with tempfile.TemporaryDirectory() as work_dir:
+        movie_path = os.path.join(work_dir, f"{movie_name}.mp4")
+        make_synthetic_video(movie_path, int(args.minutes * 60))
+        results = [time_extraction(mode, movie_path, work_dir, movie_name) for mode in ("moviepy", "ffmpeg")]
+
+    speedup = results[0]["seconds"] / results[1]["seconds"] if results[1]["seconds"] else None
+    print(json.dumps({"minutes": args.minutes, "results": results, "speedup": speedup}, indent=4))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Measures multi-term matching cost as the number of search terms grows.
+
+Generates synthetic transcripts and term lists of 1 to 10,000 terms, then times the
+old per-phrase loop (one substring test per term per clip), the Aho-Corasick
+automaton on its own, and PhraseMatcher's default (direct tests for short lists,
+the automaton beyond DIRECT_MAX_PHRASES). Every method must report the same terms.
+
+Usage:
+    python benchmarks/bench_phrase_matcher.py --clips 5000 --terms 1,10,100,1000,10000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from crux_processor import phrase_matcher
+
+LETTERS = "abcdefghijklmnopqrstuvwxyz"
+
+
+def make_words(count, rng):
+    return ["".join(rng.choice(LETTERS) for _ in range(rng.randint(3, 9))) for _ in range(count)]
+
+
+def per_phrase_loop(phrases, texts):
+    phrases = list(dict.fromkeys(phrases))
+    return [[phrase for phrase in phrases if phrase in text] for text in texts]
+
+
+def with_matcher(matcher, texts):
+    return [matcher.find(text) for text in texts]
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark multi-term matching against term count.')
+    parser.add_argument('--clips', type=int, default=5000, help='Number of synthetic clip transcripts')
+    parser.add_argument('--terms', type=str, default='1,10,100,1000,10000', help='Comma-separated term counts')
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    vocabulary = make_words(20000, rng)
+    texts = [" ".join(rng.choice(vocabulary) for _ in range(rng.randint(10, 40))) for _ in range(args.clips)]
+
+    results = []
+    for count in [int(n) for n in args.terms.split(",")]:
+        # Mostly real words plus some two-word phrases, as pasted by analysts
+        terms = rng.sample(vocabulary, count)
+        for n in range(0, count, 10):
+            terms[n] = f"{terms[n]} {rng.choice(vocabulary)}"
+
+        expected, loop_seconds = timed(per_phrase_loop, terms, texts)
+        automaton, build_seconds = timed(phrase_matcher.PhraseMatcher, terms, 0)
+        found, automaton_seconds = timed(with_matcher, automaton, texts)
+        default, _ = timed(phrase_matcher.PhraseMatcher, terms)
+        found_default, default_seconds = timed(with_matcher, default, texts)
+        results.append({
+            "terms": count,
+            "per_phrase_loop_seconds": round(loop_seconds, 4),
+            "automaton_build_seconds": round(build_seconds, 4),
+            "automaton_seconds": round(automaton_seconds, 4),
+            "default_seconds": round(default_seconds, 4),
+            "matched_clips": sum(1 for terms_found in expected if terms_found),
+            "equivalent": found == expected and found_default == expected,
+        })
+
+    print(json.dumps({"clips": args.clips, "results": results}, indent=2))
+    return 0 if all(result["equivalent"] for result in results) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,300 @@
+"""
+Reproducible end-to-end benchmark suite for the processing pipeline and search, with
+machine-readable JSON output for comparing releases.
+
+Pipeline: synthetic videos are generated offline with ffmpeg test sources (a tone,
+pink noise, and speech-like bursts: a gliding voiced pitch with syllable-rate amplitude
+modulation, grouped into phrases separated by pauses) at each requested length. Each is
+processed by RequestSpeech.processSpeech with the stub recognizer, and the wall time of
+every stage (load, extract, preprocess, transcribe, save) is taken from its progress
+callbacks: a stage's time runs from the end of the previous stage to its last report.
+The job's exclusive per-stage span times (decode, clip_write, preprocess, recognize, ...)
+are reported alongside as "spans".
+With dsp_engine "clip" the preprocess stage is pydub_to_audio; with "track" extraction
+and preprocessing are a single stage.
+
+Search: a synthetic corpus grows through the requested sizes (reusing the videos of the
+smaller ones), and RequestUiSearch.uiSearch and corpus_search are timed over every video
+in the corpus, cold (index refresh included) and warm.
+
+Generated media is cached in --media-dir, so repeated runs decode identical files.
+With --baseline, timings are compared with an earlier result file and the exit status
+is 1 if any is more than --tolerance slower.
+
+Usage:
+    python benchmarks/bench_pipeline.py --output results.json
+    python benchmarks/bench_pipeline.py --quick --baseline results.json
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from crux_processor import transcript_store, video_per_second as vps
+from bench_search import make_vocabulary
+
+SUITE_VERSION = 1
+
+# ffmpeg lavfi audio sources at the extraction sample rate
+SOURCES = {
+    "tone": "sine=frequency=440:sample_rate=44100",
+    "noise": "anoisesrc=color=pink:amplitude=0.3:sample_rate=44100:seed=7",
+    "speech": (
+        "aevalsrc='0.6*sin(2*PI*(140+40*sin(2*PI*0.7*t))*t)"
+        "*(0.55+0.45*sin(2*PI*4.5*t))*gt(sin(2*PI*0.23*t)+0.3*sin(2*PI*1.1*t),-0.2)'"
+        ":sample_rate=44100"
+    ),
+}
+
+QUERIES = ["fox", "brown fox", "quick, lazy", "engine data, river mountain", "zebra"]
+
+QUICK = {"lengths": "1", "sources": "tone,speech", "engines": "track", "corpus_sizes": "10,100", "clips": 60}
+
+
+def make_media(path, source, seconds):
+    """A tiny 1 fps video track keeps generation and decoding of long media cheap; the audio is what is measured."""
+    subprocess.run([
+        'ffmpeg', '-y', '-v', 'error',
+        '-f', 'lavfi', '-i', f'{SOURCES[source]}:duration={seconds}',
+        '-f', 'lavfi', '-i', f'color=c=gray:size=160x90:rate=1:duration={seconds}',
+        '-c:v', 'libx264', '-preset', 'ultrafast', '-c:a', 'aac', '-b:a', '96k', '-shortest',
+        path
+    ], check=True)
+
+
+class StageRecorder(object):
+    """progress_callback that keeps the time of the first and last report of each stage."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.first = {}
+        self.last = {}
+
+    def __call__(self, stage, done, total):
+        now = time.perf_counter() - self.start
+        self.first.setdefault(stage, now)
+        self.last[stage] = now
+
+    def stages(self):
+        timings = {}
+        previous = 0.0
+        for stage in sorted(self.last, key=lambda name: self.first[name]):
+            timings[stage] = round(self.last[stage] - previous, 4)
+            previous = self.last[stage]
+        return timings
+
+
+def bench_processing(media_dir, source, minutes, engine, vad_enabled):
+    name = f"bench-{source}-{minutes:g}m"
+    cached = os.path.join(media_dir, f"{name}.mp4")
+    if not os.path.isfile(cached):
+        make_media(cached, source, int(minutes * 60))
+    # Each run starts from a clean working copy: no clips, checkpoint or transcript left over
+    os.makedirs(vps.VIDEO_DIR, exist_ok=True)
+    video_path = os.path.join(vps.VIDEO_DIR, f"{name}.mp4")
+    if not os.path.exists(video_path):
+        os.symlink(os.path.abspath(cached), video_path)
+    asc_dir = os.path.join("asc", name)
+    if os.path.isdir(asc_dir):
+        for file_name in os.listdir(asc_dir):
+            os.remove(os.path.join(asc_dir, file_name))
+
+    recorder = StageRecorder()
+    speech = vps.RequestSpeech(
+        speech_backend="stub", dsp_engine=engine, vad_enabled=vad_enabled, use_transcript_cache=False,
+        checkpoint_enabled=False, catalog_path=None, progress_callback=recorder
+    )
+    saved = speech.processSpeech(name)
+    total = time.perf_counter() - recorder.start
+    return {
+        "source": source,
+        "minutes": minutes,
+        "dsp_engine": engine,
+        "clips": speech._clip_length,
+        "ok": bool(saved),
+        "stages": recorder.stages(),
+        "spans": speech.job_metrics()["stages"],
+        "total_seconds": round(total, 4),
+        "realtime_factor": round(minutes * 60 / total, 1) if total else None,
+    }
+
+
+def grow_corpus(names, size, clips, rng, vocabulary, weights):
+    """Adds videos to the transcript store until the corpus holds size videos."""
+    while len(names) < size:
+        name = f"corpus-{len(names):05d}"
+        transcript = {}
+        for c in range(clips):
+            roll = rng.random()
+            if roll < 0.1:
+                text = "NO AUDIO"
+            else:
+                text = " ".join(rng.choices(vocabulary, weights, k=rng.randint(3, 25)))
+            transcript[f"{name}-{c:03d}"] = text
+        transcript_store.save_video_transcript(name, transcript, vps.RequestUiSearch.clip_duration)
+        names.append(name)
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def bench_search(sizes, clips, repeats):
+    rng = random.Random(0)
+    vocabulary = make_vocabulary(5000, random.Random(0))
+    weights = [1.0 / (rank + 1) for rank in range(len(vocabulary))]
+    searcher = vps.RequestUiSearch()
+    names = []
+    results = []
+    for size in sizes:
+        grow_corpus(names, size, clips, rng, vocabulary, weights)
+        video_set = {str(n): name for n, name in enumerate(names)}
+        _, cold = timed(searcher.uiSearch, QUERIES[0], video_set)
+        queries = {}
+        for query in QUERIES:
+            times = []
+            for _ in range(repeats):
+                hits, elapsed = timed(searcher.uiSearch, query, video_set)
+                times.append(elapsed)
+            queries[query] = {"hits": len(hits), "median_seconds": round(statistics.median(times), 5)}
+        corpus, corpus_seconds = timed(searcher.corpus_search, "brown fox", "all", 1, 50)
+        results.append({
+            "videos": size,
+            "clips": size * clips,
+            "cold_search_seconds": round(cold, 4),
+            "ui_search": queries,
+            "corpus_search_seconds": round(corpus_seconds, 4),
+            "corpus_search_hits": corpus["total"],
+        })
+    return results
+
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = None
+    ffmpeg = subprocess.run(['ffmpeg', '-version'], capture_output=True, text=True).stdout.split("\n")[0]
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "ffmpeg": ffmpeg,
+        "commit": commit or None,
+    }
+
+
+def timing_keys(results):
+    """Flattens every timing in a result file to {key: seconds}, for comparing two runs."""
+    timings = {}
+    for run in results.get("pipeline", []):
+        key = f"pipeline/{run['source']}/{run['minutes']:g}m/{run['dsp_engine']}"
+        timings[f"{key}/total"] = run["total_seconds"]
+        for stage, seconds in run["stages"].items():
+            timings[f"{key}/{stage}"] = seconds
+    for run in results.get("search", []):
+        key = f"search/{run['videos']}"
+        timings[f"{key}/cold"] = run["cold_search_seconds"]
+        timings[f"{key}/corpus_search"] = run["corpus_search_seconds"]
+        for query, result in run["ui_search"].items():
+            timings[f"{key}/ui_search/{query}"] = result["median_seconds"]
+    return timings
+
+
+def compare(results, baseline, tolerance, min_seconds=0.05):
+    """Timings slower than the baseline by more than tolerance (ignoring ones under min_seconds)."""
+    current, previous = timing_keys(results), timing_keys(baseline)
+    regressions = []
+    for key in sorted(current.keys() & previous.keys()):
+        if max(current[key], previous[key]) < min_seconds:
+            continue
+        if current[key] > previous[key] * (1 + tolerance):
+            regressions.append({"timing": key, "baseline": previous[key], "current": current[key],
+                                "change": round(current[key] / previous[key] - 1, 3) if previous[key] else None})
+    return regressions
+
+
+def parse_list(value, cast=str):
+    return [cast(item) for item in value.split(",") if item.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark every pipeline stage and corpus search, as JSON.')
+    parser.add_argument('--lengths', default="1,10,60,180", help='Video lengths in minutes')
+    parser.add_argument('--sources', default=",".join(SOURCES), help='Audio sources: ' + ", ".join(SOURCES))
+    parser.add_argument('--engines', default="track,clip", help='dsp_engine values ("clip" runs pydub_to_audio)')
+    parser.add_argument('--vad', action='store_true', help='Keep voice activity detection on (by default every '
+                                                           'clip reaches the recognizer)')
+    parser.add_argument('--corpus-sizes', default="10,100,1000,10000", help='Videos in the search corpus')
+    parser.add_argument('--clips', type=int, default=120, help='Clips per corpus video')
+    parser.add_argument('--repeats', type=int, default=5, help='Warm runs per search query (median reported)')
+    parser.add_argument('--quick', action='store_true', help='Small smoke-test matrix')
+    parser.add_argument('--skip-pipeline', action='store_true')
+    parser.add_argument('--skip-search', action='store_true')
+    parser.add_argument('--media-dir', default=os.path.join(tempfile.gettempdir(), "vidscribe-bench-media"),
+                        help='Cache of generated media, reused between runs')
+    parser.add_argument('--output', help='Write the results to this file instead of stdout')
+    parser.add_argument('--baseline', help='Earlier result file to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed slowdown against the baseline')
+    if parser.parse_known_args()[0].quick:
+        # Explicit options still override the quick matrix
+        parser.set_defaults(**QUICK)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    os.makedirs(args.media_dir, exist_ok=True)
+    media_dir = os.path.abspath(args.media_dir)
+    output = os.path.abspath(args.output) if args.output else None
+    baseline = os.path.abspath(args.baseline) if args.baseline else None
+    os.chdir(tempfile.mkdtemp(prefix="bench-pipeline-"))
+
+    results = {
+        "suite": "pipeline",
+        "version": SUITE_VERSION,
+        "created": time.time(),
+        "environment": environment(),
+        "config": {key: getattr(args, key) for key in
+                   ("lengths", "sources", "engines", "vad", "corpus_sizes", "clips", "repeats")},
+        "pipeline": [],
+        "search": [],
+    }
+    if not args.skip_pipeline:
+        for minutes in parse_list(args.lengths, float):
+            for source in parse_list(args.sources):
+                for engine in parse_list(args.engines):
+                    run = bench_processing(media_dir, source, minutes, engine, args.vad)
+                    print(f"{source} {minutes:g} min ({engine}): {run['total_seconds']}s {run['stages']}",
+                          file=sys.stderr)
+                    results["pipeline"].append(run)
+    if not args.skip_search:
+        results["search"] = bench_search(parse_list(args.corpus_sizes, int), args.clips, args.repeats)
+
+    status = 0 if all(run["ok"] for run in results["pipeline"]) else 1
+    if baseline:
+        with open(baseline) as f:
+            results["regressions"] = compare(results, json.load(f), args.tolerance)
+        status = status or (1 if results["regressions"] else 0)
+
+    text = json.dumps(results, indent=4)
+    if output:
+        with open(output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,93 @@
+"""
+Measures how pydub_to_audio throughput scales with preprocess_workers, and compares it
+with the whole-track DSP engine.
+
+Writes a synthetic multi-hour track (speech-band tone bursts over noise) as {movie}-NNN.wav
+clips in the decoder's format, then runs pydub_to_audio on a fresh copy for each worker count
+and streams the same clips through dsp.TrackProcessor.
+
+Usage:
+    python benchmarks/bench_preprocess.py --hours 2 --workers 1,2,4,8
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import wave
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from crux_processor import dsp, video_per_second as vps
+
+
+def write_synthetic_clips(clip_dir, movie_name, clip_count, clip_duration, seed=0):
+    rng = np.random.default_rng(seed)
+    frame_rate = vps.CLIP_FRAME_RATE
+    t = np.arange(int(clip_duration * frame_rate)) / frame_rate
+    for x in range(clip_count):
+        tone = np.sin(2 * np.pi * (200 + 20 * (x % 10)) * t) * (np.sin(2 * np.pi * 0.5 * t) > 0)
+        noise = rng.normal(0, 0.1, size=(t.size, vps.CLIP_CHANNELS))
+        samples = (tone[:, None] * 0.5 + noise) * 32767 * 0.5
+        with wave.open(os.path.join(clip_dir, f"{movie_name}-{x:03d}.wav"), "wb") as w:
+            w.setnchannels(vps.CLIP_CHANNELS)
+            w.setsampwidth(2)
+            w.setframerate(frame_rate)
+            w.writeframes(np.clip(samples, -32768, 32767).astype(np.int16).tobytes())
+
+
+def time_track_engine(clip_dir, movie_name, clip_count, clip_duration):
+    def blocks():
+        for x in range(clip_count):
+            with wave.open(os.path.join(clip_dir, f"{movie_name}-{x:03d}.wav"), "rb") as w:
+                yield np.frombuffer(w.readframes(w.getnframes()), dtype=np.int16).reshape(-1, vps.CLIP_CHANNELS)
+
+    processor = dsp.TrackProcessor(vps.CLIP_FRAME_RATE, vps.LOW_CUTOFF, vps.HIGH_CUTOFF, order=3, headroom=0.1)
+    start = time.perf_counter()
+    clips = sum(1 for _ in processor.iter_clips(blocks(), clip_duration * vps.CLIP_FRAME_RATE))
+    elapsed = time.perf_counter() - start
+    return {"clips": clips, "seconds": round(elapsed, 3), "clips_per_second": round(clips / elapsed, 2) if elapsed else None}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark pydub_to_audio worker scaling.')
+    parser.add_argument('--hours', type=float, default=2, help='Length of the synthetic track')
+    parser.add_argument('--workers', type=str, default='1,2,4,8', help='Comma-separated worker counts')
+    args = parser.parse_args()
+
+    movie_name = "bench-preprocess"
+    clip_duration = vps.RequestSpeech.clip_duration
+    clip_count = int(args.hours * 3600 // clip_duration)
+    results = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        source_dir = os.path.join(work_dir, "source")
+        os.makedirs(source_dir)
+        write_synthetic_clips(source_dir, movie_name, clip_count, clip_duration)
+
+        for workers in [int(w) for w in args.workers.split(',')]:
+            asc_dir = os.path.join(work_dir, f"workers-{workers}")
+            shutil.copytree(source_dir, asc_dir)
+            rs = vps.RequestSpeech(preprocess_workers=workers)
+            start = time.perf_counter()
+            clips = rs.pydub_to_audio(asc_dir, movie_name, clip_count, None)
+            elapsed = time.perf_counter() - start
+            shutil.rmtree(asc_dir)
+            results.append({
+                "workers": workers,
+                "clips": len(clips),
+                "seconds": round(elapsed, 3),
+                "clips_per_second": round(len(clips) / elapsed, 2) if elapsed else None,
+                "speedup": round(results[0]["seconds"] / elapsed, 2) if results and elapsed else 1.0,
+            })
+
+        track = time_track_engine(source_dir, movie_name, clip_count, clip_duration)
+
+    print(json.dumps({"hours": args.hours, "clips": clip_count, "results": results, "track_engine": track}, indent=4))
+
+
+if __name__ == "__main__":
+    main()
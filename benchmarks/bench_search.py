@@ -0,0 +1,130 @@
+"""
+Checks that the persistent search index returns exactly what the dialog JSON scan
+returns (matched clips and terms), and compares their speed.
+
+Writes a synthetic corpus of legacy dialog JSON files into a temporary working directory,
+runs RequestUiSearch with the index (scan_search as the reference) for a set of
+queries, rewrites one transcript to check the index picks up the change, and reports
+timings for both paths.
+
+Usage:
+    python benchmarks/bench_search.py --videos 200 --clips 360
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from crux_processor import transcript_store, video_per_second as vps
+
+BASE_WORDS = (
+    "the quick brown fox jumps over lazy dog river mountain signal engine data music voice "
+    "market weather garden station window summer orange planet coffee letter morning"
+).split()
+
+QUERIES = [
+    "fox", "brown fox", "quick, lazy", "o", "ing", "engine data", "zebra", "   ", "dog,", "t d", "-",
+    "river mountain, coffee", "e", "NO AUDIO", "error", "kavo", "mirelta, sundo",
+]
+
+
+def make_vocabulary(size, rng):
+    """Base words plus pseudo-words, so word frequencies can follow a Zipf-like curve."""
+    syllables = ["ka", "vo", "mi", "rel", "ta", "sun", "do", "pe", "lor", "ni", "zu", "ga", "te", "bro"]
+    words = list(BASE_WORDS)
+    while len(words) < size:
+        words.append("".join(rng.choice(syllables) for _ in range(rng.randint(2, 4))))
+    return words
+
+
+def write_corpus(video_count, clip_count, seed=0):
+    rng = random.Random(seed)
+    vocabulary = make_vocabulary(5000, rng)
+    weights = [1.0 / (rank + 1) for rank in range(len(vocabulary))]
+    os.makedirs(transcript_store.RESULTS_DIR, exist_ok=True)
+    video_set = {}
+    for v in range(video_count):
+        name = f"video-{v:05d}"  # Hyphenated, like "FullOfLies-Eminem"
+        clips = {}
+        for c in range(clip_count):
+            roll = rng.random()
+            if roll < 0.1:
+                text = "NO AUDIO"
+            elif roll < 0.12:
+                text = "TRANSCRIPTION ERROR: synthetic"
+            else:
+                text = " ".join(rng.choices(vocabulary, weights, k=rng.randint(3, 25)))
+            clips[f"{name}-{c}"] = text
+        # Legacy JSON only; the first search imports it into the transcript store
+        with open(transcript_store.dialog_json_path(name), "w", encoding="utf-8") as f:
+            json.dump([clips], f, indent=4, sort_keys=True)
+        video_set[str(v)] = name
+    return video_set
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare indexed and scanning transcript search.')
+    parser.add_argument('--videos', type=int, default=200, help='Number of synthetic videos')
+    parser.add_argument('--clips', type=int, default=360, help='Clips per video')
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    os.chdir(tempfile.mkdtemp(prefix="bench-search-"))
+    video_set = write_corpus(args.videos, args.clips)
+    searcher = vps.RequestUiSearch()
+
+    _, build_seconds = timed(searcher.uiSearch, "fox", video_set)
+    # Pasted lists of hundreds of terms take the automaton path through the vocabulary
+    rng = random.Random(1)
+    many_terms = ", ".join(rng.sample(make_vocabulary(5000, random.Random(0)), 300))
+    mismatches = []
+    per_query = []
+    index_seconds = scan_seconds = 0.0
+    for query in QUERIES + [many_terms]:
+        indexed, index_elapsed = timed(searcher.index_search, query, video_set)
+        scanned, scan_elapsed = timed(searcher.scan_search, query, video_set)
+        index_seconds += index_elapsed
+        scan_seconds += scan_elapsed
+        per_query.append({
+            "query": query if len(query) < 40 else f"{query.count(',') + 1} terms",
+            "hits": len(indexed),
+            "index_seconds": round(index_elapsed, 4),
+            "scan_seconds": round(scan_elapsed, 4),
+        })
+        if indexed != scanned:
+            mismatches.append(query)
+
+    # Rewrite one transcript; the index must reflect it on the next search
+    transcript_store.save_video_transcript(video_set["0"], {f"{video_set['0']}-000": "a brand new zebra sentence"}, 10)
+    if searcher.index_search("zebra", video_set) != searcher.scan_search("zebra", video_set):
+        mismatches.append("zebra (after rewrite)")
+
+    print(json.dumps({
+        "videos": args.videos,
+        "clips_per_video": args.clips,
+        "queries": len(per_query),
+        "first_search_with_index_build_seconds": round(build_seconds, 3),
+        "index_seconds": round(index_seconds, 3),
+        "scan_seconds": round(scan_seconds, 3),
+        "speedup": round(scan_seconds / index_seconds, 2) if index_seconds else None,
+        "per_query": per_query,
+        "equivalent": not mismatches,
+        "mismatched_queries": mismatches,
+    }, indent=2))
+    return 1 if mismatches else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
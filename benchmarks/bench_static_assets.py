@@ -0,0 +1,101 @@
+"""
+Measures requests and bytes for loading the UI pages, before and after precompression
+and the cache policy.
+
+Copies public/ into a temporary directory, precompresses it with
+crux_processor.static_assets, then loads index.html and searchui.html plus every asset
+they reference through the Flask app, emulating a browser cache: a first visit without
+compression, a first visit accepting gzip/br, and a repeat visit that sends conditional
+requests only for responses that are not fresh.
+
+Usage:
+    python benchmarks/bench_static_assets.py
+"""
+import json
+import logging
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from crux_processor import static_assets
+
+PAGES = ['/public/', '/public/search']
+REFERENCE = re.compile(r'(?:href|src)="((?:css|js|fonts|img)/[^"]+)"')
+
+
+class BrowserCache(object):
+    """Just enough of a browser cache: freshness from max-age, revalidation with the ETag."""
+
+    def __init__(self):
+        self.entries = {}
+
+    def fetch(self, client, url, accept_encoding, stats):
+        entry = self.entries.get(url)
+        if entry and time.time() < entry["expires"]:
+            stats["cache_hits"] += 1
+            return entry["body"]
+        headers = {"Accept-Encoding": accept_encoding} if accept_encoding else {}
+        if entry and entry["etag"]:
+            headers["If-None-Match"] = entry["etag"]
+        response = client.get(url, headers=headers)
+        stats["requests"] += 1
+        stats["bytes"] += len(response.data)
+        if response.status_code == 304:
+            return entry["body"]
+        max_age = response.cache_control.max_age if not response.cache_control.no_cache else 0
+        self.entries[url] = {
+            "expires": time.time() + (max_age or 0),
+            "etag": response.headers.get("ETag"),
+            "body": response.get_data(as_text=False),
+        }
+        return response.data
+
+
+def load_pages(client, cache, accept_encoding):
+    stats = {"requests": 0, "bytes": 0, "cache_hits": 0}
+    for page in PAGES:
+        html = cache.fetch(client, page, accept_encoding, stats).decode("utf-8", errors="replace")
+        for reference in REFERENCE.findall(html):
+            cache.fetch(client, f"/public/{reference}", accept_encoding, stats)
+    return stats
+
+
+def main():
+    logging.disable(logging.CRITICAL)
+    work_dir = tempfile.mkdtemp(prefix="bench-static-")
+    public = os.path.join(work_dir, "public")
+    shutil.copytree(os.path.join(ROOT, "public"), public,
+                    ignore=shutil.ignore_patterns("videos", "results-*", "*.gz", "*.br"))
+    compressed, before, after = static_assets.build(public)
+
+    os.chdir(work_dir)
+    import api
+    api.start_services()  # js/videoConfig.js is rendered from the catalog
+    api.app.static_folder = public
+    api.asset_versions.root = public
+    client = api.app.test_client()
+
+    plain = load_pages(client, BrowserCache(), None)
+    cache = BrowserCache()
+    first = load_pages(client, cache, "gzip, deflate, br")
+    repeat = load_pages(client, cache, "gzip, deflate, br")
+
+    print(json.dumps({
+        "precompressed_files": compressed,
+        "asset_bytes": before,
+        "asset_bytes_compressed": after,
+        "first_visit_uncompressed": plain,
+        "first_visit_compressed": first,
+        "repeat_visit": repeat,
+    }, indent=4))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,114 @@
+"""
+Measures time-to-first-byte and bytes transferred for video delivery through
+/api/Video/starter/<video>.
+
+Generates a synthetic video with ffmpeg, serves the Flask app from a local threaded
+server, and compares what the UI used to do (fetch the whole file as a Blob before
+playing) with what a player does now: a ranged request for the start of the file, a
+ranged request when seeking, and a conditional revisit answered with 304.
+
+Usage:
+    python benchmarks/bench_video_delivery.py --minutes 5 --bitrate 4000
+"""
+import argparse
+import http.client
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from werkzeug.serving import make_server
+
+START_BYTES = 1024 * 1024  # Roughly what a player buffers before the first frame
+
+
+def make_synthetic_video(path, seconds, bitrate_kbps):
+    subprocess.run([
+        'ffmpeg', '-y', '-v', 'error',
+        '-f', 'lavfi', '-i', f'testsrc=size=1280x720:rate=25:duration={seconds}',
+        '-f', 'lavfi', '-i', f'sine=frequency=440:sample_rate=44100:duration={seconds}',
+        '-c:v', 'libx264', '-preset', 'ultrafast', '-b:v', f'{bitrate_kbps}k',
+        '-c:a', 'aac', '-shortest', '-movflags', '+faststart',
+        path
+    ], check=True)
+
+
+def fetch(port, path, headers=None):
+    """Returns status, time to first byte, total time and body bytes read."""
+    conn = http.client.HTTPConnection('127.0.0.1', port)
+    start = time.perf_counter()
+    conn.request('GET', path, headers=headers or {})
+    response = conn.getresponse()
+    first = response.read(1)
+    ttfb = time.perf_counter() - start
+    size = len(first)
+    while True:
+        chunk = response.read(65536)
+        if not chunk:
+            break
+        size += len(chunk)
+    total = time.perf_counter() - start
+    headers = dict(response.getheaders())
+    conn.close()
+    return {
+        "status": response.status,
+        "ttfb_ms": round(ttfb * 1000, 2),
+        "total_ms": round(total * 1000, 2),
+        "bytes": size,
+    }, headers
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark TTFB and transfer size of video delivery.')
+    parser.add_argument('--minutes', type=float, default=5, help='Length of the synthetic video')
+    parser.add_argument('--bitrate', type=int, default=4000, help='Video bitrate in kbit/s')
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    work_dir = tempfile.mkdtemp(prefix="bench-delivery-")
+    os.makedirs(os.path.join(work_dir, 'public', 'videos'))
+    video = 'bench-delivery.mp4'
+    video_path = os.path.join(work_dir, 'public', 'videos', video)
+    make_synthetic_video(video_path, int(args.minutes * 60), args.bitrate)
+    size = os.path.getsize(video_path)
+
+    os.chdir(work_dir)
+    import api
+    api.app.static_folder = os.path.join(work_dir, 'public')
+    server = make_server('127.0.0.1', 0, api.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_port
+    url = f'/api/Video/starter/{video}'
+
+    blob, headers = fetch(port, url)
+    results = {"whole_file_blob": blob}
+    results["range_start"], _ = fetch(port, url, {'Range': f'bytes=0-{START_BYTES - 1}'})
+    middle = size // 2
+    results["range_seek"], _ = fetch(port, url, {'Range': f'bytes={middle}-{middle + START_BYTES - 1}'})
+    results["revisit_etag"], _ = fetch(port, url, {'If-None-Match': headers.get('ETag', '')})
+    results["revisit_last_modified"], _ = fetch(port, url, {'If-Modified-Since': headers.get('Last-Modified', '')})
+    server.shutdown()
+
+    checks = {
+        "range_is_206": results["range_start"]["status"] == 206 and results["range_seek"]["status"] == 206,
+        "range_bytes": results["range_start"]["bytes"] == START_BYTES,
+        "revisit_is_304": results["revisit_etag"]["status"] == 304 and results["revisit_last_modified"]["status"] == 304,
+        "revisit_empty": results["revisit_etag"]["bytes"] == 0,
+    }
+    print(json.dumps({
+        "video_bytes": size,
+        "results": results,
+        "bytes_before_first_frame": {"blob": blob["bytes"], "range": results["range_start"]["bytes"]},
+        "checks": checks,
+    }, indent=4))
+    return 0 if all(checks.values()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
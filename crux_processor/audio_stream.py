@@ -0,0 +1,93 @@
+import logging
+import queue
+import subprocess
+import threading
+
+_END = object()
+
+
+def iter_pcm_clips(movie_path, clip_duration, frame_rate, channels=2, sample_width=2):
+    """
+    Decodes the audio track of movie_path with a single ffmpeg process and yields
+    (clip_index, pcm_bytes) tuples of raw little-endian PCM, one per clip_duration seconds.
+    The final clip may be shorter. Nothing is written to disk.
+    """
+    if sample_width != 2:
+        raise ValueError("Only 16-bit PCM is supported.")
+    clip_bytes = int(clip_duration * frame_rate) * channels * sample_width
+    process = subprocess.Popen([
+        'ffmpeg', '-v', 'error',
+        '-i', movie_path,
+        '-vn', '-map', '0:a:0',
+        '-f', 's16le', '-acodec', 'pcm_s16le',
+        '-ar', str(frame_rate), '-ac', str(channels),
+        'pipe:1'
+    ], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    try:
+        index = 0
+        while True:
+            pcm = process.stdout.read(clip_bytes)
+            if not pcm:
+                break
+            # Drop a dangling partial frame so every buffer stays sample aligned
+            pcm = pcm[:len(pcm) - len(pcm) % (channels * sample_width)]
+            yield index, pcm
+            index += 1
+        process.wait()
+        if process.returncode != 0:
+            raise RuntimeError(f"ffmpeg exited with {process.returncode}: {process.stderr.read().decode(errors='replace')}")
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        process.stdout.close()
+        process.stderr.close()
+
+
+def bounded_pipeline(items, process, max_in_flight):
+    """
+    Runs process(item) for each item on a background thread and yields the results in
+    order. At most max_in_flight processed results wait in memory for the consumer, so
+    a slow consumer (e.g. the recognizer) applies backpressure to the decoder.
+    Exceptions raised by the producer are re-raised in the consumer.
+    """
+    results = queue.Queue(maxsize=max(1, max_in_flight))
+    stop = threading.Event()
+
+    def put(value):
+        while not stop.is_set():
+            try:
+                results.put(value, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in items:
+                if not put(process(item)):
+                    return
+            put(_END)
+        except BaseException as e:
+            put(e)
+        finally:
+            # Make sure a decoder generator releases its ffmpeg process
+            if hasattr(items, 'close'):
+                items.close()
+
+    producer = threading.Thread(target=produce, name="clip-producer", daemon=True)
+    producer.start()
+    try:
+        while True:
+            value = results.get()
+            if value is _END:
+                break
+            if isinstance(value, BaseException):
+                raise value
+            yield value
+    finally:
+        stop.set()
+        producer.join(timeout=5)
+        if producer.is_alive():
+            logging.warning("Clip producer thread did not stop within 5 seconds.")
@@ -0,0 +1,310 @@
+import argparse
+import contextlib
+import json
+import os
+import sqlite3
+import time
+
+from crux_processor.jobs import COMPLETED, FAILED, QUEUED, RUNNING  # Processing states are the job states
+
+DEFAULT_CATALOG_PATH = os.environ.get("VIDSCRIBE_CATALOG", os.path.join("cache", "catalog.sqlite3"))
+LEGACY_CONFIG_FILE = "videoConfig.json"
+
+# The UI shows three videos side by side; each slot holds at most one catalog entry
+SLOTS = ("VIDEO1", "VIDEO2", "VIDEO3")
+VIDEO = "video"
+AUDIO = "audio"
+DOWNLOADING = "downloading"
+UNPROCESSED = "unprocessed"  # Filter value for videos that were never processed
+MAX_PAGE_SIZE = 500
+RECENT_INGESTS = 20  # Ingest attempts returned with a single video
+
+
+class Catalog(object):
+    """
+    The video library: one row per video with its UI slot, media file and duration, the
+    history of its downloads (ingests), and its processing state. Stored in SQLite in WAL
+    mode with a short-lived connection per operation, so the download CLI and every
+    server process can write to it at once and each change touches only its own rows.
+    """
+
+    def __init__(self, path=DEFAULT_CATALOG_PATH):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self.connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS videos ("
+                "id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE, slot TEXT UNIQUE, "
+                f"kind TEXT NOT NULL DEFAULT '{VIDEO}', media_path TEXT, duration REAL NOT NULL DEFAULT 0, "
+                "added REAL NOT NULL, updated REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS videos_added ON videos (added)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS ingests ("
+                "id INTEGER PRIMARY KEY, video_id INTEGER NOT NULL REFERENCES videos (id) ON DELETE CASCADE, "
+                "urls TEXT NOT NULL, kind TEXT NOT NULL, status TEXT NOT NULL, error TEXT, duration REAL, "
+                "started REAL NOT NULL, finished REAL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ingests_video_started ON ingests (video_id, started)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS processing ("
+                "video_id INTEGER PRIMARY KEY REFERENCES videos (id) ON DELETE CASCADE, "
+                "status TEXT NOT NULL, job_id TEXT, clips INTEGER, transcript_path TEXT, error TEXT, "
+                "updated REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS processing_status ON processing (status)")
+
+    @contextlib.contextmanager
+    def connect(self):
+        """Short-lived connection per operation, committed on success; safe across threads and processes."""
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def ensure_video(self, conn, name, kind=VIDEO):
+        """Returns the id of the video named name, adding an empty entry if it is new."""
+        now = time.time()
+        conn.execute(
+            "INSERT OR IGNORE INTO videos (name, kind, added, updated) VALUES (?, ?, ?, ?)", (name, kind, now, now)
+        )
+        return conn.execute("SELECT id FROM videos WHERE name = ?", (name,)).fetchone()[0]
+
+    def add_video(self, name, kind=VIDEO, media_path=None, duration=0, slot=None):
+        """Adds or updates a video entry, optionally putting it in a UI slot."""
+        with self.connect() as conn:
+            video_id = self.ensure_video(conn, name, kind)
+            conn.execute(
+                "UPDATE videos SET kind = ?, media_path = COALESCE(?, media_path), "
+                "duration = CASE WHEN ? > 0 THEN ? ELSE duration END, updated = ? WHERE id = ?",
+                (kind, media_path, duration, duration, time.time(), video_id)
+            )
+            if slot is not None:
+                self.set_slot(conn, slot, video_id)
+        return self.get_video(name)
+
+    def set_slot(self, conn, slot, video_id):
+        conn.execute("UPDATE videos SET slot = NULL WHERE slot = ?", (slot,))
+        conn.execute("UPDATE videos SET slot = ?, updated = ? WHERE id = ?", (slot, time.time(), video_id))
+
+    def assign_slot(self, slot, name):
+        with self.connect() as conn:
+            self.set_slot(conn, slot, self.ensure_video(conn, name))
+
+    def free_slot(self):
+        """The first UI slot without a video, or None when all are taken."""
+        taken = self.slots()
+        return next((slot for slot in SLOTS if not taken[slot]), None)
+
+    def slots(self):
+        """{slot: video name or ""} for every UI slot."""
+        with self.connect() as conn:
+            rows = conn.execute("SELECT slot, name FROM videos WHERE slot IS NOT NULL").fetchall()
+        names = dict.fromkeys(SLOTS, "")
+        names.update({row["slot"]: row["name"] for row in rows})
+        return names
+
+    def clear_media(self, name):
+        """Takes a video out of its UI slot after its media files were deleted; its history stays."""
+        with self.connect() as conn:
+            conn.execute(
+                "UPDATE videos SET slot = NULL, media_path = NULL, updated = ? WHERE name = ?", (time.time(), name)
+            )
+
+    def start_ingest(self, name, urls, kind=VIDEO):
+        """Records a download attempt for name and returns its ingest id."""
+        with self.connect() as conn:
+            video_id = self.ensure_video(conn, name, kind)
+            return conn.execute(
+                "INSERT INTO ingests (video_id, urls, kind, status, started) VALUES (?, ?, ?, ?, ?)",
+                (video_id, json.dumps(list(urls)), kind, DOWNLOADING, time.time())
+            ).lastrowid
+
+    def finish_ingest(self, ingest_id, media_path=None, duration=0, error=None):
+        """Records the outcome of a download; a successful one also updates the video's media and duration."""
+        with self.connect() as conn:
+            conn.execute(
+                "UPDATE ingests SET status = ?, error = ?, duration = ?, finished = ? WHERE id = ?",
+                (FAILED if error else COMPLETED, error, duration, time.time(), ingest_id)
+            )
+            if not error:
+                conn.execute(
+                    "UPDATE videos SET kind = (SELECT kind FROM ingests WHERE id = ?), media_path = ?, duration = ?, "
+                    "updated = ? WHERE id = (SELECT video_id FROM ingests WHERE id = ?)",
+                    (ingest_id, media_path, duration or 0, time.time(), ingest_id)
+                )
+
+    def set_processing(self, name, status, job_id=None, clips=None, duration=None, transcript_path=None, error=None):
+        """
+        Records a video's processing state; job_id, clips and transcript_path keep their value
+        when None. A job's state only moves forward: QUEUED for a job_id that is already
+        running or finished is ignored, since the worker can claim a job before its submitter
+        has recorded it as queued.
+        """
+        with self.connect() as conn:
+            video_id = self.ensure_video(conn, name)
+            conn.execute(
+                "INSERT INTO processing (video_id, status, job_id, clips, transcript_path, error, updated) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT (video_id) DO UPDATE SET status = excluded.status, "
+                "job_id = COALESCE(excluded.job_id, job_id), clips = COALESCE(excluded.clips, clips), "
+                "transcript_path = COALESCE(excluded.transcript_path, transcript_path), "
+                "error = excluded.error, updated = excluded.updated "
+                "WHERE excluded.status != ? OR excluded.job_id IS NULL OR job_id IS NOT excluded.job_id "
+                "OR status = ?",
+                (video_id, status, job_id, clips, transcript_path, error, time.time(), QUEUED, QUEUED)
+            )
+            if duration:
+                conn.execute("UPDATE videos SET duration = ? WHERE id = ? AND duration = 0", (duration, video_id))
+
+    def clear_processing(self):
+        """Forgets every processing state, e.g. after the results were wiped."""
+        with self.connect() as conn:
+            conn.execute("DELETE FROM processing")
+
+    def get_video(self, name):
+        """The video's entry with its processing state and most recent ingests, or None."""
+        with self.connect() as conn:
+            row = conn.execute(
+                f"SELECT {VIDEO_COLUMNS} FROM videos v LEFT JOIN processing p ON p.video_id = v.id WHERE v.name = ?",
+                (name,)
+            ).fetchone()
+            if row is None:
+                return None
+            ingests = conn.execute(
+                "SELECT id, urls, kind, status, error, duration, started, finished FROM ingests "
+                "WHERE video_id = ? ORDER BY started DESC LIMIT ?", (row["id"], RECENT_INGESTS)
+            ).fetchall()
+        video = video_dict(row)
+        video["ingests"] = [dict(ingest, urls=json.loads(ingest["urls"])) for ingest in ingests]
+        return video
+
+    def list_videos(self, page=1, page_size=50, status=None, query=None):
+        """
+        One page of the library, newest first. status filters on the processing state
+        (UNPROCESSED for videos never processed); query matches part of the name.
+        """
+        page = max(1, int(page))
+        page_size = min(max(1, int(page_size)), MAX_PAGE_SIZE)
+        conditions, params = [], []
+        if status == UNPROCESSED:
+            conditions.append("p.status IS NULL")
+        elif status:
+            conditions.append("p.status = ?")
+            params.append(status)
+        if query:
+            conditions.append("v.name LIKE ? ESCAPE '\\'")
+            params.append("%" + query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%")
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        with self.connect() as conn:
+            total = conn.execute(
+                f"SELECT COUNT(*) FROM videos v LEFT JOIN processing p ON p.video_id = v.id {where}", params
+            ).fetchone()[0]
+            rows = conn.execute(
+                f"SELECT {VIDEO_COLUMNS} FROM videos v LEFT JOIN processing p ON p.video_id = v.id {where} "
+                "ORDER BY v.added DESC, v.id DESC LIMIT ? OFFSET ?",
+                params + [page_size, (page - 1) * page_size]
+            ).fetchall()
+        return {
+            "total": total,
+            "page": page,
+            "page_size": page_size,
+            "pages": -(-total // page_size),
+            "videos": [video_dict(row) for row in rows],
+        }
+
+    def import_config(self, path=LEGACY_CONFIG_FILE):
+        """
+        One-time migration from videoConfig.json: adds its videos in their slots when the
+        catalog is still empty. Returns the number of videos imported.
+        """
+        if not os.path.exists(path):
+            return 0
+        with self.connect() as conn:
+            if conn.execute("SELECT 1 FROM videos LIMIT 1").fetchone():
+                return 0
+        with open(path, 'r') as f:
+            config = json.load(f)
+        imported = 0
+        for video in config.get("videos", []):
+            if not video.get("name"):
+                continue
+            kind, media_path = find_media(video["name"])
+            slot = video.get("id") if video.get("id") in SLOTS else None
+            self.add_video(video["name"], kind, media_path, video.get("duration") or 0, slot)
+            imported += 1
+        return imported
+
+
+VIDEO_COLUMNS = (
+    "v.id, v.name, v.slot, v.kind, v.media_path, v.duration, v.added, v.updated, "
+    "p.status, p.job_id, p.clips, p.transcript_path, p.error, p.updated AS processed"
+)
+
+
+def video_dict(row):
+    return {
+        "name": row["name"],
+        "slot": row["slot"],
+        "kind": row["kind"],
+        "media_path": row["media_path"],
+        "duration": row["duration"],
+        "added": row["added"],
+        "updated": row["updated"],
+        "processing": {
+            "status": row["status"] or UNPROCESSED,
+            "job_id": row["job_id"],
+            "clips": row["clips"],
+            "transcript_path": row["transcript_path"],
+            "error": row["error"],
+            "updated": row["processed"],
+        },
+    }
+
+
+def find_media(name):
+    """(kind, path) of a video's media file under public/, or (VIDEO, None) if there is none."""
+    video_path = os.path.join("public", "videos", f"{name}.mp4")
+    if os.path.isfile(video_path):
+        return VIDEO, video_path
+    audio_dir = os.path.join("public", "audio")
+    if os.path.isdir(audio_dir):
+        for file_name in sorted(os.listdir(audio_dir)):
+            if os.path.splitext(file_name)[0] == name:
+                return AUDIO, os.path.join(audio_dir, file_name)
+    return VIDEO, None
+
+
+def open_catalog(path=DEFAULT_CATALOG_PATH, legacy_config=LEGACY_CONFIG_FILE):
+    """Opens the catalog, importing videoConfig.json the first time."""
+    catalog = Catalog(path)
+    catalog.import_config(legacy_config)
+    return catalog
+
+
+def main():
+    parser = argparse.ArgumentParser(description='List the video catalog.')
+    parser.add_argument('--catalog', default=DEFAULT_CATALOG_PATH, help='Catalog database')
+    parser.add_argument('--status', help=f'Processing state to list ({UNPROCESSED}, {QUEUED}, {RUNNING}, '
+                                         f'{COMPLETED}, {FAILED})')
+    parser.add_argument('--query', help='Part of the video name')
+    parser.add_argument('--page', type=int, default=1)
+    parser.add_argument('--page-size', type=int, default=50)
+    args = parser.parse_args()
+
+    catalog = open_catalog(args.catalog)
+    result = catalog.list_videos(args.page, args.page_size, args.status, args.query)
+    for video in result["videos"]:
+        slot = f"[{video['slot']}] " if video["slot"] else ""
+        print(f"{slot}{video['name']}: {video['kind']}, {video['duration']:.0f}s, {video['processing']['status']}")
+    print(f"Page {result['page']} of {result['pages']} ({result['total']} videos)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+import contextlib
+import json
+import logging
+import os
+import threading
+
+
+class TranscriptionJournal(object):
+    """
+    Append-only JSON-lines journal of finished clips for one video. The first line holds
+    a fingerprint of everything that affects the results (video file, clip length, speech
+    backend, ...); a journal written under a different fingerprint is discarded. Each
+    later line is one clip's result, flushed to disk as soon as the clip completes, so a
+    crashed or restarted job only has to transcribe the clips that are missing. An
+    {"extracted": n} line records that all n clip files were written, so they are reused.
+    guard, if given, returns the context every write and the removal happen in; a
+    scheduled job's guard raises once the job has been handed to another worker.
+    """
+
+    def __init__(self, path, fingerprint, guard=None):
+        self.path = path
+        self.guard = guard or contextlib.nullcontext
+        # Normalized through JSON so it compares equal to the header read back from disk
+        self.fingerprint = json.loads(json.dumps(fingerprint, sort_keys=True))
+        self.file = None
+        self.lock = threading.Lock()
+        self.extracted = None  # Clip files written by an earlier run, from load()
+
+    def load(self):
+        """
+        Returns {clip: text} of the clips already journaled under the same fingerprint.
+        A torn last line from a crash mid-write is ignored.
+        """
+        completed = {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                lines = f.read().splitlines()
+        except FileNotFoundError:
+            return completed
+        try:
+            header = json.loads(lines[0]) if lines else None
+        except ValueError:
+            header = None
+        if not header or header.get("fingerprint") != self.fingerprint:
+            logging.info(f"Discarding checkpoint journal {self.path} written with different settings")
+            self.remove()
+            return completed
+        for line in lines[1:]:
+            if not line.strip():
+                continue
+            try:
+                entry = json.loads(line)
+                if "extracted" in entry:
+                    self.extracted = int(entry["extracted"])
+                    continue
+                completed[entry["clip"]] = entry["text"]
+            except (ValueError, KeyError, TypeError):
+                logging.warning(f"Ignoring damaged line in checkpoint journal {self.path}")
+        return completed
+
+    def open(self):
+        """Opens the journal for appending, writing the fingerprint header if it is new."""
+        if self.file is not None:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        is_new = not os.path.isfile(self.path) or os.path.getsize(self.path) == 0
+        self.file = open(self.path, 'a', encoding='utf-8')
+        if not is_new:
+            # Start on a fresh line in case the previous run died mid-write
+            self.file.write("\n")
+        else:
+            self.write({"fingerprint": self.fingerprint})
+
+    def record(self, clip, text):
+        self.write({"clip": clip, "text": text})
+
+    def record_extracted(self, count):
+        self.write({"extracted": count})
+        self.extracted = count
+
+    def write(self, entry):
+        with self.guard(), self.lock:
+            if self.file is None:
+                return
+            self.file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self.file.flush()
+            os.fsync(self.file.fileno())
+
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+    def remove(self):
+        """Deletes the journal once the transcript has been saved."""
+        with self.guard():
+            self.close()
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
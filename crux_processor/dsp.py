@@ -0,0 +1,106 @@
+import functools
+
+import numpy as np
+from scipy.signal import butter, sosfiltfilt
+
+INT16_FULL_SCALE = 32768.0
+
+
+@functools.lru_cache(maxsize=32)
+def bandpass_sos(lowcut, highcut, fs, order=3):
+    """
+    Butterworth bandpass as float32 second-order sections, designed once per parameter set.
+    Second-order sections stay stable at low cutoffs where the (b, a) form loses precision.
+    """
+    nyquist = 0.5 * fs
+    sos = butter(order, [lowcut / nyquist, highcut / nyquist], btype='band', output='sos').astype(np.float32)
+    return sos
+
+
+def to_int16(samples):
+    """Rounds float samples to int16, saturating instead of wrapping on overflow."""
+    return np.clip(np.rint(samples), -32768, 32767).astype(np.int16)
+
+
+class TrackProcessor(object):
+    """
+    Mono conversion, peak normalization and zero-phase bandpass filtering over a whole
+    track, or over large chunks with overlapping context, using float32 buffers.
+    Filtering runs across clip boundaries, so clips cut from the result have no filter
+    edge transients. Normalization gain is computed per chunk (or per track); chunk
+    boundaries fall on clip boundaries so every clip gets a single gain.
+    """
+
+    def __init__(self, sample_rate, lowcut, highcut, order=3, headroom=0.1, chunk_seconds=600, overlap_seconds=2):
+        self.sample_rate = sample_rate
+        self.sos = bandpass_sos(lowcut, highcut, sample_rate, order)
+        self.target_peak = INT16_FULL_SCALE * 10 ** (-headroom / 20)
+        self.chunk_seconds = chunk_seconds
+        self.overlap_samples = int(overlap_seconds * sample_rate)
+
+    @staticmethod
+    def to_mono(samples):
+        """Averages an (n, channels) int16 block into a float32 mono array."""
+        samples = np.asarray(samples)
+        if samples.ndim == 1:
+            return samples.astype(np.float32)
+        # Accumulate channel by channel; a reduction over a 2-sample axis is much slower
+        mono = samples[:, 0].astype(np.float32)
+        for channel in range(1, samples.shape[1]):
+            mono += samples[:, channel]
+        if samples.shape[1] > 1:
+            mono *= np.float32(1.0 / samples.shape[1])
+        return mono
+
+    def render(self, span, start, end):
+        """
+        Normalizes and filters span (float32 mono, modified in place) and returns the
+        int16 samples of span[start:end]; the samples outside are filter context only.
+        """
+        peak = np.max(np.abs(span[start:end])) if end > start else 0
+        if peak > 0:
+            span *= np.float32(self.target_peak / peak)
+        if span.size > 1:
+            span = sosfiltfilt(self.sos, span, padlen=min(3 * (2 * len(self.sos) + 1), span.size - 1))
+        return to_int16(span[start:end])
+
+    def process_track(self, samples):
+        """Processes a whole in-memory track and returns int16 mono samples."""
+        mono = self.to_mono(samples)
+        return self.render(mono, 0, mono.size)
+
+    def iter_clips(self, blocks, clip_samples):
+        """
+        Consumes int16 blocks ((n,) or (n, channels) arrays of any size) and yields int16
+        mono clips of clip_samples samples; the last clip may be shorter. Memory stays at
+        one chunk plus two overlaps regardless of track length.
+        """
+        clips_per_chunk = max(1, int(self.chunk_seconds * self.sample_rate) // clip_samples)
+        chunk = clips_per_chunk * clip_samples
+        overlap = min(self.overlap_samples, chunk)
+        buffer = np.empty(chunk + 2 * overlap, dtype=np.float32)
+        fill = 0
+        head = 0  # Samples of leading context before the current chunk
+
+        for block in blocks:
+            mono = self.to_mono(block)
+            pos = 0
+            while pos < mono.size:
+                n = min(head + chunk + overlap - fill, mono.size - pos)
+                buffer[fill:fill + n] = mono[pos:pos + n]
+                fill += n
+                pos += n
+                if fill == head + chunk + overlap:
+                    rendered = self.render(buffer[:fill].copy(), head, head + chunk)
+                    for i in range(0, rendered.size, clip_samples):
+                        yield rendered[i:i + clip_samples]
+                    # Keep the overlap on each side of the next chunk's start as context
+                    tail = buffer[head + chunk - overlap:fill].copy()
+                    buffer[:tail.size] = tail
+                    fill = tail.size
+                    head = overlap
+
+        if fill > head:
+            rendered = self.render(buffer[:fill].copy(), head, fill)
+            for i in range(0, rendered.size, clip_samples):
+                yield rendered[i:i + clip_samples]
@@ -0,0 +1,247 @@
+import collections
+import contextlib
+import itertools
+import logging
+import os
+import sqlite3
+import threading
+
+from crux_processor import metrics
+
+ALL_CHANNELS = "all"
+DEFAULT_EVENTS_PATH = os.path.join("cache", "events.sqlite3")
+
+
+class Subscription(object):
+    """
+    One subscriber's bounded mailbox. When the subscriber falls behind, the oldest events
+    are dropped so a slow client can never make the broker grow without limit.
+    """
+
+    def __init__(self, channel, max_queue):
+        self.channel = channel
+        self.events = collections.deque(maxlen=max_queue)
+        self.dropped = 0
+        self.closed = False
+        self.condition = threading.Condition()
+
+    def push(self, event):
+        with self.condition:
+            if len(self.events) == self.events.maxlen:
+                self.dropped += 1
+            self.events.append(event)
+            self.condition.notify()
+
+    def pop(self, timeout):
+        """Returns the next (event_id, channel, message), or None after timeout seconds."""
+        with self.condition:
+            if not self.events and not self.closed:
+                self.condition.wait(timeout)
+            if self.events:
+                return self.events.popleft()
+            return None
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+
+class ChannelPublisher(object):
+    """Stream-compatible handle (send_message) that publishes to a single channel."""
+
+    def __init__(self, broker, channel):
+        self.broker = broker
+        self.channel = channel
+
+    def send_message(self, message):
+        self.broker.publish(message, self.channel)
+
+
+class EventBroker(object):
+    """
+    Fan-out publish/subscribe broker for Server-Sent Events.
+    Every subscriber gets its own bounded queue with drop-oldest backpressure, so all
+    open tabs receive every message. Events are published to a channel (e.g. a job id);
+    subscribers to ALL_CHANNELS receive every channel. Recent events are kept in a replay
+    buffer so reconnecting clients can resume from their Last-Event-ID.
+    """
+
+    def __init__(self, subscriber_queue_size=256, replay_size=2000, heartbeat_interval=15):
+        self.subscriber_queue_size = subscriber_queue_size
+        self.heartbeat_interval = heartbeat_interval
+        self.replay = collections.deque(maxlen=replay_size)
+        self.subscriptions = set()
+        self.ids = itertools.count(1)
+        self.closed = False
+        self.lock = threading.Lock()
+
+    def publish(self, message, channel=ALL_CHANNELS):
+        with self.lock:
+            event = (next(self.ids), channel, message)
+            self.replay.append(event)
+            subscribers = [sub for sub in self.subscriptions if sub.channel in (channel, ALL_CHANNELS)]
+        for sub in subscribers:
+            sub.push(event)
+        metrics.SSE_FANOUT.observe(len(subscribers))
+        return event[0]
+
+    def send_message(self, message):
+        """Publish to the default channel; keeps the old Stream interface."""
+        self.publish(message)
+
+    def channel(self, name):
+        return ChannelPublisher(self, name)
+
+    def subscribe(self, channel=ALL_CHANNELS, last_event_id=None):
+        """
+        Registers a subscriber. With last_event_id, buffered events after that id on the
+        channel are queued first so a reconnecting client misses nothing still buffered.
+        """
+        sub = Subscription(channel, self.subscriber_queue_size)
+        with self.lock:
+            if last_event_id is not None:
+                for event in self.replay:
+                    if event[0] > last_event_id and channel in (event[1], ALL_CHANNELS):
+                        sub.push(event)
+            if self.closed:
+                sub.close()
+            else:
+                self.subscriptions.add(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        with self.lock:
+            self.subscriptions.discard(sub)
+        sub.close()
+        if sub.dropped:
+            logging.warning(f"SSE subscriber on '{sub.channel}' dropped {sub.dropped} events while lagging")
+
+    def close(self):
+        """Ends every open event stream, e.g. so a server can exit without waiting on SSE clients."""
+        with self.lock:
+            self.closed = True
+            subscribers = list(self.subscriptions)
+        for sub in subscribers:
+            sub.close()
+
+    def subscriber_count(self):
+        with self.lock:
+            return len(self.subscriptions)
+
+    def event_stream(self, channel=ALL_CHANNELS, last_event_id=None):
+        """
+        Generator yielding Server-Sent Events for one client. A heartbeat comment is sent
+        when idle; writing it to a dead connection ends the generator and frees the slot.
+        """
+        sub = self.subscribe(channel, last_event_id)
+        try:
+            while True:
+                event = sub.pop(self.heartbeat_interval)
+                if event is None and sub.closed:
+                    return
+                if event is None:
+                    yield ': heartbeat\n\n'
+                    continue
+                event_id, _, message = event
+                yield f'id: {event_id}\ndata: {message}\n\n'
+        finally:
+            self.unsubscribe(sub)
+
+
+class SharedEventBroker(EventBroker):
+    """
+    EventBroker whose events live in a local SQLite table, so subscribers connected to
+    any server process receive events published by every process. Event ids are the
+    table's row ids, which makes Last-Event-ID valid across processes. A poller thread
+    per process fans new rows out to that process's subscribers; the newest replay_size
+    events are kept for reconnecting clients.
+    """
+
+    def __init__(self, path=DEFAULT_EVENTS_PATH, poll_interval=0.25, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        self.poll_interval = poll_interval
+        self.replay_size = self.replay.maxlen
+        self.wakeup = threading.Event()
+        self.stopped = threading.Event()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self.connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS events ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, channel TEXT NOT NULL, message TEXT NOT NULL)"
+            )
+            self.last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM events").fetchone()[0]
+        self.poller = threading.Thread(target=self.poll, name="event-poller", daemon=True)
+        self.poller.start()
+
+    @contextlib.contextmanager
+    def connect(self):
+        """Short-lived connection per operation, committed on success; safe across threads and processes."""
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def publish(self, message, channel=ALL_CHANNELS):
+        with self.connect() as conn:
+            event_id = conn.execute(
+                "INSERT INTO events (channel, message) VALUES (?, ?)", (channel, str(message))
+            ).lastrowid
+            if event_id % self.replay_size == 0:
+                conn.execute("DELETE FROM events WHERE id <= ?", (event_id - self.replay_size,))
+        self.wakeup.set()
+        return event_id
+
+    def subscribe(self, channel=ALL_CHANNELS, last_event_id=None):
+        sub = Subscription(channel, self.subscriber_queue_size)
+        with self.lock:
+            # Holding the lock keeps the poller from delivering events past last_id until
+            # the subscriber is registered, so nothing falls between replay and live events
+            if last_event_id is not None:
+                with self.connect() as conn:
+                    rows = conn.execute(
+                        "SELECT id, channel, message FROM events WHERE id > ? AND id <= ? "
+                        "AND (? = ? OR channel = ?) ORDER BY id",
+                        (last_event_id, self.last_id, channel, ALL_CHANNELS, channel)
+                    ).fetchall()
+                for row in rows:
+                    sub.push(tuple(row))
+            if self.closed:
+                sub.close()
+            else:
+                self.subscriptions.add(sub)
+        return sub
+
+    def poll(self):
+        while not self.stopped.is_set():
+            self.wakeup.wait(self.poll_interval)
+            self.wakeup.clear()
+            try:
+                with self.connect() as conn:
+                    rows = conn.execute(
+                        "SELECT id, channel, message FROM events WHERE id > ? ORDER BY id", (self.last_id,)
+                    ).fetchall()
+            except sqlite3.Error as e:
+                logging.error(f"Could not read shared events: {e}")
+                continue
+            if not rows:
+                continue
+            with self.lock:
+                self.last_id = rows[-1][0]
+                subscribers = list(self.subscriptions)
+                for event in rows:
+                    receivers = [sub for sub in subscribers if sub.channel in (event[1], ALL_CHANNELS)]
+                    for sub in receivers:
+                        sub.push(tuple(event))
+                    metrics.SSE_FANOUT.observe(len(receivers))
+
+    def close(self):
+        self.stopped.set()
+        self.wakeup.set()
+        super().close()
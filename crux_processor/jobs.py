@@ -0,0 +1,445 @@
+import contextlib
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+ACTIVE_STATES = (QUEUED, RUNNING)
+
+DEFAULT_STORE_PATH = os.path.join("cache", "jobs.sqlite3")
+POLL_INTERVAL = 1.0  # Seconds an idle worker waits before checking the store for jobs from other processes
+# Seconds a running job's heartbeat may go unrenewed before any scheduler requeues it
+LEASE_TIMEOUT = float(os.environ.get("VIDSCRIBE_JOB_LEASE_TIMEOUT", 60))
+HEARTBEATS_PER_LEASE = 6  # Lease renewals per LEASE_TIMEOUT
+
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted while the scheduler's queue is at its depth limit."""
+
+
+class LeaseLost(BaseException):
+    """
+    Raised by Job.guard() in the thread running a job that was requeued or cancelled, to
+    stop it before it writes anything. A BaseException, like KeyboardInterrupt, so the
+    processing pipeline's error handling does not mistake it for a failed step.
+    """
+
+
+class Job(object):
+    """A single video processing request and its per-stage progress, as stored in the JobStore."""
+
+    def __init__(self, store, row):
+        self.store = store
+        self.id = row["id"]
+        self.video_name = row["video_name"]
+        self.status = row["status"]
+        self.stage = row["stage"]
+        self.stages = json.loads(row["stages"])
+        self.options = json.loads(row["options"])
+        self.error = row["error"]
+        self.owner = row["owner"]  # Unique per claim, so it doubles as the lease token
+        self.created = row["created"]
+        self.started = row["started"]
+        self.finished = row["finished"]
+        self.heartbeat = row["heartbeat"]
+        # Lease state of a claimed job, kept by the scheduler that runs it
+        self.lease_renewed = time.monotonic()
+        self.cancelled = False
+        self.lease_lock = threading.RLock()
+
+    def renew_lease(self, renewed):
+        """Records a heartbeat that reached the store; renewed is the time.monotonic() it was sent at."""
+        self.lease_renewed = renewed
+
+    def cancel(self):
+        """Revokes the lease. Waits for a write already inside guard() to finish."""
+        with self.lease_lock:
+            self.cancelled = True
+
+    @contextlib.contextmanager
+    def guard(self):
+        """
+        Wraps every write of job state by the thread running the job: checkpoint journal,
+        transcript, catalog and progress. Raises LeaseLost instead once the job was
+        cancelled, or when its last heartbeat is more than half a lease old; other
+        schedulers only requeue it after a full lease, so the old thread has stopped
+        writing by the time a new owner can start.
+        """
+        with self.lease_lock:
+            if self.cancelled or time.monotonic() - self.lease_renewed > self.store.lease_timeout / 2:
+                raise LeaseLost(f"Job {self.id} for '{self.video_name}' is no longer owned by this worker")
+            yield
+
+    def update_progress(self, stage, done, total):
+        """Progress callback for RequestSpeech: stage name plus done/total units."""
+        with self.guard():
+            self.stage = stage
+            self.stages[stage] = {"done": done, "total": total}
+            self.store.update_progress(self.id, self.owner, stage, self.stages)
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "video_name": self.video_name,
+            "status": self.status,
+            "stage": self.stage,
+            "stages": {stage: dict(progress) for stage, progress in self.stages.items()},
+            "options": dict(self.options),
+            "error": self.error,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+        }
+
+
+class JobStore(object):
+    """
+    Jobs table in a local SQLite database, shared by every server process. A partial
+    unique index keeps at most one queued or running job per video across processes,
+    and workers claim queued jobs with a single UPDATE so each job runs exactly once.
+    A running job is leased to its owner: the owner renews its heartbeat, and a job whose
+    heartbeat is more than lease_timeout seconds old is requeued by whoever notices.
+    """
+
+    def __init__(self, path=DEFAULT_STORE_PATH, lease_timeout=LEASE_TIMEOUT):
+        self.path = path
+        self.lease_timeout = lease_timeout
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self.connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, video_name TEXT NOT NULL, status TEXT NOT NULL, "
+                "stage TEXT, stages TEXT NOT NULL DEFAULT '{}', error TEXT, owner TEXT, "
+                "created REAL NOT NULL, started REAL, finished REAL, options TEXT NOT NULL DEFAULT '{}', "
+                "heartbeat REAL)"
+            )
+            # Stores created before per-job options and leases
+            columns = [row["name"] for row in conn.execute("PRAGMA table_info(jobs)")]
+            if "options" not in columns:
+                conn.execute("ALTER TABLE jobs ADD COLUMN options TEXT NOT NULL DEFAULT '{}'")
+            if "heartbeat" not in columns:
+                conn.execute("ALTER TABLE jobs ADD COLUMN heartbeat REAL")
+            conn.execute(
+                "CREATE UNIQUE INDEX IF NOT EXISTS jobs_active_video ON jobs (video_name) "
+                f"WHERE status IN ('{QUEUED}', '{RUNNING}')"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created)")
+
+    @contextlib.contextmanager
+    def connect(self):
+        """Short-lived connection per operation, committed on success; safe across threads and processes."""
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            # BEGIN IMMEDIATE takes the write lock up front, so check-then-insert cannot race
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+
+    def create(self, video_name, max_queue, options=None):
+        """
+        Returns (job, created). Raises QueueFullError when max_queue jobs are already waiting.
+        options (a JSON-serializable dict) is stored with a new job; an existing active job
+        keeps its own.
+        """
+        with self.connect() as conn:
+            row = conn.execute(
+                f"SELECT * FROM jobs WHERE video_name = ? AND status IN ('{QUEUED}', '{RUNNING}')",
+                (video_name,)
+            ).fetchone()
+            if row is not None:
+                return Job(self, row), False
+            if conn.execute("SELECT COUNT(*) FROM jobs WHERE status = ?", (QUEUED,)).fetchone()[0] >= max_queue:
+                raise QueueFullError(f"Job queue is full ({max_queue} waiting).")
+            job_id = uuid.uuid4().hex
+            conn.execute(
+                "INSERT INTO jobs (id, video_name, status, created, options) VALUES (?, ?, ?, ?, ?)",
+                (job_id, video_name, QUEUED, time.time(), json.dumps(options or {}))
+            )
+            return Job(self, conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()), True
+
+    def claim(self, owner):
+        """
+        Marks the oldest queued job as running and leased to owner, a token unique to this
+        claim, and returns it, or None if none is queued.
+        """
+        with self.connect() as conn:
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE status = ? ORDER BY created LIMIT 1", (QUEUED,)
+            ).fetchone()
+            if row is None:
+                return None
+            now = time.time()
+            conn.execute(
+                "UPDATE jobs SET status = ?, owner = ?, started = ?, heartbeat = ? WHERE id = ?",
+                (RUNNING, owner, now, now, row["id"])
+            )
+            return Job(self, conn.execute("SELECT * FROM jobs WHERE id = ?", (row["id"],)).fetchone())
+
+    def update_progress(self, job_id, owner, stage, stages):
+        with self.connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET stage = ?, stages = ? WHERE id = ? AND owner = ?",
+                (stage, json.dumps(stages), job_id, owner)
+            )
+
+    def finish(self, job_id, owner, error, keep_finished):
+        """Records the outcome, unless the job was requeued and now belongs to someone else."""
+        with self.connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, finished = ? WHERE id = ? AND owner = ? AND status = ?",
+                (FAILED if error else COMPLETED, error, time.time(), job_id, owner, RUNNING)
+            )
+            # Forget the oldest finished jobs beyond keep_finished
+            conn.execute(
+                f"DELETE FROM jobs WHERE status NOT IN ('{QUEUED}', '{RUNNING}') AND id NOT IN "
+                f"(SELECT id FROM jobs WHERE status NOT IN ('{QUEUED}', '{RUNNING}') ORDER BY created DESC LIMIT ?)",
+                (keep_finished,)
+            )
+
+    def renew(self, leases):
+        """Refreshes the heartbeat of (job_id, owner) leases; returns the ids of those still held."""
+        held = set()
+        with self.connect() as conn:
+            now = time.time()
+            for job_id, owner in leases:
+                cursor = conn.execute(
+                    "UPDATE jobs SET heartbeat = ? WHERE id = ? AND owner = ? AND status = ?",
+                    (now, job_id, owner, RUNNING)
+                )
+                if cursor.rowcount:
+                    held.add(job_id)
+        return held
+
+    def requeue(self, leases):
+        """
+        Puts running jobs, given as (job_id, owner) leases, back in the queue; their
+        checkpoint journals let the next worker resume them.
+        """
+        with self.connect() as conn:
+            conn.executemany(
+                "UPDATE jobs SET status = ?, owner = NULL, started = NULL, heartbeat = NULL "
+                "WHERE id = ? AND owner = ? AND status = ?",
+                [(QUEUED, job_id, owner, RUNNING) for job_id, owner in leases]
+            )
+
+    def requeue_expired(self):
+        """
+        Requeues running jobs whose heartbeat is more than lease_timeout seconds old, such
+        as those of a process that crashed or was killed, and returns their ids.
+        """
+        with self.connect() as conn:
+            expired = time.time() - self.lease_timeout
+            # Rows written before leases have no heartbeat; their start time stands in
+            rows = conn.execute(
+                "SELECT id FROM jobs WHERE status = ? AND COALESCE(heartbeat, started, 0) < ?", (RUNNING, expired)
+            ).fetchall()
+            conn.execute(
+                "UPDATE jobs SET status = ?, owner = NULL, started = NULL, heartbeat = NULL "
+                "WHERE status = ? AND COALESCE(heartbeat, started, 0) < ?",
+                (QUEUED, RUNNING, expired)
+            )
+        return [row["id"] for row in rows]
+
+    def get(self, job_id):
+        with self.connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return Job(self, row) if row is not None else None
+
+    def list(self):
+        with self.connect() as conn:
+            rows = conn.execute("SELECT * FROM jobs ORDER BY created DESC").fetchall()
+        return [Job(self, row) for row in rows]
+
+    def queue_depth(self):
+        with self.connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM jobs WHERE status = ?", (QUEUED,)).fetchone()[0]
+
+
+class JobScheduler(object):
+    """
+    Runs jobs on a bounded pool of worker threads behind a queue with a depth limit.
+    The queue lives in a JobStore, so several server processes can each run a scheduler
+    on the same store: any of them accepts submissions, reports status, and runs jobs.
+    Submitting a video that already has a queued or running job returns that job instead
+    of starting a second one. run_job(job) does the work and returns a truthy value on
+    success; exceptions mark the job failed. A heartbeat thread renews the leases of the
+    running jobs and requeues jobs whose owners stopped renewing theirs. Jobs for which
+    runs_alone(job) is true never share this process with another job: the scheduler
+    stops claiming when it claims one, and it starts once the other running jobs are done.
+    """
+
+    def __init__(self, run_job, max_workers=2, max_queue=16, keep_finished=200, store_path=DEFAULT_STORE_PATH,
+                 lease_timeout=LEASE_TIMEOUT, runs_alone=None):
+        self.run_job = run_job
+        self.runs_alone = runs_alone or (lambda job: False)
+        self.max_queue = max_queue
+        self.keep_finished = keep_finished
+        self.store = JobStore(store_path, lease_timeout)
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self.running = {}  # Job id -> Job, for the jobs this scheduler's workers are running
+        self.exclusive = None  # Id of the running job that runs alone, if any
+        self.lock = threading.Lock()
+        self.idle = threading.Condition(self.lock)  # Notified whenever a job leaves self.running
+        self.claim_lock = threading.Lock()  # One claim at a time, so runs_alone sees every running job
+        self.wakeup = threading.Event()
+        self.stopping = threading.Event()
+        self.stopped = threading.Event()
+        # Jobs left running by a process that crashed go back in the queue
+        self.requeue_expired()
+        self.workers = []
+        for n in range(max_workers):
+            worker = threading.Thread(target=self.work, name=f"job-worker-{n}", daemon=True)
+            worker.start()
+            self.workers.append(worker)
+        self.heartbeat_thread = threading.Thread(target=self.heartbeat, name="job-heartbeat", daemon=True)
+        self.heartbeat_thread.start()
+
+    def submit(self, video_name, options=None):
+        """Returns (job, created). Raises QueueFullError when the queue depth limit is reached."""
+        job, created = self.store.create(video_name, self.max_queue, options)
+        if created:
+            self.wakeup.set()
+        return job, created
+
+    def get(self, job_id):
+        return self.store.get(job_id)
+
+    def list(self):
+        return self.store.list()
+
+    def queue_depth(self):
+        return self.store.queue_depth()
+
+    def requeue_expired(self):
+        try:
+            expired = self.store.requeue_expired()
+        except sqlite3.Error as e:
+            logging.error(f"Could not requeue expired jobs: {e}")
+            return
+        if expired:
+            logging.warning(f"Requeueing {len(expired)} jobs whose owners stopped renewing their leases")
+            self.wakeup.set()
+
+    def heartbeat(self):
+        """Renews the running jobs' leases until shutdown() has finished, and requeues expired ones."""
+        while not self.stopped.wait(self.store.lease_timeout / HEARTBEATS_PER_LEASE):
+            with self.lock:
+                running = list(self.running.values())
+            sent = time.monotonic()
+            try:
+                held = self.store.renew([(job.id, job.owner) for job in running])
+            except sqlite3.Error as e:
+                # Unrenewed leases lapse in the jobs' own guard() checks
+                logging.error(f"Could not renew job leases: {e}")
+                continue
+            for job in running:
+                if job.id in held:
+                    job.renew_lease(sent)
+                else:
+                    logging.warning(f"Job {job.id} for '{job.video_name}' was requeued elsewhere; stopping it")
+                    job.cancel()
+            self.requeue_expired()
+
+    def claim(self):
+        """Claims the next job unless a job that runs alone is running; registers it as running."""
+        with self.claim_lock:
+            if self.exclusive is not None:
+                return None
+            try:
+                job = self.store.claim(f"{self.owner}:{uuid.uuid4().hex[:8]}")
+            except sqlite3.Error as e:
+                logging.error(f"Could not claim a job: {e}")
+                return None
+            if job is not None:
+                with self.lock:
+                    self.running[job.id] = job
+                    if self.runs_alone(job):
+                        self.exclusive = job.id
+            return job
+
+    def work(self):
+        while not self.stopping.is_set():
+            job = self.claim()
+            if job is None:
+                self.wakeup.wait(POLL_INTERVAL)
+                self.wakeup.clear()
+                continue
+            if self.exclusive == job.id:
+                with self.idle:
+                    self.idle.wait_for(lambda: self.stopping.is_set() or list(self.running) == [job.id])
+                if self.stopping.is_set():
+                    # Never started; another process can run it
+                    self.release(job)
+                    try:
+                        self.store.requeue([(job.id, job.owner)])
+                    except sqlite3.Error as e:
+                        logging.error(f"Could not requeue job {job.id}; its lease will expire: {e}")
+                    continue
+            lost = False
+            try:
+                ok = self.run_job(job)
+                error = None if ok else "Processing did not complete; see the job stream for details."
+            except LeaseLost as e:
+                logging.warning(f"Stopped job {job.id}: {e}")
+                lost = True
+            except Exception as e:
+                logging.exception(f"Job {job.id} for '{job.video_name}' failed")
+                error = str(e)
+            self.release(job)
+            if lost:
+                continue
+            try:
+                self.store.finish(job.id, job.owner, error, self.keep_finished)
+            except sqlite3.Error as e:
+                # The worker carries on; the unrenewed lease expires and the job is requeued
+                logging.error(f"Could not record the outcome of job {job.id}: {e}")
+
+    def release(self, job):
+        with self.lock:
+            self.running.pop(job.id, None)
+            if self.exclusive == job.id:
+                self.exclusive = None
+                self.wakeup.set()
+            self.idle.notify_all()
+
+    def shutdown(self, timeout=None):
+        """
+        Stops claiming new jobs and waits up to timeout seconds for running ones to
+        finish. Jobs still running afterwards are cancelled, so their threads stop at
+        their next write, and requeued for another process. Returns the number of jobs
+        requeued.
+        """
+        self.stopping.set()
+        self.wakeup.set()
+        with self.idle:
+            self.idle.notify_all()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for worker in self.workers:
+            worker.join(None if deadline is None else max(0, deadline - time.monotonic()))
+        with self.lock:
+            unfinished = list(self.running.values())
+        for job in unfinished:
+            job.cancel()
+        if unfinished:
+            logging.warning(f"Requeueing {len(unfinished)} jobs still running at shutdown")
+            self.store.requeue([(job.id, job.owner) for job in unfinished])
+        self.stopped.set()
+        return len(unfinished)
@@ -0,0 +1,363 @@
+import atexit
+import bisect
+import collections
+import contextlib
+import fcntl
+import json
+import logging
+import os
+import threading
+import time
+
+DEFAULT_METRICS_DIR = os.path.join("cache", "metrics")
+# Seconds; spans range from a millisecond clip write to a multi-minute decode
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+SNAPSHOT_INTERVAL = 5.0  # Seconds between snapshot writes of a server process
+
+COUNTER = "counter"
+GAUGE = "gauge"
+HISTOGRAM = "histogram"
+
+
+class Metric(object):
+    """A named metric with a fixed set of label names; values are kept per label combination."""
+
+    type = None
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def key(self, labels):
+        if set(labels) != set(self.labels):
+            raise ValueError(f"{self.name} takes labels {self.labels}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labels)
+
+    def snapshot(self):
+        with self.lock:
+            values = [[list(key), value] for key, value in self.values.items()]
+        return {"type": self.type, "help": self.help, "labels": list(self.labels), "values": values}
+
+
+class Counter(Metric):
+    type = COUNTER
+
+    def inc(self, amount=1, **labels):
+        key = self.key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    type = GAUGE
+
+    def set(self, value, **labels):
+        key = self.key(labels)
+        with self.lock:
+            self.values[key] = value
+
+
+class Histogram(Metric):
+    type = HISTOGRAM
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self.key(labels)
+        with self.lock:
+            counts, total, count = self.values.get(key) or ([0] * len(self.buckets), 0.0, 0)
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(counts):
+                counts[index] += 1
+            self.values[key] = (counts, total + value, count + 1)
+
+    def snapshot(self):
+        with self.lock:
+            values = [[list(key), [list(counts), total, count]] for key, (counts, total, count) in self.values.items()]
+        return {"type": self.type, "help": self.help, "labels": list(self.labels), "buckets": list(self.buckets),
+                "values": values}
+
+
+class Registry(object):
+    """
+    The metrics of one process. Each process writes its snapshot to a file in a shared
+    directory (see write_snapshot), and collect() merges the files of every live process,
+    so /metrics reports the same totals whichever server worker answers it.
+    """
+
+    def __init__(self, directory=DEFAULT_METRICS_DIR):
+        self.directory = directory
+        self.metrics = collections.OrderedDict()
+        self.collectors = []
+        self.lock = threading.Lock()
+        self.write_lock = threading.Lock()  # The autosave thread and /metrics requests share one temp file
+        self.writer = None
+
+    def register(self, cls, name, help, labels=(), **kwargs):
+        with self.lock:
+            metric = self.metrics.get(name)
+            if metric is None:
+                metric = self.metrics[name] = cls(name, help, labels, **kwargs)
+            return metric
+
+    def counter(self, name, help, labels=()):
+        return self.register(Counter, name, help, labels)
+
+    def gauge(self, name, help, labels=()):
+        return self.register(Gauge, name, help, labels)
+
+    def histogram(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram, name, help, labels, buckets=buckets)
+
+    def add_collector(self, collector):
+        """collector() is called before each snapshot, e.g. to set a gauge from live state."""
+        self.collectors.append(collector)
+
+    def snapshot(self):
+        for collector in self.collectors:
+            try:
+                collector()
+            except Exception as e:
+                logging.warning(f"Metrics collector failed: {e}")
+        with self.lock:
+            metrics = list(self.metrics.values())
+        return {metric.name: metric.snapshot() for metric in metrics}
+
+    def snapshot_path(self, pid=None):
+        return os.path.join(self.directory, f"{pid or os.getpid()}.json")
+
+    def write_snapshot(self):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.snapshot_path()
+        snapshot = {"pid": os.getpid(), "written": time.time(), "metrics": self.snapshot()}
+        with self.write_lock:
+            with open(path + ".tmp", "w") as f:
+                json.dump(snapshot, f)
+            os.replace(path + ".tmp", path)
+
+    def autosave(self, interval=SNAPSHOT_INTERVAL):
+        """
+        Writes this process's snapshot every interval seconds and at exit, so a /metrics
+        request answered by another process sees it. Used by the server; scripts that
+        never serve /metrics do not need it.
+        """
+        if self.writer is not None:
+            return
+
+        def write():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.write_snapshot()
+                except OSError as e:
+                    logging.warning(f"Could not write metrics snapshot: {e}")
+
+        self.writer = threading.Thread(target=write, name="metrics-writer", daemon=True)
+        self.writer.start()
+        atexit.register(self.write_snapshot)
+
+    def collect(self):
+        """
+        This process's metrics merged with the snapshots of the other live processes.
+        Counters and histograms of exited processes are kept, folded into retired.json, so
+        totals never go backwards when a worker is replaced; their gauges are dropped.
+        """
+        self.write_snapshot()
+        # Retire first, then read, so a snapshot just folded into retired.json is counted there
+        for path, snapshot in self.read_snapshots():
+            pid = snapshot.get("pid")
+            if pid is not None and pid != os.getpid() and not process_exists(pid):
+                self.retire(path)
+        snapshots = []
+        for path, snapshot in self.read_snapshots():
+            pid = snapshot.get("pid")
+            if pid is None or pid == os.getpid() or process_exists(pid):
+                snapshots.append(snapshot["metrics"])
+        return merge(snapshots)
+
+    def read_snapshots(self):
+        for name in sorted(os.listdir(self.directory)):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                with open(path) as f:
+                    yield path, json.load(f)
+            except (OSError, ValueError):
+                continue
+
+    def retire(self, path):
+        """Folds an exited process's snapshot into retired.json; safe when several processes race."""
+        retired_path = os.path.join(self.directory, "retired.json")
+        with open(retired_path + ".lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                with open(path) as f:
+                    snapshot = json.load(f)
+            except (OSError, ValueError):
+                return  # Already retired by another process
+            try:
+                with open(retired_path) as f:
+                    retired = json.load(f)
+            except (OSError, ValueError):
+                retired = {"pid": None, "metrics": {}}
+            metrics = {name: metric for name, metric in snapshot["metrics"].items() if metric["type"] != GAUGE}
+            retired["metrics"] = merge([retired["metrics"], metrics])
+            with open(retired_path + ".tmp", "w") as f:
+                json.dump(retired, f)
+            os.replace(retired_path + ".tmp", retired_path)
+            os.remove(path)
+
+
+def process_exists(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def merge(snapshots):
+    """Sums metric snapshots (counter, gauge and histogram values) label by label."""
+    merged = {}
+    for snapshot in snapshots:
+        for name, metric in snapshot.items():
+            target = merged.setdefault(name, dict(metric, values={}))
+            for key, value in metric["values"]:
+                key = tuple(key)
+                if metric["type"] == HISTOGRAM:
+                    counts, total, count = target["values"].get(key) or ([0] * len(value[0]), 0.0, 0)
+                    target["values"][key] = ([a + b for a, b in zip(counts, value[0])], total + value[1], count + value[2])
+                else:
+                    target["values"][key] = target["values"].get(key, 0) + value
+    for metric in merged.values():
+        metric["values"] = [[list(key), value] for key, value in metric["values"].items()]
+    return merged
+
+
+def format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render(metrics):
+    """Prometheus text exposition format (version 0.0.4) of a snapshot or merged snapshots."""
+    lines = []
+    for name, metric in sorted(metrics.items()):
+        lines.append(f"# HELP {name} {metric['help']}")
+        lines.append(f"# TYPE {name} {metric['type']}")
+        for key, value in sorted(metric["values"], key=lambda item: item[0]):
+            if metric["type"] == HISTOGRAM:
+                counts, total, count = value
+                cumulative = 0
+                for bound, bucket_count in zip(metric["buckets"], counts):
+                    cumulative += bucket_count
+                    labels = format_labels(metric["labels"], key, [("le", format_value(float(bound)))])
+                    lines.append(f"{name}_bucket{labels} {cumulative}")
+                lines.append(f"{name}_bucket{format_labels(metric['labels'], key, [('le', '+Inf')])} {count}")
+                lines.append(f"{name}_sum{format_labels(metric['labels'], key)} {format_value(float(total))}")
+                lines.append(f"{name}_count{format_labels(metric['labels'], key)} {count}")
+            else:
+                lines.append(f"{name}{format_labels(metric['labels'], key)} {format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+class StageTimer(object):
+    """
+    Times the stages of one job. Spans can nest: a stage's time excludes the spans opened
+    inside it, so for example preprocessing that pulls decoded audio from ffmpeg is not
+    charged for the decode. Every span is observed in STAGE_SECONDS; totals() gives the
+    job's seconds and span count per stage.
+    """
+
+    def __init__(self):
+        self.seconds = collections.defaultdict(float)
+        self.counts = collections.defaultdict(int)
+        self.local = threading.local()
+        self.lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def span(self, stage):
+        stack = self.local.__dict__.setdefault("stack", [])
+        frame = [0.0]  # Seconds spent in nested spans
+        stack.append(frame)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            stack.pop()
+            if stack:
+                stack[-1][0] += elapsed
+            own = max(0.0, elapsed - frame[0])
+            with self.lock:
+                self.seconds[stage] += own
+                self.counts[stage] += 1
+            STAGE_SECONDS.observe(own, stage=stage)
+
+    def iterate(self, stage, iterable):
+        """Yields from iterable, timing each step of it as a span of stage."""
+        iterator = iter(iterable)
+        try:
+            while True:
+                with self.span(stage):
+                    try:
+                        item = next(iterator)
+                    except StopIteration:
+                        return
+                yield item
+        finally:
+            # Closing the wrapper closes a decoder generator too, which stops its ffmpeg process
+            if hasattr(iterator, "close"):
+                iterator.close()
+
+    def totals(self):
+        with self.lock:
+            return {stage: {"seconds": round(seconds, 4), "spans": self.counts[stage]}
+                    for stage, seconds in self.seconds.items()}
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "vidscribe_stage_seconds", "Time spent in each processing stage, per span (clip or whole step)", ["stage"]
+)
+RECOGNIZER_SECONDS = REGISTRY.histogram(
+    "vidscribe_recognizer_seconds", "Latency of speech recognizer calls, including failed ones", ["backend"]
+)
+CLIPS = REGISTRY.counter(
+    "vidscribe_clips_total", "Transcribed clips by outcome (text, no_audio, error)", ["result"]
+)
+ERRORS = REGISTRY.counter(
+    "vidscribe_errors_total", "Processing errors by stage and exception type", ["stage", "type"]
+)
+JOBS = REGISTRY.counter(
+    "vidscribe_jobs_total", "Finished processing runs by outcome (completed, failed)", ["status"]
+)
+HTTP_SECONDS = REGISTRY.histogram(
+    "vidscribe_http_request_seconds", "Time to produce an API response, by endpoint", ["endpoint", "method"]
+)
+SSE_SUBSCRIBERS = REGISTRY.gauge(
+    "vidscribe_sse_subscribers", "Open /stream connections"
+)
+SSE_FANOUT = REGISTRY.histogram(
+    "vidscribe_sse_fanout_subscribers", "Subscribers a server process delivered each stream event to", [],
+    buckets=(0, 1, 2, 4, 8, 16, 32, 64, 128, 256)
+)
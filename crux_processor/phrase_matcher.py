@@ -0,0 +1,66 @@
+import collections
+
+# Up to this many phrases, per-phrase substring tests (which run in C) beat walking the
+# automaton in Python; see benchmarks/bench_phrase_matcher.py for the crossover.
+DIRECT_MAX_PHRASES = 100
+
+
+class PhraseMatcher(object):
+    """
+    Aho-Corasick automaton over a set of search phrases, built once per query.
+    find(text) reports every phrase occurring in text with a single pass over it,
+    so matching cost no longer grows with the number of phrases.
+    """
+
+    def __init__(self, phrases, direct_max_phrases=DIRECT_MAX_PHRASES):
+        self.phrases = list(dict.fromkeys(phrase for phrase in phrases if phrase))
+        self.direct = len(self.phrases) <= direct_max_phrases
+        if not self.direct:
+            self.build()
+
+    def build(self):
+        goto = [{}]
+        outputs = [()]
+        for n, phrase in enumerate(self.phrases):
+            state = 0
+            for ch in phrase:
+                next_state = goto[state].get(ch)
+                if next_state is None:
+                    next_state = len(goto)
+                    goto[state][ch] = next_state
+                    goto.append({})
+                    outputs.append(())
+                state = next_state
+            outputs[state] += (n,)
+
+        # Breadth-first pass: failure links, and each state inherits its failure state's outputs
+        fail = [0] * len(goto)
+        queue = collections.deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, next_state in goto[state].items():
+                queue.append(next_state)
+                f = fail[state]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fallback = goto[f].get(ch, 0)
+                fail[next_state] = fallback if fallback != next_state else 0
+                outputs[next_state] += outputs[fail[next_state]]
+        self.goto = goto
+        self.fail = fail
+        self.outputs = outputs
+
+    def find(self, text):
+        """Returns the phrases found in text, in the order they were given."""
+        if self.direct:
+            return [phrase for phrase in self.phrases if phrase in text]
+        goto, fail, outputs = self.goto, self.fail, self.outputs
+        found = set()
+        state = 0
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if outputs[state]:
+                found.update(outputs[state])
+        return [self.phrases[n] for n in sorted(found)]
@@ -0,0 +1,265 @@
+import argparse
+import cProfile
+import contextlib
+import io
+import json
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+
+# Next to public/results-json, but not served as static files (see static_assets.PRIVATE_DIRS);
+# the server lists and downloads them through /api/Profiles
+DEFAULT_PROFILE_DIR = os.path.join("public", "results-profiles")
+PROFILE_FILES = ("profile.json", "cpu.prof", "cpu.txt", "memory.txt")
+TRACEMALLOC_FRAMES = 1  # Allocation sites by line; more frames cost more memory and time
+TOP_FUNCTIONS = 40
+TOP_ALLOCATIONS = 15
+
+_tracing_lock = threading.Lock()
+_tracing_jobs = 0  # Profiled jobs in this process sharing tracemalloc
+_tracing_owned = False  # Whether the profilers started tracemalloc (and so stop it)
+
+
+def start_tracing():
+    global _tracing_jobs, _tracing_owned
+    with _tracing_lock:
+        if _tracing_jobs == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+            _tracing_owned = True
+        _tracing_jobs += 1
+
+
+def stop_tracing():
+    global _tracing_jobs, _tracing_owned
+    with _tracing_lock:
+        _tracing_jobs -= 1
+        if _tracing_jobs == 0 and _tracing_owned:
+            tracemalloc.stop()
+            _tracing_owned = False
+
+
+class JobProfiler(object):
+    """
+    CPU profile and allocation snapshots of one processing job. cProfile only sees the
+    threads it is enabled in, so the job's own thread is profiled from start() to stop()
+    and the job's helper threads opt in through thread(), wrap() and iterate(); their
+    profiles are merged into one. Work done in other processes (preprocess_workers > 1)
+    shows up as time spent waiting on the pool. tracemalloc is process-wide, which is why
+    the server's job scheduler runs a profiled job alone in its process (api.runs_alone).
+    """
+
+    def __init__(self, video_name, directory=DEFAULT_PROFILE_DIR):
+        self.video_name = video_name
+        self.directory = directory
+        self.profiles = []
+        self.snapshots = []
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.previous = None
+        self.started = None
+
+    def start(self):
+        self.started = time.time()
+        self.start_time = time.perf_counter()
+        start_tracing()
+        tracemalloc.reset_peak()
+        self.main = self.thread()
+        self.main.__enter__()
+
+    @contextlib.contextmanager
+    def thread(self):
+        """Profiles the calling thread for the duration; nested uses in one thread are no-ops."""
+        if getattr(self.local, "active", False):
+            yield
+            return
+        profile = getattr(self.local, "profile", None)
+        if profile is None:
+            profile = self.local.profile = cProfile.Profile()
+            with self.lock:
+                self.profiles.append(profile)
+        try:
+            profile.enable()
+        except ValueError:
+            # Python 3.12+ allows one active profiler per process, which already sees every thread
+            yield
+            return
+        self.local.active = True
+        try:
+            yield
+        finally:
+            profile.disable()
+            self.local.active = False
+
+    def wrap(self, fn):
+        """fn, profiled in whichever thread calls it (e.g. a thread pool task)."""
+        def profiled(*args, **kwargs):
+            with self.thread():
+                return fn(*args, **kwargs)
+        return profiled
+
+    def iterate(self, iterable):
+        """Yields from iterable, profiling the thread that consumes it (e.g. a pipeline producer)."""
+        with self.thread():
+            yield from iterable
+
+    @contextlib.contextmanager
+    def paused(self):
+        """Keeps the profiler's own bookkeeping out of the calling thread's CPU profile."""
+        profile = self.local.profile if getattr(self.local, "active", False) else None
+        if profile:
+            profile.disable()
+        try:
+            yield
+        finally:
+            if profile:
+                profile.enable()
+
+    def snapshot(self, label):
+        """
+        Records traced memory, the peak since the previous snapshot, and the top allocation
+        sites and their growth. Only the latest raw snapshot is kept, for the next growth.
+        """
+        if not tracemalloc.is_tracing():
+            return
+        with self.paused():
+            self.take_snapshot(label)
+
+    def take_snapshot(self, label):
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        snapshot = tracemalloc.take_snapshot()
+        entry = {
+            "label": label,
+            "at_seconds": round(time.perf_counter() - self.start_time, 3),
+            "traced_bytes": current,
+            "peak_bytes": peak,
+            "top": [(str(stat.traceback), stat.size, stat.count)
+                    for stat in snapshot.statistics("lineno")[:TOP_ALLOCATIONS]],
+            "growth": [],
+        }
+        if self.previous is not None:
+            entry["growth"] = [(str(stat.traceback), stat.size_diff, stat.count_diff)
+                               for stat in snapshot.compare_to(self.previous, "lineno")[:TOP_ALLOCATIONS]]
+        with self.lock:
+            self.previous = snapshot
+            self.snapshots.append(entry)
+
+    def stop(self, **details):
+        """Stops profiling and writes the profile directory. Returns its id."""
+        self.snapshot("end")
+        self.main.__exit__(None, None, None)
+        stop_tracing()
+        self.previous = None
+        seconds = time.perf_counter() - self.start_time
+
+        profile_id = make_profile_dir(self.directory, self.video_name, self.started)
+        path = os.path.join(self.directory, profile_id)
+        with self.lock:
+            profiles = [profile for profile in self.profiles if profile.getstats()]
+        stats = pstats.Stats(*profiles) if profiles else None
+        if stats:
+            stats.dump_stats(os.path.join(path, "cpu.prof"))
+        with open(os.path.join(path, "cpu.txt"), "w") as f:
+            f.write(format_cpu(stats))
+        with open(os.path.join(path, "memory.txt"), "w") as f:
+            f.write(format_memory(self.snapshots))
+        with open(os.path.join(path, "profile.json"), "w") as f:
+            json.dump(dict({
+                "id": profile_id,
+                "video_name": self.video_name,
+                "created": self.started,
+                "seconds": round(seconds, 3),
+                "threads": len(profiles),
+                "snapshots": [{key: entry[key] for key in ("label", "at_seconds", "traced_bytes", "peak_bytes")}
+                              for entry in self.snapshots],
+            }, **details), f, indent=4)
+        return profile_id
+
+
+def make_profile_dir(directory, video_name, started):
+    """Creates <video>-<YYYYmmdd-HHMMSS>[-n] in directory and returns that id."""
+    os.makedirs(directory, exist_ok=True)
+    base = f"{video_name}-{time.strftime('%Y%m%d-%H%M%S', time.localtime(started))}"
+    profile_id, n = base, 1
+    while True:
+        try:
+            os.mkdir(os.path.join(directory, profile_id))
+            return profile_id
+        except FileExistsError:
+            profile_id, n = f"{base}-{n}", n + 1
+
+
+def format_cpu(stats):
+    if stats is None:
+        return "No profiled calls.\n"
+    text = io.StringIO()
+    stats.stream = text
+    for key, title in (("cumulative", "cumulative time"), ("tottime", "own time")):
+        text.write(f"=== Top {TOP_FUNCTIONS} functions by {title} ===\n")
+        stats.sort_stats(key).print_stats(TOP_FUNCTIONS)
+    return text.getvalue()
+
+
+def format_memory(snapshots):
+    lines = []
+    for entry in snapshots:
+        lines.append(f"=== {entry['label']} at {entry['at_seconds']}s: {entry['traced_bytes'] / 1e6:.1f} MB traced, "
+                     f"peak {entry['peak_bytes'] / 1e6:.1f} MB since the previous snapshot ===")
+        lines.append("Top allocation sites:")
+        lines.extend(f"  {size / 1e3:10.1f} kB {count:8d} blocks  {site}" for site, size, count in entry["top"])
+        if entry["growth"]:
+            lines.append("Growth since the previous snapshot:")
+            lines.extend(f"  {size / 1e3:+10.1f} kB {count:+8d} blocks  {site}" for site, size, count in entry["growth"])
+        lines.append("")
+    return "\n".join(lines) + "\n"
+
+
+def list_profiles(directory=DEFAULT_PROFILE_DIR, video_name=None):
+    """Metadata of the stored profiles, newest first, optionally for one video."""
+    profiles = []
+    if not os.path.isdir(directory):
+        return profiles
+    for profile_id in os.listdir(directory):
+        try:
+            with open(os.path.join(directory, profile_id, "profile.json")) as f:
+                profile = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if video_name and profile.get("video_name") != video_name:
+            continue
+        profile["files"] = [name for name in PROFILE_FILES if os.path.isfile(os.path.join(directory, profile_id, name))]
+        profiles.append(profile)
+    return sorted(profiles, key=lambda profile: profile.get("created") or 0, reverse=True)
+
+
+def profile_file(directory, profile_id, file_name):
+    """Path of one file of a stored profile, or None for unknown ids and file names."""
+    if file_name not in PROFILE_FILES or profile_id in ("", ".", "..") or os.path.basename(profile_id) != profile_id:
+        return None
+    path = os.path.join(directory, profile_id, file_name)
+    return path if os.path.isfile(path) else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='List stored processing profiles or print one.')
+    parser.add_argument('profile_id', nargs='?', help='Profile to print (default: list profiles)')
+    parser.add_argument('--video', help='Only list profiles of this video')
+    parser.add_argument('--file', default='cpu.txt', choices=[name for name in PROFILE_FILES if name != 'cpu.prof'])
+    parser.add_argument('--dir', default=DEFAULT_PROFILE_DIR, help='Profile directory')
+    args = parser.parse_args()
+
+    if args.profile_id:
+        path = profile_file(args.dir, args.profile_id, args.file)
+        if path is None:
+            parser.error(f"No {args.file} for profile {args.profile_id}")
+        with open(path) as f:
+            print(f.read())
+        return
+    for profile in list_profiles(args.dir, args.video):
+        print(f"{profile['id']}: {profile['seconds']}s, {profile['threads']} threads, {len(profile['snapshots'])} snapshots")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,327 @@
+import contextlib
+import logging
+import os
+import re
+import sqlite3
+import zlib
+
+from crux_processor import phrase_matcher, transcript_store
+
+DEFAULT_INDEX_PATH = os.path.join("cache", "search-index.sqlite3")  # Base name; shards add "-<n>"
+INDEX_SHARDS = 8  # Videos are spread over this many index files by name hash
+SCHEMA_VERSION = 2  # Bumped when the layout changes; the index is rebuilt from the transcript store
+
+TOKEN_PATTERN = re.compile(r"\w+")
+MIN_LOOKUP_LENGTH = 2  # Shorter word runs match nearly every clip, so they are not looked up
+MAX_RUNS_PER_PHRASE = 4  # Word runs of a phrase intersected in SQL; the substring test checks the rest
+LIKE_MAX_PHRASES = 16  # Up to this many phrases are looked up with one LIKE query each
+
+
+def tokenize(text):
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def like_pattern(run):
+    """SQL LIKE pattern matching tokens that contain run."""
+    return "%" + run.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+
+def shard_of(video_name):
+    return zlib.crc32(video_name.encode("utf-8")) % INDEX_SHARDS
+
+
+def shard_path(index_path, shard):
+    root, ext = os.path.splitext(index_path)
+    return f"{root}-{shard}{ext}"
+
+
+def index_for(index_path, video_name, clip_duration=10):
+    """The TranscriptIndex shard that holds video_name."""
+    return TranscriptIndex(shard_path(index_path, shard_of(video_name)), clip_duration)
+
+
+def group_by_shard(video_names):
+    """Returns {shard: [video names]}, keeping the given order within each shard."""
+    shards = {}
+    for video_name in dict.fromkeys(video_names):
+        shards.setdefault(shard_of(video_name), []).append(video_name)
+    return shards
+
+
+class TranscriptIndex(object):
+    """
+    On-disk inverted index over the transcript store: token -> clips containing it.
+    Each video is (re)indexed as a unit when its transcript is saved, or lazily when its
+    store file changed on disk since it was indexed, so the index never serves stale text.
+    Store files are only compared after the store's generation changed (see refresh).
+    The index only keeps clip positions; clip text is read from the memory-mapped store.
+
+    Matching keeps the substring semantics of the original scan: every word run of a
+    search phrase must occur inside some token of a matching clip, so candidate clips
+    come from the postings of vocabulary tokens containing those runs, and are then
+    confirmed with the same substring test on the clip text.
+    """
+
+    def __init__(self, path=DEFAULT_INDEX_PATH, clip_duration=10):
+        self.path = path
+        self.clip_duration = clip_duration  # Used when importing legacy dialog JSON
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self.connect() as conn:
+            if conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+                conn.executescript("""
+                    DROP TABLE IF EXISTS videos;
+                    DROP TABLE IF EXISTS clips;
+                    DROP TABLE IF EXISTS vocabulary;
+                    DROP TABLE IF EXISTS postings;
+                """)
+                conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS videos (
+                    video TEXT PRIMARY KEY,
+                    signature TEXT
+                );
+                CREATE TABLE IF NOT EXISTS clips (
+                    clip_id INTEGER PRIMARY KEY,
+                    video TEXT NOT NULL,
+                    row INTEGER NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS clips_video ON clips (video);
+                CREATE TABLE IF NOT EXISTS vocabulary (
+                    token_id INTEGER PRIMARY KEY,
+                    token TEXT NOT NULL UNIQUE
+                );
+                CREATE TABLE IF NOT EXISTS postings (
+                    token_id INTEGER NOT NULL,
+                    clip_id INTEGER NOT NULL,
+                    PRIMARY KEY (clip_id, token_id)
+                ) WITHOUT ROWID;
+                CREATE INDEX IF NOT EXISTS postings_token ON postings (token_id);
+                CREATE TABLE IF NOT EXISTS state (
+                    key TEXT PRIMARY KEY,
+                    value TEXT
+                );
+            """)
+
+    @contextlib.contextmanager
+    def connect(self):
+        """Short-lived connection per operation, committed on success; safe across threads and processes."""
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def index_video(self, video_name, path=None):
+        """Replaces the indexed transcript of video_name with the contents of its store file."""
+        path = path or transcript_store.store_path(video_name)
+        signature = transcript_store.file_signature(path)
+        with transcript_store.TranscriptFile(path) as transcript:
+            # NO AUDIO clips are never search hits, so they are not indexed
+            row_tokens = [(int(row), set(tokenize(transcript.text(row)))) for row in transcript.searchable_rows()]
+        with self.connect() as conn:
+            self._delete_video(conn, video_name)
+            clip_tokens = []
+            for row, tokens in row_tokens:
+                clip_id = conn.execute("INSERT INTO clips (video, row) VALUES (?, ?)", (video_name, row)).lastrowid
+                clip_tokens.append((clip_id, tokens))
+            vocabulary = list(set().union(*(tokens for _, tokens in clip_tokens)))
+            conn.executemany("INSERT OR IGNORE INTO vocabulary (token) VALUES (?)", [(t,) for t in vocabulary])
+            token_ids = {}
+            for start in range(0, len(vocabulary), 500):
+                batch = vocabulary[start:start + 500]
+                token_ids.update(conn.execute(
+                    f"SELECT token, token_id FROM vocabulary WHERE token IN ({','.join('?' * len(batch))})", batch
+                ))
+            conn.executemany(
+                "INSERT OR IGNORE INTO postings (token_id, clip_id) VALUES (?, ?)",
+                [(token_ids[t], clip_id) for clip_id, tokens in clip_tokens for t in tokens]
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO videos (video, signature) VALUES (?, ?)", (video_name, signature)
+            )
+        logging.info(f"Indexed transcript of '{video_name}' ({len(row_tokens)} searchable clips)")
+
+    def remove_video(self, video_name):
+        with self.connect() as conn:
+            self._delete_video(conn, video_name)
+
+    def _delete_video(self, conn, video_name):
+        conn.execute(
+            "DELETE FROM postings WHERE clip_id IN (SELECT clip_id FROM clips WHERE video = ?)", (video_name,)
+        )
+        conn.execute("DELETE FROM clips WHERE video = ?", (video_name,))
+        conn.execute("DELETE FROM videos WHERE video = ?", (video_name,))
+
+    def refresh(self, video_names):
+        """
+        Makes sure the index matches the transcript store for each video, reindexing
+        those whose file changed (legacy dialog JSON is imported first). Returns the videos
+        that have a usable transcript, in order; videos without one are dropped from the index.
+
+        While the store's generation is the one recorded at the last full check, no
+        transcript was saved since, so only videos missing from the index are looked at
+        and a search costs nothing per indexed video. After a save, every video of this
+        index is checked once and the new generation recorded.
+        """
+        # Read before checking files, so a save racing with the check shows up next time
+        generation = transcript_store.generation()
+        with self.connect() as conn:
+            indexed = dict(conn.execute("SELECT video, signature FROM videos"))
+            row = conn.execute("SELECT value FROM state WHERE key = 'generation'").fetchone()
+        if row is not None and row[0] == generation:
+            checks = [video_name for video_name in dict.fromkeys(video_names) if video_name not in indexed]
+        else:
+            checks = list(dict.fromkeys(list(indexed) + list(video_names)))
+
+        available = set(indexed)
+        for video_name in checks:
+            try:
+                path = transcript_store.ensure_video_transcript(video_name, self.clip_duration)
+                if path and indexed.get(video_name) != transcript_store.file_signature(path):
+                    self.index_video(video_name, path)
+            except (OSError, ValueError) as e:
+                logging.warning(f"Failed to load transcript of {video_name}: {e}")
+                path = None
+            if path is None:
+                if video_name in indexed:
+                    self.remove_video(video_name)
+                available.discard(video_name)
+            else:
+                available.add(video_name)
+        if row is None or row[0] != generation:
+            with self.connect() as conn:
+                conn.execute("INSERT OR REPLACE INTO state (key, value) VALUES ('generation', ?)", (generation,))
+        return [video_name for video_name in video_names if video_name in available]
+
+    def search(self, phrases, video_names):
+        """
+        Returns [(video, clip_number, start, end, text, terms)] for clips of video_names whose
+        lowercased text contains any of the (lowercase) phrases, in video then clip order.
+        terms lists every phrase found in the clip, in the order the phrases were given.
+        """
+        matcher = phrase_matcher.PhraseMatcher(phrases)
+        if not matcher.phrases or not video_names:
+            return []
+        phrase_runs = []
+        for phrase in matcher.phrases:
+            runs = sorted({run for run in tokenize(phrase) if len(run) >= MIN_LOOKUP_LENGTH}, key=len, reverse=True)
+            phrase_runs.append(runs[:MAX_RUNS_PER_PHRASE])
+
+        if not all(phrase_runs):
+            # Nothing selective to look up (punctuation, single letters); every clip is a candidate
+            candidates = {video_name: None for video_name in video_names}
+        else:
+            with self.connect() as conn:
+                candidates = self.candidate_rows(conn, phrase_runs, video_names)
+
+        # Confirm candidates with the same substring semantics the dialog JSON scan used
+        matches = []
+        for video_name in video_names:
+            if video_name not in candidates:
+                continue
+            with transcript_store.TranscriptFile(transcript_store.store_path(video_name)) as transcript:
+                rows = candidates[video_name]
+                rows = transcript.searchable_rows() if rows is None else sorted(rows)
+                for row in rows:
+                    if row >= len(transcript):
+                        continue  # Store rewritten since the index was read; reindexed on the next refresh
+                    text = transcript.text(row)
+                    terms = matcher.find(text.lower())
+                    if terms:
+                        matches.append((video_name, int(transcript.clip_numbers[row]), transcript.start_seconds(row),
+                                        transcript.end_seconds(row), text, terms))
+        return matches
+
+    def candidate_rows(self, conn, phrase_runs, video_names):
+        """Returns {video: [store rows]} of clips that may contain one of the phrases."""
+        if len(phrase_runs) <= LIKE_MAX_PHRASES:
+            candidate_ids = set()
+            for runs in phrase_runs:
+                # A matching clip has every word run of the phrase inside one of its tokens.
+                # CROSS JOIN keeps the vocabulary as the outer loop instead of scanning postings.
+                query = " INTERSECT ".join(
+                    "SELECT p.clip_id FROM vocabulary v CROSS JOIN postings p ON p.token_id = v.token_id "
+                    "WHERE v.token LIKE ? ESCAPE '\\'" for _ in runs
+                )
+                candidate_ids.update(row[0] for row in conn.execute(query, [like_pattern(run) for run in runs]))
+        else:
+            # Many phrases: one automaton pass over the vocabulary finds the tokens
+            # containing any phrase's longest run, instead of a LIKE scan per phrase
+            run_matcher = phrase_matcher.PhraseMatcher([runs[0] for runs in phrase_runs])
+            token_ids = [token_id for token_id, token in conn.execute("SELECT token_id, token FROM vocabulary")
+                         if run_matcher.find(token)]
+            conn.execute("CREATE TEMP TABLE IF NOT EXISTS search_tokens (token_id INTEGER PRIMARY KEY)")
+            conn.execute("DELETE FROM search_tokens")
+            conn.executemany("INSERT INTO search_tokens VALUES (?)", [(t,) for t in token_ids])
+            candidate_ids = [row[0] for row in conn.execute(
+                "SELECT DISTINCT p.clip_id FROM search_tokens s CROSS JOIN postings p ON p.token_id = s.token_id"
+            )]
+        if not candidate_ids:
+            return {}
+        video_params = list(video_names)
+        conn.execute("CREATE TEMP TABLE IF NOT EXISTS search_clips (clip_id INTEGER PRIMARY KEY)")
+        conn.execute("DELETE FROM search_clips")
+        conn.executemany("INSERT OR IGNORE INTO search_clips VALUES (?)", [(c,) for c in candidate_ids])
+        candidates = {}
+        for video_name, row in conn.execute(
+            "SELECT c.video, c.row FROM search_clips s CROSS JOIN clips c ON c.clip_id = s.clip_id "
+            f"WHERE c.video IN ({','.join('?' * len(video_params))})", video_params
+        ):
+            candidates.setdefault(video_name, []).append(row)
+        return candidates
+
+
+def scan(phrases, video_names, clip_duration=10):
+    """
+    Index-free search straight over the transcript store, with the same results as
+    TranscriptIndex.search. Used when the index is disabled or unavailable.
+    """
+    matcher = phrase_matcher.PhraseMatcher(phrases)
+    matches = []
+    for video_name in dict.fromkeys(video_names):
+        try:
+            path = transcript_store.ensure_video_transcript(video_name, clip_duration)
+            if path is None:
+                logging.warning(f"No transcript for {video_name}")
+                continue
+            with transcript_store.TranscriptFile(path) as transcript:
+                # NO AUDIO clips are skipped using the status column alone
+                for row in transcript.searchable_rows():
+                    text = transcript.text(row)
+                    terms = matcher.find(text.lower())
+                    if terms:
+                        matches.append((video_name, int(transcript.clip_numbers[row]), transcript.start_seconds(row),
+                                        transcript.end_seconds(row), text, terms))
+        except (OSError, ValueError) as e:
+            logging.warning(f"Failed to load transcript of {video_name}: {e}")
+    return matches
+
+
+def search_shard(index_path, shard, clip_duration, phrases, video_names):
+    """
+    Searches the videos of one index shard; runs in a worker process for corpus searches.
+    Falls back to scanning the store if the shard's index is unavailable.
+    """
+    try:
+        index = TranscriptIndex(shard_path(index_path, shard), clip_duration)
+        return index.search(phrases, index.refresh(video_names))
+    except sqlite3.Error as e:
+        logging.warning(f"Search index shard {shard} unavailable, scanning transcripts instead: {e}")
+        return scan(phrases, video_names, clip_duration)
+
+
+def search(index_path, clip_duration, phrases, video_names):
+    """Searches video_names shard by shard in this process; results in video_names then clip order."""
+    matches = []
+    for shard, shard_videos in group_by_shard(video_names).items():
+        matches.extend(search_shard(index_path, shard, clip_duration, phrases, shard_videos))
+    return sort_matches(matches, video_names)
+
+
+def sort_matches(matches, video_names):
+    order = {video_name: n for n, video_name in enumerate(dict.fromkeys(video_names))}
+    return sorted(matches, key=lambda match: (order[match[0]], match[1]))
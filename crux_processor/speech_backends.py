@@ -0,0 +1,214 @@
+import argparse
+import hashlib
+import io
+import json
+import logging
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+import wave
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import speech_recognition as sr
+
+STUB_VOCABULARY = [
+    "the", "video", "speech", "search", "clip", "audio", "people", "time", "world", "carbon",
+    "music", "science", "energy", "story", "question", "answer", "morning", "water", "light", "signal",
+]
+
+
+class SpeechBackend(object):
+    """
+    Base class for speech recognition engines used by RequestSpeech.
+    recognize() takes the calling thread's sr.Recognizer and an sr.AudioData, returns the
+    transcript and raises sr.UnknownValueError (no speech) or sr.RequestError (service
+    failure) exactly like the speech_recognition engines do.
+    """
+    name = None
+    defaults = {}
+
+    def __init__(self, **settings):
+        unknown = set(settings) - set(self.defaults)
+        if unknown:
+            raise TypeError(f"Unknown settings for '{self.name}' backend: {', '.join(sorted(unknown))}")
+        self.settings = dict(self.defaults, **settings)
+
+    def recognize(self, recognizer, audio):
+        raise NotImplementedError
+
+    def describe(self):
+        """Stable description of the engine and its settings, e.g. for cache keys."""
+        return json.dumps({"backend": self.name, "settings": self.settings}, sort_keys=True)
+
+
+class GoogleBackend(SpeechBackend):
+    """The Google Web Speech API via sr.Recognizer.recognize_google."""
+    name = "google"
+    defaults = {"language": "en-US", "key": None}
+
+    def recognize(self, recognizer, audio):
+        return recognizer.recognize_google(
+            audio,
+            key=self.settings["key"],
+            language=self.settings["language"],
+            show_all=False
+        )
+
+    def describe(self):
+        # Never leak the API key into cache keys or logs
+        return json.dumps({"backend": self.name, "language": self.settings["language"]}, sort_keys=True)
+
+
+def stub_transcript(frame_data, sample_width, words_per_clip=8, silence_rms=50):
+    """
+    Deterministic fake transcript for a clip: the same PCM always produces the same words.
+    Raises sr.UnknownValueError for near-silent audio, like a real engine would.
+    """
+    dtype = {1: np.int8, 2: np.int16, 4: np.int32}.get(sample_width, np.int16)
+    samples = np.frombuffer(frame_data[:len(frame_data) - len(frame_data) % sample_width], dtype=dtype)
+    if samples.size == 0 or np.sqrt(np.mean(samples.astype(np.float64) ** 2)) < silence_rms:
+        raise sr.UnknownValueError()
+    digest = hashlib.sha256(frame_data).digest()
+    return " ".join(STUB_VOCABULARY[digest[i % len(digest)] % len(STUB_VOCABULARY)] for i in range(words_per_clip))
+
+
+class StubBackend(SpeechBackend):
+    """
+    In-process engine with no network access. Transcripts are derived from a hash of the
+    audio and latency is simulated with sleep. Errors are injected per request at
+    error_rate from a seeded RNG, so a retried request can succeed and runs are
+    reproducible for a given seed and request order.
+    """
+    name = "stub"
+    defaults = {"latency": 0.0, "error_rate": 0.0, "words_per_clip": 8, "silence_rms": 50, "seed": 0}
+
+    def __init__(self, **settings):
+        super().__init__(**settings)
+        self.rng = random.Random(self.settings["seed"])
+        self.rng_lock = threading.Lock()
+
+    def recognize(self, recognizer, audio):
+        if self.settings["latency"]:
+            time.sleep(self.settings["latency"])
+        if self.settings["error_rate"]:
+            with self.rng_lock:
+                fail = self.rng.random() < self.settings["error_rate"]
+            if fail:
+                raise sr.RequestError("stub engine injected error")
+        return stub_transcript(audio.frame_data, audio.sample_width,
+                               self.settings["words_per_clip"], self.settings["silence_rms"])
+
+
+class LocalHttpBackend(SpeechBackend):
+    """
+    Posts the clip as WAV to an HTTP engine such as the one started by serve_stub_engine.
+    The engine answers {"transcript": "..."}; an empty transcript means no speech.
+    """
+    name = "http"
+    defaults = {"url": "http://127.0.0.1:4010/recognize", "timeout": 30}
+
+    def recognize(self, recognizer, audio):
+        request = urllib.request.Request(
+            self.settings["url"],
+            data=audio.get_wav_data(),
+            headers={"Content-Type": "audio/wav"},
+            method="POST"
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.settings["timeout"]) as response:
+                result = json.loads(response.read().decode("utf-8"))
+        except urllib.error.HTTPError as e:
+            raise sr.RequestError(f"recognition request failed: {e.code} {e.reason}")
+        except (urllib.error.URLError, OSError, ValueError) as e:
+            raise sr.RequestError(f"recognition connection failed: {e}")
+        transcript = result.get("transcript")
+        if not transcript:
+            raise sr.UnknownValueError()
+        return transcript
+
+
+BACKENDS = {backend.name: backend for backend in (GoogleBackend, StubBackend, LocalHttpBackend)}
+
+
+def get_backend(name, **settings):
+    """Builds the backend registered under name, e.g. get_backend("stub", latency=0.2)."""
+    try:
+        backend_class = BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown speech backend '{name}'. Available: {', '.join(sorted(BACKENDS))}")
+    return backend_class(**settings)
+
+
+def make_stub_engine_server(host="127.0.0.1", port=4010, latency=0.0, jitter=0.0, error_rate=0.0,
+                            words_per_clip=8, seed=0):
+    """
+    Returns a ThreadingHTTPServer that stands in for a remote recognizer. POST /recognize
+    with a WAV body; responses are delayed by latency +/- jitter seconds and fail with 503
+    at error_rate, using a seeded RNG so runs are reproducible.
+    """
+    rng = random.Random(seed)
+    rng_lock = threading.Lock()
+
+    class StubEngineHandler(BaseHTTPRequestHandler):
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            with rng_lock:
+                delay = max(0.0, latency + rng.uniform(-jitter, jitter))
+                fail = rng.random() < error_rate
+            time.sleep(delay)
+            if self.path != "/recognize":
+                return self.reply(404, {"error": "not found"})
+            if fail:
+                return self.reply(503, {"error": "injected failure"})
+            try:
+                with wave.open(io.BytesIO(body), "rb") as w:
+                    frame_data = w.readframes(w.getnframes())
+                    sample_width = w.getsampwidth()
+            except (wave.Error, EOFError) as e:
+                return self.reply(400, {"error": f"invalid wav: {e}"})
+            try:
+                transcript = stub_transcript(frame_data, sample_width, words_per_clip)
+            except sr.UnknownValueError:
+                transcript = ""
+            self.reply(200, {"transcript": transcript})
+
+        def reply(self, status, payload):
+            data = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            logging.debug("stub engine: " + format % args)
+
+    return ThreadingHTTPServer((host, port), StubEngineHandler)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run a local stand-in speech recognition engine.')
+    parser.add_argument('--host', type=str, default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=4010)
+    parser.add_argument('--latency', type=float, default=0.3, help='Mean response delay in seconds')
+    parser.add_argument('--jitter', type=float, default=0.1, help='Uniform +/- delay jitter in seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests answered with 503')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    server = make_stub_engine_server(args.host, args.port, args.latency, args.jitter, args.error_rate, seed=args.seed)
+    print(f"Stub speech engine listening on http://{args.host}:{args.port}/recognize")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+import argparse
+import gzip
+import hashlib
+import os
+import re
+
+try:
+    import brotli
+except ImportError:  # Optional: .br variants are only built when the brotli package is installed
+    brotli = None
+
+PUBLIC_DIR = "public"
+COMPRESSIBLE_EXTENSIONS = (".css", ".js", ".json", ".map", ".svg", ".ttf", ".eot", ".ico", ".txt")
+# Media is already compressed, and results are rewritten at runtime; neither is precompressed.
+# HTML pages are rewritten per request with asset versions (see AssetVersions).
+SKIP_DIRS = ("videos", "audio", "img", "results-json", "results-store", "results-profiles")
+# Under the static folder but not served from it: job profiles go through /api/Profiles only
+PRIVATE_DIRS = ("results-profiles",)
+MIN_SIZE = 1024  # Smaller files are not worth a variant
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))  # In order of preference
+
+# Cache lifetimes in seconds. Assets requested with their current content hash (?v=...)
+# never change under that URL; results are rewritten by processing, so they only get a
+# short TTL and are revalidated with their ETag afterwards.
+VERSIONED_MAX_AGE = 365 * 24 * 3600
+STATIC_MAX_AGE = 3600
+RESULTS_MAX_AGE = 10
+VERSION_LENGTH = 12
+
+# Local stylesheet, script, font and image references in the HTML pages
+ASSET_REFERENCE = re.compile(r'((?:href|src)=")((?:css|js|fonts|img)/[^"?#]+)(")')
+
+
+def compress_file(path):
+    """Writes the .gz (and .br) variants of path when they are smaller. Returns the paths written."""
+    with open(path, "rb") as f:
+        data = f.read()
+    variants = [(".gz", gzip.compress(data, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        variants.append((".br", brotli.compress(data, quality=11)))
+    written = []
+    for extension, compressed in variants:
+        if len(compressed) >= len(data):
+            continue
+        with open(path + extension, "wb") as f:
+            f.write(compressed)
+        written.append(path + extension)
+    return written
+
+
+def build(root=PUBLIC_DIR):
+    """
+    Precompresses every compressible static file under root, skipping files whose
+    variants are already up to date. Returns (files compressed, bytes before, bytes after).
+    """
+    compressed = before = after = 0
+    for directory, subdirs, files in os.walk(root):
+        if directory == root:
+            subdirs[:] = [d for d in subdirs if d not in SKIP_DIRS]
+        for name in files:
+            path = os.path.join(directory, name)
+            if not name.endswith(COMPRESSIBLE_EXTENSIONS) or os.path.getsize(path) < MIN_SIZE:
+                continue
+            extensions = [extension for encoding, extension in ENCODINGS if encoding != "br" or brotli is not None]
+            if not all(is_fresh(path, path + extension) for extension in extensions) and compress_file(path):
+                compressed += 1
+            before += os.path.getsize(path)
+            after += min([os.path.getsize(path)] + [
+                os.path.getsize(path + extension) for _, extension in ENCODINGS if os.path.isfile(path + extension)
+            ])
+    return compressed, before, after
+
+
+def is_fresh(path, variant):
+    return os.path.isfile(variant) and os.stat(variant).st_mtime_ns >= os.stat(path).st_mtime_ns
+
+
+def pick_variant(path, accept_encodings):
+    """
+    Returns (path to send, Content-Encoding or None): the most preferred precompressed
+    variant the client accepts, as long as it is not older than the file itself.
+    accept_encodings maps an encoding to the client's quality for it (0 if not accepted).
+    """
+    for encoding, extension in ENCODINGS:
+        if accept_encodings[encoding] and is_fresh(path, path + extension):
+            return path + extension, encoding
+    return path, None
+
+
+def has_variants(path):
+    return any(os.path.isfile(path + extension) for _, extension in ENCODINGS)
+
+
+def is_private(root, path):
+    """True when path, a file under root, is in one of PRIVATE_DIRS."""
+    relative = os.path.relpath(os.path.realpath(path), os.path.realpath(root))
+    return relative.split(os.sep, 1)[0] in PRIVATE_DIRS
+
+
+def cache_max_age(filename, versioned):
+    if versioned:
+        return VERSIONED_MAX_AGE
+    if filename.startswith("results-json/"):
+        return RESULTS_MAX_AGE
+    return STATIC_MAX_AGE
+
+
+class AssetVersions(object):
+    """
+    Content hashes of static files, recomputed only when a file's mtime or size changes.
+    HTML pages are served with ?v=<hash> appended to their asset references, so those
+    URLs can be cached as immutable and still change whenever the file does.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.hashes = {}
+
+    def version(self, filename):
+        path = os.path.join(self.root, filename)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        key = (stat.st_mtime_ns, stat.st_size)
+        cached = self.hashes.get(filename)
+        if cached is None or cached[0] != key:
+            with open(path, "rb") as f:
+                cached = (key, hashlib.sha256(f.read()).hexdigest()[:VERSION_LENGTH])
+            self.hashes[filename] = cached
+        return cached[1]
+
+    def stamp_html(self, html):
+        def stamp(match):
+            version = self.version(match.group(2))
+            if version is None:
+                return match.group(0)
+            return f"{match.group(1)}{match.group(2)}?v={version}{match.group(3)}"
+        return ASSET_REFERENCE.sub(stamp, html)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Precompress the static UI assets (gzip, and brotli if installed).')
+    parser.add_argument('--root', default=PUBLIC_DIR, help='Static folder to compress')
+    args = parser.parse_args()
+
+    compressed, before, after = build(args.root)
+    encodings = "gzip and brotli" if brotli is not None else "gzip (install brotli for .br variants)"
+    print(f"Compressed {compressed} files with {encodings}: {before} bytes -> {after} bytes for capable clients")
+
+
+if __name__ == '__main__':
+    main()
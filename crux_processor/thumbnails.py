@@ -0,0 +1,241 @@
+import argparse
+import json
+import logging
+import math
+import os
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from PIL import Image
+
+VIDEO_DIR = os.path.join("public", "videos")
+IMG_DIR = os.path.join("public", "img")
+THUMB_DIR = os.path.join(IMG_DIR, "thumbs")
+SPRITE_DIR = os.path.join(IMG_DIR, "sprites")
+
+# The UI's original poster stays a PNG at this size; the smaller sizes are WebP
+POSTER_SIZE = (810, 449)
+THUMBNAIL_SIZES = {"large": (810, 449), "medium": (405, 225), "small": (202, 112)}
+THUMBNAIL_QUALITY = 80
+
+# One sprite frame per clip interval; matches RequestSpeech.clip_duration so a search
+# hit's clip number is also its frame number
+SPRITE_INTERVAL = 10  # seconds
+SPRITE_FRAME_SIZE = (160, 90)
+SPRITE_COLUMNS = 10
+SPRITE_QUALITY = 70
+
+WORKERS = int(os.environ.get("VIDSCRIBE_THUMBNAIL_WORKERS", os.cpu_count() or 1))
+
+
+def thumbnail_path(name, size):
+    return os.path.join(THUMB_DIR, f"{name}-{size}.webp")
+
+
+def sprite_path(name):
+    return os.path.join(SPRITE_DIR, f"{name}.webp")
+
+
+def sprite_manifest_path(name):
+    return os.path.join(SPRITE_DIR, f"{name}.json")
+
+
+def preview_paths(name):
+    """Every thumbnail and sprite file that may exist for a video."""
+    paths = [thumbnail_path(name, size) for size in THUMBNAIL_SIZES]
+    image = os.path.splitext(sprite_path(name))[0]
+    return paths + [f"{image}.webp", f"{image}.jpg", sprite_manifest_path(name)]
+
+
+def load_rgb(source_path, size):
+    """
+    Opens an image for downscaling to size. JPEG sources are decoded straight at a reduced
+    scale (1/2 to 1/8) in draft mode. Other formats, such as the WebP thumbnails yt-dlp
+    fetches, are decoded in full and then box-reduced by the largest integer factor that
+    keeps them at least size, so the LANCZOS resizes that follow work on fewer pixels.
+    """
+    img = Image.open(source_path)
+    img.draft('RGB', size)
+    if img.mode in ('RGBA', 'LA', 'P'):
+        img = img.convert('RGBA')
+        background = Image.new('RGB', img.size, (255, 255, 255))
+        background.paste(img, mask=img.split()[-1])
+        img = background
+    else:
+        img = img.convert('RGB')
+    factor = min(img.width // size[0], img.height // size[1])
+    return img.reduce(factor) if factor > 1 else img
+
+
+def make_thumbnails(source_path, name, sizes=None):
+    """
+    Writes the PNG poster (public/img/<name>.png) and a WebP per entry of sizes from one
+    decode of source_path. The source is resampled once, to the largest size by area;
+    sizes that fit inside it are scaled down from that, any others from the source.
+    Returns the paths written.
+    """
+    sizes = THUMBNAIL_SIZES if sizes is None else sizes
+    all_sizes = [POSTER_SIZE] + list(sizes.values())
+    largest = max(all_sizes, key=lambda size: size[0] * size[1])
+    # Decode at least as large as every size in both dimensions
+    bounds = (max(width for width, _ in all_sizes), max(height for _, height in all_sizes))
+    os.makedirs(THUMB_DIR, exist_ok=True)
+    with load_rgb(source_path, bounds) as img:
+        base = img.resize(largest, Image.Resampling.LANCZOS)
+
+        def scaled(size):
+            if size == largest:
+                return base
+            source = base if base.width >= size[0] and base.height >= size[1] else img
+            return source.resize(size, Image.Resampling.LANCZOS)
+
+        poster = os.path.join(IMG_DIR, f"{name}.png")
+        scaled(POSTER_SIZE).save(poster, 'PNG')
+        written = [poster]
+        for size_name, size in sizes.items():
+            path = thumbnail_path(name, size_name)
+            scaled(size).save(path, 'WEBP', quality=THUMBNAIL_QUALITY, method=4)
+            written.append(path)
+    return written
+
+
+def iter_frames(video_path, interval, frame_size):
+    """
+    Decodes one frame per interval seconds with a single ffmpeg process, scaled to
+    frame_size, and yields them as RGB images. Frame n is the first frame at or after
+    n * interval, so there is one frame for every clip, including a short last one.
+    """
+    width, height = frame_size
+    frame_bytes = width * height * 3
+    process = subprocess.Popen([
+        'ffmpeg', '-v', 'error',
+        '-i', video_path,
+        '-an', '-map', '0:v:0',
+        '-vf', f"select='gte(t,selected_n*{interval})',scale={width}:{height}",
+        '-vsync', 'vfr',
+        '-f', 'rawvideo', '-pix_fmt', 'rgb24',
+        'pipe:1'
+    ], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    try:
+        while True:
+            frame = process.stdout.read(frame_bytes)
+            if len(frame) < frame_bytes:
+                break
+            yield Image.frombytes('RGB', frame_size, frame)
+        process.wait()
+        if process.returncode != 0:
+            raise RuntimeError(f"ffmpeg exited with {process.returncode}: {process.stderr.read().decode(errors='replace')}")
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        process.stdout.close()
+        process.stderr.close()
+
+
+def make_sprite(video_path, name, interval=SPRITE_INTERVAL, frame_size=SPRITE_FRAME_SIZE, columns=SPRITE_COLUMNS):
+    """
+    Builds the timeline sprite sheet of a video: frame n shows time n * interval, laid
+    out left to right in rows of columns. Writes the sheet and a JSON manifest the UI uses
+    to crop a frame. Returns the manifest, or None if the video has no frames.
+    """
+    frames = list(iter_frames(video_path, interval, frame_size))
+    if not frames:
+        return None
+    width, height = frame_size
+    rows = math.ceil(len(frames) / columns)
+    sheet = Image.new('RGB', (width * min(columns, len(frames)), height * rows))
+    for n, frame in enumerate(frames):
+        sheet.paste(frame, ((n % columns) * width, (n // columns) * height))
+
+    os.makedirs(SPRITE_DIR, exist_ok=True)
+    # WebP caps dimensions at 16383 px; fall back to JPEG for very long videos
+    image_path = sprite_path(name)
+    if sheet.height > 16383:
+        image_path = os.path.splitext(image_path)[0] + ".jpg"
+        sheet.save(image_path, 'JPEG', quality=SPRITE_QUALITY)
+    else:
+        sheet.save(image_path, 'WEBP', quality=SPRITE_QUALITY, method=4)
+    manifest = {
+        "image": os.path.basename(image_path),
+        "interval": interval,
+        "frames": len(frames),
+        "columns": columns,
+        "frame_width": width,
+        "frame_height": height,
+    }
+    with open(sprite_manifest_path(name), 'w') as f:
+        json.dump(manifest, f)
+    return manifest
+
+
+def video_thumbnail_source(video_path, name):
+    """Grabs a poster frame from the video itself, for videos downloaded without a thumbnail."""
+    os.makedirs(THUMB_DIR, exist_ok=True)
+    frame_path = os.path.join(THUMB_DIR, f"{name}-source.png")
+    subprocess.run([
+        'ffmpeg', '-y', '-v', 'error', '-ss', '1', '-i', video_path,
+        '-frames:v', '1', frame_path
+    ], check=True, capture_output=True)
+    return frame_path
+
+
+def generate_video_previews(name, source_path=None):
+    """
+    Thumbnails and the timeline sprite for one video in public/videos. Without a
+    source_path the thumbnails are made from a frame of the video.
+    """
+    video_path = os.path.join(VIDEO_DIR, f"{name}.mp4")
+    result = {"name": name, "thumbnails": [], "sprite": None}
+    if source_path is None and os.path.isfile(video_path):
+        source_path = video_thumbnail_source(video_path, name)
+        try:
+            result["thumbnails"] = make_thumbnails(source_path, name)
+        finally:
+            os.remove(source_path)
+    elif source_path is not None:
+        result["thumbnails"] = make_thumbnails(source_path, name)
+    if os.path.isfile(video_path):
+        result["sprite"] = make_sprite(video_path, name)
+    return result
+
+
+def generate_all(names, workers=WORKERS):
+    """
+    Generates previews for several videos in parallel. The work is ffmpeg decoding and
+    Pillow resizing, both of which run outside the GIL, so threads are enough.
+    Returns {name: result or error message}.
+    """
+    results = {}
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = {executor.submit(generate_video_previews, name): name for name in names}
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                results[name] = future.result()
+                logging.info(f"Generated previews for '{name}'")
+            except Exception as e:
+                logging.error(f"Failed to generate previews for '{name}': {e}")
+                results[name] = str(e)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate thumbnails and timeline sprite sheets for videos.')
+    parser.add_argument('videos', nargs='*', help='Video names (default: every video in public/videos)')
+    parser.add_argument('--workers', type=int, default=WORKERS, help='Videos processed in parallel')
+    args = parser.parse_args()
+
+    names = args.videos or sorted(
+        os.path.splitext(name)[0] for name in os.listdir(VIDEO_DIR) if name.endswith(".mp4")
+    )
+    for name, result in sorted(generate_all(names, args.workers).items()):
+        if isinstance(result, dict):
+            frames = result["sprite"]["frames"] if result["sprite"] else 0
+            print(f"{name}: {len(result['thumbnails'])} thumbnails, {frames} sprite frames")
+        else:
+            print(f"{name}: failed ({result})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_CACHE_PATH = os.path.join("cache", "transcripts.sqlite3")
+DEFAULT_MAX_ENTRIES = 50000
+EVICTION_FRACTION = 0.05  # Share of max_entries evicted at once, so the table is recounted only per batch
+
+# Stored instead of a transcript when the engine found no speech in the clip
+NO_SPEECH = None
+
+
+class TranscriptCache(object):
+    """
+    Persistent content-addressed cache of recognizer results.
+    Keys are hashes of the clip audio plus the backend description, so a clip whose audio
+    is byte-identical to one already transcribed by the same engine and settings is
+    answered without a network call. See make_key and make_source_key for which audio is
+    hashed. Once the cache holds more than max_entries, the least recently used entries
+    are evicted in batches of EVICTION_FRACTION. Safe to share between threads.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        with self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS transcripts ("
+                "key TEXT PRIMARY KEY, transcript TEXT, last_used REAL NOT NULL)"
+            )
+            self.conn.execute("CREATE INDEX IF NOT EXISTS transcripts_last_used ON transcripts (last_used)")
+        # Kept up to date by put(); other processes sharing the file are seen when evicting
+        self.entries = self.conn.execute("SELECT COUNT(*) FROM transcripts").fetchone()[0]
+
+    @staticmethod
+    def make_key(audio, backend_description):
+        """
+        Hashes an sr.AudioData's PCM and format together with the backend description.
+        The audio is the preprocessed clip as the recognizer gets it, so the track DSP
+        engine's per-chunk gain makes the same sound at another offset a different key.
+        """
+        digest = hashlib.sha256()
+        digest.update(f"{audio.sample_rate}:{audio.sample_width}:{backend_description}\0".encode("utf-8"))
+        digest.update(audio.frame_data)
+        return digest.hexdigest()
+
+    @staticmethod
+    def make_source_key(pcm, source_description, backend_description):
+        """
+        Hashes a clip's decoded PCM before any preprocessing, together with a description
+        of its format and of the preprocessing, and the backend description. A repeated
+        intro decodes to the same PCM wherever it falls in the track, so it hits.
+        """
+        digest = hashlib.sha256()
+        digest.update(f"source:{source_description}:{backend_description}\0".encode("utf-8"))
+        digest.update(pcm)
+        return digest.hexdigest()
+
+    def get(self, key):
+        """
+        Returns (True, transcript) on a hit, where transcript is NO_SPEECH for clips the
+        engine found silent, or (False, None) on a miss.
+        """
+        with self.lock:
+            row = self.conn.execute("SELECT transcript FROM transcripts WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return False, None
+            self.hits += 1
+            with self.conn:
+                self.conn.execute("UPDATE transcripts SET last_used = ? WHERE key = ?", (time.time(), key))
+            return True, row[0]
+
+    def put(self, key, transcript):
+        with self.lock:
+            with self.conn:
+                now = time.time()
+                inserted = self.conn.execute(
+                    "INSERT OR IGNORE INTO transcripts (key, transcript, last_used) VALUES (?, ?, ?)",
+                    (key, transcript, now)
+                ).rowcount
+                if inserted:
+                    self.entries += 1
+                else:
+                    self.conn.execute(
+                        "UPDATE transcripts SET transcript = ?, last_used = ? WHERE key = ?", (transcript, now, key)
+                    )
+                if self.entries > self.max_entries:
+                    self.evict()
+
+    def evict(self):
+        """Trims the cache to below max_entries; called by put() with the lock held."""
+        count = self.conn.execute("SELECT COUNT(*) FROM transcripts").fetchone()[0]
+        evicted = 0
+        if count > self.max_entries:
+            keep = self.max_entries - max(1, int(self.max_entries * EVICTION_FRACTION))
+            evicted = self.conn.execute(
+                "DELETE FROM transcripts WHERE key IN "
+                "(SELECT key FROM transcripts ORDER BY last_used ASC LIMIT ?)",
+                (count - max(0, keep),)
+            ).rowcount
+            self.evictions += evicted
+            logging.info(f"Transcript cache evicted {evicted} least recently used entries")
+        self.entries = count - evicted
+
+    def stats(self):
+        with self.lock:
+            entries = self.conn.execute("SELECT COUNT(*) FROM transcripts").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": entries,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
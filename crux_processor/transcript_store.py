@@ -0,0 +1,300 @@
+import argparse
+import io
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+
+import numpy as np
+
+STORE_DIR = os.path.join("public", "results-store")
+RESULTS_DIR = os.path.join("public", "results-json")
+GENERATION_PATH = os.path.join(STORE_DIR, "generation")
+
+MAGIC = b"VSTX"
+VERSION = 1
+# magic, version, reserved, video count, clip count, text blob size
+HEADER = struct.Struct("<4sHHIIQ")
+ALIGNMENT = 8
+
+# Per-clip status column, so NO AUDIO clips can be skipped without reading their text
+STATUS_TEXT = 0
+STATUS_NO_AUDIO = 1
+STATUS_ERROR = 2
+
+
+def store_path(video_name):
+    return os.path.join(STORE_DIR, f"{video_name}.transcript")
+
+
+def dialog_json_path(video_name):
+    return os.path.join(RESULTS_DIR, f"{video_name}-dialog.json")
+
+
+def file_signature(path):
+    """Cheap change detector for a transcript file: modification time and size."""
+    stat = os.stat(path)
+    return f"{stat.st_mtime_ns}:{stat.st_size}"
+
+
+def temp_path_for(path):
+    """A temporary name next to path, unique to this process and thread, to write and then os.replace."""
+    return f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+
+def generation():
+    """
+    Token that changes whenever a video's transcript is saved, so readers such as the
+    search index can tell with one small read that nothing changed since they last looked.
+    """
+    try:
+        with open(GENERATION_PATH) as f:
+            return f.read()
+    except OSError:
+        return ""
+
+
+def bump_generation():
+    os.makedirs(os.path.dirname(GENERATION_PATH), exist_ok=True)
+    temp_path = temp_path_for(GENERATION_PATH)
+    with open(temp_path, "w") as f:
+        f.write(os.urandom(8).hex())
+    os.replace(temp_path, GENERATION_PATH)
+
+
+def clip_status(text):
+    if text == "NO AUDIO":
+        return STATUS_NO_AUDIO
+    if text.startswith("TRANSCRIPTION ERROR"):
+        return STATUS_ERROR
+    return STATUS_TEXT
+
+
+def padding(size):
+    return b"\0" * (-size % ALIGNMENT)
+
+
+def write_transcript_file(path, records):
+    """
+    Writes records [(video, clip_number, start_seconds, end_seconds, text)] as a columnar
+    transcript file, replacing path atomically so open readers keep their old mapping.
+
+    Layout after the header, each section padded to 8 bytes: video name offsets (uint32)
+    and UTF-8 name blob, then per-clip columns video_id, clip_number, start_ms, end_ms
+    (uint32) and status (uint8), then text offsets (uint64) into one UTF-8 text blob.
+    """
+    records = list(records)
+    video_ids = {}
+    for video, *_ in records:
+        video_ids.setdefault(video, len(video_ids))
+    names = [video.encode("utf-8") for video in video_ids]
+    name_offsets = np.cumsum([0] + [len(name) for name in names], dtype=np.uint32)
+    texts = [text.encode("utf-8") for *_, text in records]
+    text_offsets = np.cumsum([0] + [len(text) for text in texts], dtype=np.uint64)
+
+    columns = [
+        np.array([video_ids[record[0]] for record in records], dtype=np.uint32),
+        np.array([record[1] for record in records], dtype=np.uint32),
+        np.array([round(record[2] * 1000) for record in records], dtype=np.uint32),
+        np.array([round(record[3] * 1000) for record in records], dtype=np.uint32),
+        np.array([clip_status(record[4]) for record in records], dtype=np.uint8),
+    ]
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temp_path = temp_path_for(path)
+    with open(temp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, 0, len(names), len(records), int(text_offsets[-1])))
+        name_blob = b"".join(names)
+        for section in [name_offsets.tobytes(), name_blob] + [column.tobytes() for column in columns] + [text_offsets.tobytes()]:
+            f.write(section)
+            f.write(padding(len(section)))
+        f.write(b"".join(texts))
+    os.replace(temp_path, path)
+    return path
+
+
+class TranscriptFile(object):
+    """
+    Read-only, memory-mapped view of a columnar transcript file. The columns are NumPy
+    arrays over the mapping and text is decoded per clip on demand, so a search only
+    touches the pages of the columns and the clip texts it actually reads.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, version, _, video_count, clip_count, text_size = HEADER.unpack_from(self.mm, 0)
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"{path} is not a version {VERSION} transcript file")
+            offset = HEADER.size
+            name_offsets, offset = self.column(offset, np.uint32, video_count + 1)
+            names = self.mm[offset:offset + int(name_offsets[-1])]
+            offset += int(name_offsets[-1]) + len(padding(int(name_offsets[-1])))
+            self.video_names = [
+                names[name_offsets[n]:name_offsets[n + 1]].decode("utf-8") for n in range(video_count)
+            ]
+            self.video_ids, offset = self.column(offset, np.uint32, clip_count)
+            self.clip_numbers, offset = self.column(offset, np.uint32, clip_count)
+            self.start_ms, offset = self.column(offset, np.uint32, clip_count)
+            self.end_ms, offset = self.column(offset, np.uint32, clip_count)
+            self.status, offset = self.column(offset, np.uint8, clip_count)
+            self.text_offsets, offset = self.column(offset, np.uint64, clip_count + 1)
+            self.text_start = offset
+            if offset + text_size > len(self.mm):
+                raise ValueError(f"{path} is truncated")
+        except Exception:
+            self.close()
+            raise
+
+    def column(self, offset, dtype, count):
+        array = np.frombuffer(self.mm, dtype=dtype, count=count, offset=offset)
+        size = array.nbytes
+        return array, offset + size + len(padding(size))
+
+    def __len__(self):
+        return len(self.clip_numbers)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def text(self, row):
+        start = self.text_start + int(self.text_offsets[row])
+        end = self.text_start + int(self.text_offsets[row + 1])
+        return self.mm[start:end].decode("utf-8")
+
+    def video(self, row):
+        return self.video_names[self.video_ids[row]]
+
+    def start_seconds(self, row):
+        return int(self.start_ms[row]) / 1000
+
+    def end_seconds(self, row):
+        return int(self.end_ms[row]) / 1000
+
+    def searchable_rows(self):
+        """Rows whose text can match a search (everything except NO AUDIO)."""
+        return np.flatnonzero(self.status != STATUS_NO_AUDIO)
+
+    def to_dialog(self):
+        """The {"<movie>-NNN": text} dictionary of the JSON export."""
+        return {f"{self.video(row)}-{self.clip_numbers[row]:03d}": self.text(row) for row in range(len(self))}
+
+    def close(self):
+        # The NumPy views must go before the mapping can be closed
+        for name in ("video_ids", "clip_numbers", "start_ms", "end_ms", "status", "text_offsets"):
+            self.__dict__.pop(name, None)
+        try:
+            self.mm.close()
+        except BufferError:
+            logging.warning(f"Transcript file {self.path} still has views in use; leaving it mapped")
+
+
+def parse_clip_number(video_name, clip_key):
+    """
+    Returns the clip number from a "<movie>-NNN" key. Uses the known video name as the
+    prefix, so names containing hyphens (e.g. "FullOfLies-Eminem") parse correctly.
+    """
+    prefix = f"{video_name}-"
+    suffix = clip_key[len(prefix):] if clip_key.startswith(prefix) else clip_key.rsplit("-", 1)[-1]
+    return int(suffix)
+
+
+def dialog_records(video_name, clips, clip_duration, total_duration=None):
+    """Converts a {"<movie>-NNN": text} dictionary into write_transcript_file records in clip order."""
+    records = []
+    for clip_key, text in clips.items():
+        try:
+            number = parse_clip_number(video_name, clip_key)
+        except ValueError:
+            logging.error(f"Skipping clip with unparsable name '{clip_key}'")
+            continue
+        if not isinstance(text, str):
+            logging.error(f"Skipping clip '{clip_key}' with non-text transcript")
+            continue
+        start = number * clip_duration
+        end = start + clip_duration if total_duration is None else min(start + clip_duration, total_duration)
+        records.append((video_name, number, start, max(start, end), text))
+    return sorted(records, key=lambda record: record[1])
+
+
+def save_video_transcript(video_name, clips, clip_duration, total_duration=None):
+    path = write_transcript_file(store_path(video_name), dialog_records(video_name, clips, clip_duration, total_duration))
+    bump_generation()
+    return path
+
+
+def import_dialog_json(video_name, clip_duration):
+    """Builds the store file of a video that only has a legacy dialog JSON. Returns its path or None."""
+    path = dialog_json_path(video_name)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except Exception as e:
+        logging.warning(f"Failed to load {path}: {e}")
+        return None
+    if not (isinstance(data, list) and len(data) > 0 and isinstance(data[0], dict)):
+        logging.warning(f"Unexpected JSON structure in {path}")
+        return None
+    logging.info(f"Importing {path} into the transcript store")
+    # Not a new generation: readers look up videos they have not seen anyway
+    return write_transcript_file(store_path(video_name), dialog_records(video_name, data[0], clip_duration))
+
+
+def export_dialog_json(video_name, json_path=None):
+    """Writes the video's transcript as the [{"<movie>-NNN": text}] JSON export."""
+    json_path = json_path or dialog_json_path(video_name)
+    with TranscriptFile(store_path(video_name)) as transcript:
+        dialog = transcript.to_dialog()
+    os.makedirs(os.path.dirname(json_path) or ".", exist_ok=True)
+    with io.open(json_path, "w", encoding='utf-8') as f:
+        json.dump([dialog], f, indent=4, sort_keys=True, ensure_ascii=False)
+    return json_path
+
+
+def ensure_video_transcript(video_name, clip_duration):
+    """Returns the video's store path, importing its legacy dialog JSON if needed, or None."""
+    path = store_path(video_name)
+    if os.path.isfile(path):
+        return path
+    if os.path.isfile(dialog_json_path(video_name)):
+        return import_dialog_json(video_name, clip_duration)
+    return None
+
+
+def list_videos():
+    """Names of every video with a transcript, in the store or as legacy dialog JSON, sorted."""
+    names = set()
+    if os.path.isdir(STORE_DIR):
+        names.update(name[:-len(".transcript")] for name in os.listdir(STORE_DIR) if name.endswith(".transcript"))
+    if os.path.isdir(RESULTS_DIR):
+        names.update(name[:-len("-dialog.json")] for name in os.listdir(RESULTS_DIR) if name.endswith("-dialog.json"))
+    return sorted(names)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Convert between dialog JSON and the columnar transcript store.')
+    parser.add_argument('command', choices=['export', 'import'],
+                        help='export: store -> dialog JSON; import: dialog JSON -> store')
+    parser.add_argument('videos', nargs='+', help='Video names')
+    parser.add_argument('--clip-duration', type=int, default=10, help='Clip length used when importing JSON')
+    args = parser.parse_args()
+
+    for video_name in args.videos:
+        if args.command == 'export':
+            print(f"Exported {export_dialog_json(video_name)}")
+        else:
+            path = import_dialog_json(video_name, args.clip_duration)
+            print(f"Imported {path}" if path else f"Could not import {dialog_json_path(video_name)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Default voice-activity thresholds, tuned to be conservative: a clip is only skipped
+# when it is clearly silent, noise-like or steady (tones, sustained music).
+VAD_FRAME_MS = 30  # Analysis frame length in milliseconds
+VAD_HOP_MS = 15  # Hop between frames in milliseconds
+VAD_ENERGY_DB = -50  # dBFS; quieter frames count as silence
+VAD_SPEECH_BAND = (300, 3400)  # Hz; where most speech energy sits
+VAD_MIN_BAND_RATIO = 0.3  # Fraction of a frame's energy that must fall in the speech band
+VAD_MAX_FLATNESS = 0.4  # In-band spectral flatness; noise frames sit around 0.55, voiced speech well below
+VAD_MIN_SPEECH_RATIO = 0.05  # Fraction of speech-like frames needed to call the clip speech
+VAD_MIN_ENERGY_STD_DB = 3.0  # Syllabic loudness variation; steady tones and drones stay below this
+
+
+def frame_features(samples, sample_rate, frame_ms=VAD_FRAME_MS, hop_ms=VAD_HOP_MS, speech_band=VAD_SPEECH_BAND):
+    """
+    Computes per-frame energy (dBFS), speech-band energy ratio and in-band spectral
+    flatness for int16 mono samples, all frames at once.
+    Returns (energy_db, band_ratio, flatness) arrays; empty arrays for clips shorter than a frame.
+    """
+    frame_length = max(1, int(sample_rate * frame_ms / 1000))
+    hop = max(1, int(sample_rate * hop_ms / 1000))
+    x = np.asarray(samples, dtype=np.float32) / 32768.0
+    if x.size < frame_length:
+        empty = np.zeros(0, dtype=np.float32)
+        return empty, empty, empty
+
+    frames = sliding_window_view(x, frame_length)[::hop]
+    energy_db = 10 * np.log10(np.mean(frames ** 2, axis=1) + 1e-12)
+
+    spectrum = np.abs(np.fft.rfft(frames * np.hanning(frame_length).astype(np.float32), axis=1)) ** 2
+    freqs = np.fft.rfftfreq(frame_length, 1.0 / sample_rate)
+    band = (freqs >= speech_band[0]) & (freqs <= speech_band[1])
+    band_spectrum = spectrum[:, band] + 1e-12
+    band_ratio = band_spectrum.sum(axis=1) / (spectrum.sum(axis=1) + 1e-12)
+    flatness = np.exp(np.mean(np.log(band_spectrum), axis=1)) / np.mean(band_spectrum, axis=1)
+    return energy_db, band_ratio, flatness
+
+
+class VoiceActivityDetector(object):
+    """
+    Energy/spectral voice-activity detector used to skip clips that would only come back
+    from the recognizer as "no speech". Every threshold can be overridden by keyword.
+    """
+
+    def __init__(self, energy_db=VAD_ENERGY_DB, min_band_ratio=VAD_MIN_BAND_RATIO, max_flatness=VAD_MAX_FLATNESS,
+                 min_speech_ratio=VAD_MIN_SPEECH_RATIO, min_energy_std_db=VAD_MIN_ENERGY_STD_DB,
+                 frame_ms=VAD_FRAME_MS, hop_ms=VAD_HOP_MS, speech_band=VAD_SPEECH_BAND):
+        self.energy_db = energy_db
+        self.min_band_ratio = min_band_ratio
+        self.max_flatness = max_flatness
+        self.min_speech_ratio = min_speech_ratio
+        self.min_energy_std_db = min_energy_std_db
+        self.frame_ms = frame_ms
+        self.hop_ms = hop_ms
+        self.speech_band = speech_band
+
+    def analyze(self, samples, sample_rate):
+        """Returns a dict with the clip's speech frame ratio, energy variation and verdict."""
+        energy_db, band_ratio, flatness = frame_features(
+            samples, sample_rate, self.frame_ms, self.hop_ms, self.speech_band
+        )
+        active = energy_db > self.energy_db
+        speech_frames = active & (band_ratio >= self.min_band_ratio) & (flatness <= self.max_flatness)
+        speech_ratio = float(speech_frames.mean()) if speech_frames.size else 0.0
+        energy_std_db = float(np.std(energy_db[active])) if np.count_nonzero(active) > 1 else 0.0
+        return {
+            "speech_ratio": speech_ratio,
+            "energy_std_db": energy_std_db,
+            "is_speech": speech_ratio >= self.min_speech_ratio and energy_std_db >= self.min_energy_std_db,
+        }
+
+    def is_speech(self, audio):
+        """True if an sr.AudioData (16-bit mono) looks like it contains speech."""
+        if audio.sample_width != 2:
+            return True  # Only 16-bit PCM is analyzed; let the recognizer decide otherwise
+        samples = np.frombuffer(audio.frame_data[:len(audio.frame_data) - len(audio.frame_data) % 2], dtype=np.int16)
+        return self.analyze(samples, audio.sample_rate)["is_speech"]
@@ -1,3 +1,6 @@
+import argparse
+import atexit
+import contextlib
 import moviepy.editor as mp
 import json
 import os
@@ -5,24 +8,38 @@ from pydub import AudioSegment
 from pydub.effects import normalize
 import speech_recognition as sr
 import io
-import queue
 import threading
 import logging
+import multiprocessing
 import numpy as np
 from scipy.signal import butter, filtfilt
+import sqlite3
 import subprocess
+import sys
+import time
+import types
+import wave
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, as_completed, wait
+
+from crux_processor import (audio_stream, catalog, checkpoint, dsp, events, jobs, metrics, phrase_matcher,
+                            profiling, search_index, speech_backends, transcript_cache, transcript_store, vad)
 
 # Configure logging for better debugging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-recognizer = sr.Recognizer()
-
 # Configure audio preprocessing parameters
 SAMPLE_RATE = 16000  # Hz
 LOW_CUTOFF = 50  # Hz (lowered from 80 to catch more voice content)
 HIGH_CUTOFF = 4000  # Hz (increased from 3300 to preserve more voice harmonics)
 NOISE_REDUCE_TIME = 0.25  # seconds (reduced from 0.5 to be less aggressive)
 ENERGY_THRESHOLD = 150  # lowered from 300 to detect softer speech
+CLIP_FRAME_RATE = SAMPLE_RATE  # Hz; clips are decoded at the recognizers' rate, above 2 * HIGH_CUTOFF
+CLIP_CHANNELS = 1  # ffmpeg downmixes while decoding, so only one channel is moved and filtered
+
+# Media locations: full videos, and audio-only ingests (download_video.py --audio-only)
+VIDEO_DIR = os.path.join("public", "videos")
+AUDIO_DIR = os.path.join("public", "audio")
+AUDIO_EXTENSIONS = (".flac", ".wav", ".m4a", ".opus", ".mp3")
 
 def butter_bandpass(lowcut, highcut, fs, order=5):
     nyquist = 0.5 * fs
@@ -36,22 +53,189 @@ def apply_bandpass_filter(data, fs, lowcut, highcut, order=5):
     y = filtfilt(b, a, data)
     return y
 
-class Stream(object):
-    def __init__(self):
-        self.q = queue.Queue()
+def enhance_audio_segment(sound):
+    """
+    Converts an AudioSegment to mono, normalizes it and applies the voice bandpass filter.
+    Returns the enhanced AudioSegment.
+    """
+    # Convert to mono
+    sound = sound.set_channels(1)
 
-    def send_message(self, message):
-        """Send a message to the queue."""
-        self.q.put(message)
+    # Normalize audio (less aggressively)
+    sound = normalize(sound, headroom=0.1)  # Added headroom to prevent clipping
 
-    def event_stream(self):
-        """Generator that yields messages from the queue as Server-Sent Events."""
-        while True:
-            message = self.q.get()
-            yield f'data: {message}\n\n'
+    # Convert to numpy array for scipy processing
+    samples = np.array(sound.get_array_of_samples())
+
+    # Apply gentler bandpass filter
+    filtered_samples = apply_bandpass_filter(
+        samples,
+        sound.frame_rate,
+        LOW_CUTOFF,
+        HIGH_CUTOFF,
+        order=3  # Reduced from 5 to make filter gentler
+    )
+
+    # Convert back to AudioSegment, saturating rather than wrapping on overflow
+    return sound._spawn(dsp.to_int16(filtered_samples))
+
+def enhance_clip_file(input_wav, output_wav):
+    """
+    Loads input_wav, enhances it with enhance_audio_segment and exports output_wav,
+    then removes the original. Module-level so it can run in a worker process.
+    """
+    sound = AudioSegment.from_wav(input_wav)
+    enhance_audio_segment(sound).export(output_wav, format="wav")
+    os.remove(input_wav)
+    return output_wav
+
+def clip_number(wav_path):
+    """The clip index in a {movie}-mini-NNN.wav (or {movie}-NNN.wav) file name."""
+    return int(os.path.basename(wav_path).split('-')[-1].split('.wav')[0])
+
+def write_wav(target, samples, frame_rate):
+    """Writes int16 mono samples as a WAV file to a path or file-like object."""
+    with wave.open(target, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(frame_rate)
+        w.writeframes(samples.tobytes())
+
+def send_stream_message(stream_instance, message_type, text, **fields):
+    """Send a JSON message to the stream, if one is attached."""
+    if stream_instance:
+        message = {"type": message_type, "text": text}
+        message.update(fields)
+        stream_instance.send_message(json.dumps(message))
+
+class RateLimiter(object):
+    """Thread-safe limiter that spaces calls to acquire() at least 1/rate seconds apart."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate
+        self.lock = threading.Lock()
+        self.next_slot = time.monotonic()
+
+    def acquire(self):
+        with self.lock:
+            now = time.monotonic()
+            slot = max(self.next_slot, now)
+            self.next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+class Stream(events.EventBroker):
+    """
+    Progress event stream shared by the processing jobs and the /stream endpoint.
+    Every connected client receives every message; see events.EventBroker.
+    """
 
 class RequestSpeech(object):
     clip_duration = 10  # Duration in seconds for each clip
+    extraction_mode = "ffmpeg"  # "ffmpeg" (single decode pass) or "moviepy" (per-clip seek)
+    streaming = False  # Decode, preprocess and transcribe clips in memory without intermediate WAVs
+    max_clips_in_flight = 4  # Preprocessed clips buffered ahead of the recognizer in streaming mode
+    write_clips = False  # Also write {movie}-mini-NNN.wav files in streaming mode
+    dsp_engine = "track"  # "track" (whole-track DSP engine) or "clip" (per-clip pydub_to_audio)
+    dsp_chunk_seconds = 600  # Audio the track engine filters at once, rounded down to whole clips
+    preprocess_workers = 1  # Spawned processes used by pydub_to_audio (dsp_engine="clip"); 1 keeps it in-process
+    transcription_concurrency = 1  # Recognizer requests kept in flight at once
+    requests_per_second = None  # Cap on recognizer requests per second (None = unlimited)
+    recognizer_factory = sr.Recognizer  # Called once per worker thread to read and tune clips
+    speech_backend = os.environ.get("VIDSCRIBE_SPEECH_BACKEND", "google")  # Name in speech_backends.BACKENDS or an instance
+    backend_settings = {}  # Passed to the backend, e.g. {"latency": 0.2} for "stub"
+    request_retries = 0  # Retries per clip after an sr.RequestError
+    retry_backoff = 0.5  # Seconds before the first retry, doubled for each further retry
+    use_transcript_cache = True  # Reuse stored results for byte-identical clip audio
+    transcript_cache_path = transcript_cache.DEFAULT_CACHE_PATH
+    transcript_cache_size = transcript_cache.DEFAULT_MAX_ENTRIES  # Entries kept before LRU eviction
+    search_index_path = search_index.DEFAULT_INDEX_PATH  # Updated with each saved transcript; None to skip
+    vad_enabled = False  # Mark clearly non-speech clips NO AUDIO without calling the recognizer (opt-in)
+    vad_settings = {}  # Threshold overrides for vad.VoiceActivityDetector, e.g. {"energy_db": -45}
+    checkpoint_enabled = True  # Journal each finished clip so an interrupted run resumes where it stopped
+    catalog_path = catalog.DEFAULT_CATALOG_PATH  # Processing state is recorded in the video catalog; None to skip
+    progress_callback = None  # Called as progress_callback(stage, done, total) while processing
+    job_lease = None  # The scheduler's jobs.Job when run as a job; its guard() gates every write of job state
+    profile = False  # Record a CPU profile and allocation snapshots of the job (see crux_processor.profiling)
+    profile_dir = profiling.DEFAULT_PROFILE_DIR
+
+    def __init__(self, **options):
+        """Overrides any of the class-level settings above, e.g. RequestSpeech(streaming=True)."""
+        for key, value in options.items():
+            if not hasattr(type(self), key) or isinstance(getattr(type(self), key), types.FunctionType):
+                raise TypeError(f"Unknown RequestSpeech option: {key}")
+            setattr(self, key, value)
+        if isinstance(self.speech_backend, speech_backends.SpeechBackend):
+            self.backend = self.speech_backend
+        else:
+            self.backend = speech_backends.get_backend(self.speech_backend, **self.backend_settings)
+        self.vad = vad.VoiceActivityDetector(**self.vad_settings) if self.vad_enabled else None
+        self._thread_state = threading.local()
+        self._rate_limiter = None
+        self._cache = None
+        self._source_keys = {}  # Clip index -> transcript cache key of its decoded audio
+        self._journal = None
+        self._stats_lock = threading.Lock()
+        self._vad_skipped = 0
+        self._clip_length = 0
+        self._total_duration = None
+        self._timer = metrics.StageTimer()
+        self._clip_results = {"text": 0, "no_audio": 0, "error": 0}
+        self._recognizer_seconds = []
+        self._stage = None
+        self._stages_started = set()
+        self._stream_instance = None
+        self._profiler = None
+        self._profile_id = None
+
+    def guarded(self):
+        """The context for writes of job state: job_lease.guard() when run by the job scheduler."""
+        return self.job_lease.guard() if self.job_lease else contextlib.nullcontext()
+
+    def report_progress(self, stage, done, total=None):
+        """
+        Reports per-stage progress to progress_callback(stage, done, total), if set.
+        total defaults to the number of clips in the current video. When a stage reports
+        for the first time, the job's metrics so far are sent to the stream.
+        """
+        with self._stats_lock:
+            self._stage = stage
+            first_report = stage not in self._stages_started
+            self._stages_started.add(stage)
+        if first_report:
+            self.send_metrics(self._stream_instance)
+            if self._profiler:
+                self._profiler.snapshot(f"{stage} started")
+        if self.progress_callback:
+            self.progress_callback(stage, done, self._clip_length if total is None else total)
+
+    def job_metrics(self):
+        """Per-stage seconds, clip outcomes, NO AUDIO rate and recognizer latency of this job so far."""
+        with self._stats_lock:
+            clips = dict(self._clip_results)
+            latencies = sorted(self._recognizer_seconds)
+        finished = sum(clips.values())
+        recognizer = {"backend": self.backend.name, "calls": len(latencies)}
+        if latencies:
+            recognizer.update(
+                mean_seconds=round(sum(latencies) / len(latencies), 4),
+                p95_seconds=round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 4),
+                max_seconds=round(latencies[-1], 4)
+            )
+        return {
+            "stage": self._stage,
+            "stages": self._timer.totals(),
+            "clips": clips,
+            "no_audio_rate": round(clips["no_audio"] / finished, 4) if finished else None,
+            "recognizer": recognizer,
+        }
+
+    def send_metrics(self, stream_instance):
+        send_stream_message(stream_instance, "metrics", "Processing metrics", **self.job_metrics())
+
+    def record_error(self, stage, error):
+        """Counts a processing error by stage and exception type."""
+        metrics.ERRORS.inc(stage=stage, type=type(error).__name__)
 
     def repair_mp4(self, video_path):
         """
@@ -78,7 +262,72 @@ class RequestSpeech(object):
             logging.error(f"Failed to repair video file: {e.stderr.decode()}")
             return False
 
+    def find_media(self, movie_name):
+        """
+        Returns (path, is_video) for the media to transcribe: public/videos/<name>.mp4 if it
+        exists, otherwise an audio-only ingest from public/audio. Defaults to the mp4 path.
+        """
+        movie_path = os.path.join(VIDEO_DIR, f"{movie_name}.mp4")
+        if os.path.isfile(movie_path):
+            return movie_path, True
+        for extension in AUDIO_EXTENSIONS:
+            audio_path = os.path.join(AUDIO_DIR, f"{movie_name}{extension}")
+            if os.path.isfile(audio_path):
+                return audio_path, False
+        return movie_path, True
+
     def processSpeech(self, movie_name, stream_instance=None):
+        """Transcribes a video or audio-only ingest, recording its processing state in the catalog."""
+        if not movie_name:
+            return self.transcribe_media(movie_name, stream_instance)
+        self.update_catalog(movie_name, catalog.RUNNING)
+        self._stream_instance = stream_instance
+        if self.profile:
+            self._profiler = profiling.JobProfiler(movie_name, self.profile_dir)
+            self._profiler.start()
+        saved = None
+        lease_lost = False
+        try:
+            saved = self.transcribe_media(movie_name, stream_instance)
+        except jobs.LeaseLost:
+            # The job was requeued: its new owner records the outcome
+            lease_lost = True
+            raise
+        finally:
+            if self._profiler:
+                self.save_profile(stream_instance, bool(saved))
+            if not lease_lost:
+                self.update_catalog(movie_name, catalog.COMPLETED if saved else catalog.FAILED)
+                metrics.JOBS.inc(status=catalog.COMPLETED if saved else catalog.FAILED)
+            self.send_metrics(stream_instance)
+        return saved
+
+    def save_profile(self, stream_instance, ok):
+        """Stops the job's profiler and writes its profile; a failure is logged and does not affect the job."""
+        profiler, self._profiler = self._profiler, None
+        try:
+            profile_id = profiler.stop(ok=ok, options=self.describe_options(), stages=self._timer.totals())
+        except OSError as e:
+            logging.warning(f"Failed to save the processing profile: {e}")
+            return
+        self._profile_id = profile_id
+        logging.info(f"Saved processing profile {profile_id} to {self.profile_dir}")
+        send_stream_message(stream_instance, "info", f"Saved processing profile {profile_id}", profile_id=profile_id)
+
+    def describe_options(self):
+        """The settings that shape a run's performance, recorded with its profile."""
+        return {
+            "backend": json.loads(self.backend.describe()),
+            "dsp_engine": self.dsp_engine,
+            "extraction_mode": self.extraction_mode,
+            "streaming": self.streaming,
+            "clip_duration": self.clip_duration,
+            "preprocess_workers": self.preprocess_workers,
+            "transcription_concurrency": self.transcription_concurrency,
+            "vad_enabled": self.vad_enabled,
+        }
+
+    def transcribe_media(self, movie_name, stream_instance=None):
         if not movie_name:
             logging.error("No Movie name provided, exiting.")
             if stream_instance:
@@ -90,7 +339,8 @@ class RequestSpeech(object):
             return
 
         clip_duration = self.clip_duration
-        movie_path = os.path.join("public", "videos", f"{movie_name}.mp4")
+        movie_path, is_video = self.find_media(movie_name)
+        media_file = os.path.basename(movie_path)
         asc_dir = os.path.join("asc", movie_name)
         dialog_json = os.path.join("public", "results-json", f"{movie_name}-dialog.json")
         
@@ -98,17 +348,24 @@ class RequestSpeech(object):
         os.makedirs(asc_dir, exist_ok=True)
         os.makedirs(os.path.dirname(dialog_json), exist_ok=True)
         
-        # Try to load the video, repair if needed
+        # Try to load the video, repair if needed; audio-only ingests have no video stream
         try:
-            full_movie = mp.VideoFileClip(movie_path)
+            with self._timer.span("load"):
+                full_movie = mp.VideoFileClip(movie_path) if is_video else mp.AudioFileClip(movie_path)
         except Exception as e:
-            logging.error(f"Error loading video '{movie_name}.mp4': {e}")
+            self.record_error("load", e)
+            logging.error(f"Error loading '{media_file}': {e}")
+            if not is_video:
+                send_stream_message(stream_instance, "error", f"Failed to load audio file {movie_path}: {e}")
+                return
             # Attempt to repair the video
             if self.repair_mp4(movie_path):
                 try:
-                    full_movie = mp.VideoFileClip(movie_path)
+                    with self._timer.span("load"):
+                        full_movie = mp.VideoFileClip(movie_path)
                     logging.info(f"Successfully loaded repaired video: {movie_path}")
                 except Exception as e:
+                    self.record_error("load", e)
                     logging.error(f"Failed to load video even after repair: {e}")
                     if stream_instance:
                         message = {
@@ -127,11 +384,12 @@ class RequestSpeech(object):
                 return
 
         total_duration = full_movie.duration
-        logging.info(f"Loaded video '{movie_name}.mp4' successfully. Total duration: {total_duration} seconds")
+        self.report_progress("load", 1, 1)
+        logging.info(f"Loaded '{media_file}' successfully. Total duration: {total_duration} seconds")
         if stream_instance:
             message = {
                 "type": "info",
-                "text": f"Loaded video '{movie_name}.mp4' successfully. Duration: {total_duration} seconds"
+                "text": f"Loaded '{media_file}' successfully. Duration: {total_duration} seconds"
             }
             stream_instance.send_message(json.dumps(message))
 
@@ -140,6 +398,9 @@ class RequestSpeech(object):
         clip_length_remainder = total_duration % clip_duration
         if clip_length_remainder > 0:
             clip_length += 1
+        self._clip_length = clip_length
+        self._total_duration = total_duration
+        self._source_keys = {}
             
         logging.info(f"Video will be split into {clip_length} clips of {clip_duration} seconds each")
         if stream_instance:
@@ -149,12 +410,100 @@ class RequestSpeech(object):
             }
             stream_instance.send_message(json.dumps(message))
 
-        clip_wav_list = []
+        # Clips finished by an interrupted earlier run are taken from the checkpoint journal
+        self._journal = self.open_journal(movie_name, movie_path, asc_dir)
+        completed = self._journal.load() if self._journal else {}
+        if completed:
+            logging.info(f"Resuming '{movie_name}': {len(completed)} of {clip_length} clips already transcribed")
+            send_stream_message(
+                stream_instance, "info", f"Resuming: {len(completed)} of {clip_length} clips already transcribed"
+            )
+
+        if len(completed) >= clip_length:
+            clip_sources = iter(())
+        elif self.streaming:
+            clip_sources = self.stream_clip_sources(movie_path, asc_dir, movie_name, stream_instance)
+        else:
+            clip_wav_list = self.prepare_clip_files(
+                movie_path, full_movie, asc_dir, movie_name, clip_length, total_duration, stream_instance
+            )
+            if clip_wav_list is None:
+                if self._journal:
+                    self._journal.close()
+                return
+            clip_sources = ((clip_number(wa), wa, wa) for wa in clip_wav_list)
+        if completed:
+            clip_sources = (
+                (ct, wa, label) for ct, wa, label in clip_sources if f"{movie_name}-{ct:03d}" not in completed
+            )
+
+        # Continue with transcription
+        wav_dict = self.transcribe_clips(movie_name, clip_sources, stream_instance, completed)
+
+        # Clips lost to a failed extraction or decode must not be saved as a finished transcript;
+        # the journal keeps the clips that did finish for the next run
+        missing = [ct for ct in range(clip_length) if f"{movie_name}-{ct:03d}" not in wav_dict]
+        if missing:
+            logging.error(f"Only {clip_length - len(missing)} of {clip_length} clips of '{movie_name}' were "
+                          f"transcribed; not saving (first missing clip: {missing[0]})")
+            send_stream_message(
+                stream_instance, "error",
+                f"Processing failed: {len(missing)} of {clip_length} clips could not be transcribed"
+            )
+            return False
+
+        with self._timer.span("save"):
+            saved = self.save_transcriptions(movie_name, dialog_json, wav_dict, stream_instance)
+        if saved and self._journal:
+            self._journal.remove()
+        return saved
+
+    def open_journal(self, movie_name, movie_path, asc_dir):
+        """
+        Returns the video's checkpoint journal, or None when checkpointing is off. The
+        fingerprint covers the settings that change results, so a journal from a run with
+        another video file, clip length, backend or VAD setup is not reused.
+        """
+        if not self.checkpoint_enabled:
+            return None
+        stat = os.stat(movie_path)
+        fingerprint = {
+            "video": movie_name,
+            "video_size": stat.st_size,
+            "video_mtime": stat.st_mtime_ns,
+            "clip_duration": self.clip_duration,
+            "dsp_engine": self.dsp_engine,
+            "backend": self.backend.describe(),
+            "vad": self.vad_settings if self.vad_enabled else None,
+        }
+        return checkpoint.TranscriptionJournal(
+            os.path.join(asc_dir, f"{movie_name}-journal.jsonl"), fingerprint, guard=self.guarded
+        )
 
-        # Path to check if pre-processing is complete
-        pre_google_processes = os.path.join(asc_dir, f"{movie_name}-mini-000.wav")
+    def prepare_clip_files(self, movie_path, full_movie, asc_dir, movie_name, clip_length, total_duration, stream_instance=None):
+        """
+        Cuts the movie into preprocessed {movie}-mini-NNN.wav clips on disk, reusing those
+        of a previous run whose journal recorded a finished extraction. Returns the clip
+        paths sorted by clip number, or None on error.
+        """
+        clip_duration = self.clip_duration
+        clip_wav_list = []
 
-        if not os.path.isfile(pre_google_processes):
+        # Clip files are only reused when the journal says every one of them was written;
+        # a run that died mid-extraction leaves a partial set behind
+        existing = {}
+        for file in os.listdir(asc_dir):
+            if file.startswith(f"{movie_name}-mini-") and file.endswith(".wav"):
+                try:
+                    existing[clip_number(file)] = os.path.join(asc_dir, file)
+                except ValueError:
+                    continue
+        if (self._journal and self._journal.extracted == clip_length
+                and all(x in existing for x in range(clip_length))):
+            clip_wav_list = [existing[x] for x in range(clip_length)]
+            logging.info(f"Reusing {clip_length} extracted audio clips from {asc_dir}")
+            send_stream_message(stream_instance, "info", f"Reusing {clip_length} extracted audio clips.")
+        else:
             # Split the movie into clips
             logging.info(f"Cutting video into {clip_duration} second clips...")
             if stream_instance:
@@ -164,62 +513,33 @@ class RequestSpeech(object):
                 }
                 stream_instance.send_message(json.dumps(message))
             
-            for x in range(clip_length):
-                start_seconds = x * clip_duration
-                end_seconds = min(start_seconds + clip_duration, total_duration)
-                
-                try:
-                    clip = full_movie.subclip(start_seconds, end_seconds)
-                    clip_path = os.path.join(asc_dir, f"{movie_name}-{x:03d}.wav")
-                    clip.audio.write_audiofile(clip_path, verbose=False)
-                    clip_wav_list.append(clip_path)
-                    logging.info(f"Created audio clip {x+1}/{clip_length}: {clip_path} ({start_seconds}-{end_seconds}s)")
-                    if stream_instance:
-                        message = {
-                            "type": "info",
-                            "text": f"Created audio clip {x+1}/{clip_length}: {start_seconds}-{end_seconds}s"
-                        }
-                        stream_instance.send_message(json.dumps(message))
-                except Exception as e:
-                    logging.error(f"Failed to create audio clip {x+1}/{clip_length}: {e}")
-                    if stream_instance:
-                        message = {
-                            "type": "error",
-                            "text": f"Failed to create audio clip {x+1}/{clip_length}: {e}"
-                        }
-                        stream_instance.send_message(json.dumps(message))
-                    continue
+            if self.dsp_engine == "track":
+                clip_wav_list = self.track_extract_clips(movie_path, asc_dir, movie_name, stream_instance)
 
-            # Convert to mono and update clip_wav_list
-            clip_wav_list = self.pydub_to_audio(asc_dir, movie_name, clip_length, stream_instance)
+            if not clip_wav_list:
+                if self.extraction_mode == "ffmpeg":
+                    clip_wav_list = self.ffmpeg_extract_clips(
+                        movie_path, asc_dir, movie_name, clip_length, total_duration, stream_instance
+                    )
+                if not clip_wav_list:
+                    clip_wav_list = self.moviepy_extract_clips(
+                        full_movie, asc_dir, movie_name, clip_length, total_duration, stream_instance
+                    )
 
-        # Rebuild clip_wav_list from directory if empty
-        if not clip_wav_list:
-            logging.info("Rebuilding clip_wav_list from existing .wav files.")
-            if stream_instance:
-                message = {
-                    "type": "info",
-                    "text": "Rebuilding clip_wav_list from existing .wav files."
-                }
-                stream_instance.send_message(json.dumps(message))
-            for file in os.listdir(asc_dir):
-                if file.endswith(".wav"):
-                    wav_path = os.path.join(asc_dir, file)
-                    clip_wav_list.append(wav_path)
-                    logging.info(f"Found existing audio clip: {wav_path}")
-                    if stream_instance:
-                        message = {
-                            "type": "info",
-                            "text": f"Found existing audio clip: {wav_path}"
-                        }
-                        stream_instance.send_message(json.dumps(message))
+                # Convert to mono and update clip_wav_list
+                clip_wav_list = self.pydub_to_audio(asc_dir, movie_name, clip_length, stream_instance)
+
+            if not clip_wav_list:
+                logging.error(f"No audio clips could be extracted from {movie_path}")
+                send_stream_message(stream_instance, "error", "No audio clips could be extracted.")
+                return None
+            if self._journal:
+                self._journal.open()
+                self._journal.record_extracted(len(clip_wav_list))
 
         # Sort the clip_wav_list based on clip number extracted from filename
         try:
-            clip_wav_list = sorted(
-                clip_wav_list,
-                key=lambda x: int(os.path.basename(x).split('-')[-1].split('.wav')[0])
-            )
+            clip_wav_list = sorted(clip_wav_list, key=clip_number)
             logging.info("Sorted clip_wav_list for accurate mapping.")
             if stream_instance:
                 message = {
@@ -235,88 +555,534 @@ class RequestSpeech(object):
                     "text": f"Error sorting clip_wav_list: {e}"
                 }
                 stream_instance.send_message(json.dumps(message))
+            return None
+
+        return clip_wav_list
+
+    def track_processor(self):
+        return dsp.TrackProcessor(
+            CLIP_FRAME_RATE, LOW_CUTOFF, HIGH_CUTOFF,
+            order=3, headroom=0.1, chunk_seconds=self.dsp_chunk_seconds
+        )
+
+    def decode_clips(self, movie_path):
+        """
+        Decodes the audio track with a single ffmpeg process into (index, pcm) clips. Like
+        ffmpeg_extract_clips, stops at the expected clip count: the audio track can run a
+        few milliseconds past the duration it was computed from, which would otherwise
+        leave a trailing sliver clip.
+        """
+        pcm_clips = audio_stream.iter_pcm_clips(movie_path, self.clip_duration, CLIP_FRAME_RATE, channels=CLIP_CHANNELS)
+        try:
+            for x, pcm in self.key_source_clips(pcm_clips):
+                if self._clip_length and x >= self._clip_length:
+                    return
+                yield x, pcm
+        finally:
+            pcm_clips.close()
+
+    def iter_track_clips(self, movie_path):
+        """
+        Decodes the audio once and runs it through the whole-track DSP engine, yielding
+        (index, int16 mono samples) for each enhanced clip.
+        """
+        pcm_clips = self.decode_clips(movie_path)
+        blocks = (
+            np.frombuffer(pcm, dtype=np.int16).reshape(-1, CLIP_CHANNELS)
+            for _, pcm in self._timer.iterate("decode", pcm_clips)
+        )
+        # Decoding happens inside the engine's pulls, and its spans are not charged to preprocess
+        clips = self.track_processor().iter_clips(blocks, self.clip_duration * CLIP_FRAME_RATE)
+        yield from enumerate(self._timer.iterate("preprocess", clips))
+
+    def track_extract_clips(self, movie_path, asc_dir, movie_name, stream_instance=None):
+        """
+        Writes enhanced {movie}-mini-NNN.wav clips straight from the whole-track DSP engine,
+        skipping the raw per-clip WAVs and pydub_to_audio. Returns an empty list if decoding
+        fails so the caller can fall back to per-clip processing.
+        """
+        clip_wav_list = []
+        try:
+            for x, samples in self.iter_track_clips(movie_path):
+                output_wav = os.path.join(asc_dir, f"{movie_name}-mini-{x:03d}.wav")
+                with self._timer.span("clip_write"):
+                    write_wav(output_wav, samples, CLIP_FRAME_RATE)
+                clip_wav_list.append(output_wav)
+                self.report_progress("preprocess", len(clip_wav_list))
+                logging.info(f"Processed and enhanced audio: {output_wav}")
+                send_stream_message(stream_instance, "info", f"Processed and enhanced audio: {output_wav}")
+        except Exception as e:
+            self.record_error("preprocess", e)
+            logging.warning(f"Whole-track DSP failed, falling back to per-clip processing: {e}")
+            send_stream_message(stream_instance, "info", "Whole-track processing unavailable, falling back to per-clip processing.")
+            for output_wav in clip_wav_list:
+                os.remove(output_wav)
+            self._source_keys.clear()
+            return []
+        return clip_wav_list
+
+    def key_source_clips(self, pcm_clips):
+        """
+        Passes (index, pcm) clips through, recording the transcript cache key of each
+        clip's decoded audio. Hashing before preprocessing lets a clip hit the cache
+        whatever gain the track engine gives its chunk; clips read back from WAV files
+        have no source key and are keyed by their preprocessed audio instead.
+        """
+        description = f"{CLIP_FRAME_RATE}:{CLIP_CHANNELS}:{self.dsp_engine}:{LOW_CUTOFF}-{HIGH_CUTOFF}"
+        for x, pcm in pcm_clips:
+            if self.use_transcript_cache:
+                self._source_keys[x] = transcript_cache.TranscriptCache.make_source_key(
+                    pcm, description, self.backend.describe()
+                )
+            yield x, pcm
+
+    def stream_clip_sources(self, movie_path, asc_dir, movie_name, stream_instance=None):
+        """
+        Generator for the streaming mode: PCM is decoded once by ffmpeg, converted to mono,
+        normalized and bandpass filtered in memory, and yielded as (index, wav_buffer, label)
+        for the recognizer. At most max_clips_in_flight processed clips are held in memory.
+        Clips are only written to asc_dir when write_clips is set.
+        """
+        def process(item):
+            x, pcm = item
+            with self._timer.span("preprocess"):
+                sound = AudioSegment(data=pcm, sample_width=2, frame_rate=CLIP_FRAME_RATE, channels=CLIP_CHANNELS)
+                wav_buffer = io.BytesIO()
+                enhance_audio_segment(sound).export(wav_buffer, format="wav")
+            if self.write_clips:
+                with self._timer.span("clip_write"), open(os.path.join(asc_dir, f"{movie_name}-mini-{x:03d}.wav"), "wb") as f:
+                    f.write(wav_buffer.getvalue())
+            wav_buffer.seek(0)
+            self.report_progress("preprocess", x + 1)
+            return x, wav_buffer
+
+        def render(item):
+            x, samples = item
+            with self._timer.span("clip_write"):
+                wav_buffer = io.BytesIO()
+                write_wav(wav_buffer, samples, CLIP_FRAME_RATE)
+                if self.write_clips:
+                    write_wav(os.path.join(asc_dir, f"{movie_name}-mini-{x:03d}.wav"), samples, CLIP_FRAME_RATE)
+            wav_buffer.seek(0)
+            self.report_progress("preprocess", x + 1)
+            return x, wav_buffer
+
+        logging.info(f"Streaming {self.clip_duration} second clips through in-memory preprocessing...")
+        send_stream_message(stream_instance, "info", f"Streaming {self.clip_duration} second clips through in-memory preprocessing...")
+        if self.dsp_engine == "track":
+            # The DSP engine already yields enhanced clips; only WAV framing is left
+            clips, process = self.iter_track_clips(movie_path), render
+        else:
+            clips = self._timer.iterate("decode", self.decode_clips(movie_path))
+        if self._profiler:
+            # bounded_pipeline decodes and preprocesses on its own producer thread
+            clips = self._profiler.iterate(clips)
+        try:
+            for x, wav_buffer in audio_stream.bounded_pipeline(clips, process, self.max_clips_in_flight):
+                yield x, wav_buffer, f"{movie_name}-{x:03d}"
+        except Exception as e:
+            self.record_error("preprocess", e)
+            logging.error(f"Streaming audio pipeline failed: {e}")
+            send_stream_message(stream_instance, "error", f"Streaming audio pipeline failed: {e}")
+
+    def get_recognizer(self):
+        """
+        Returns the recognizer owned by the calling thread. Recognizers carry mutable state
+        (energy_threshold is re-tuned per clip), so concurrent workers never share one.
+        """
+        recognizer = getattr(self._thread_state, "recognizer", None)
+        if recognizer is None:
+            recognizer = self.recognizer_factory()
+            self._thread_state.recognizer = recognizer
+        return recognizer
+
+    def transcribe_clip(self, wa, cache_key=None):
+        """
+        Transcribes a single WAV path or file-like object and returns the text.
+        Raises sr.UnknownValueError / sr.RequestError like the configured backend does.
+        cache_key overrides the transcript cache key computed from the audio.
+        """
+        recognizer = self.get_recognizer()
+        with sr.AudioFile(wa) as source:
+            clip_audio = recognizer.record(source)
+        # Use lower energy threshold for better voice detection
+        recognizer.energy_threshold = ENERGY_THRESHOLD
+
+        # Voice activity detection looks at the whole clip, including the noise sample below
+        if self.vad and not self.vad.is_speech(clip_audio):
+            with self._stats_lock:
+                self._vad_skipped += 1
+            raise sr.UnknownValueError()
+
+        # The recognizer skips the ambient noise sample at the start of the clip, like
+        # adjust_for_ambient_noise did (its threshold was overridden by ENERGY_THRESHOLD)
+        audio = clip_audio.get_segment(NOISE_REDUCE_TIME * 1000)
+        return self.recognize_audio(recognizer, audio, cache_key)
+
+    def recognize_audio(self, recognizer, audio, cache_key=None):
+        """
+        Runs the backend on an sr.AudioData, answering from the transcript cache when the
+        same audio was already transcribed by the same backend and settings.
+        """
+        if not self._cache:
+            cache_key = None
+        elif cache_key is None:
+            cache_key = self._cache.make_key(audio, self.backend.describe())
+        if cache_key:
+            hit, transcript = self._cache.get(cache_key)
+            if hit:
+                if transcript is transcript_cache.NO_SPEECH:
+                    raise sr.UnknownValueError()
+                return transcript
+
+        try:
+            transcript = self.request_recognition(recognizer, audio)
+        except sr.UnknownValueError:
+            if cache_key:
+                self._cache.put(cache_key, transcript_cache.NO_SPEECH)
+            raise
+        if cache_key:
+            self._cache.put(cache_key, transcript)
+        return transcript
+
+    def request_recognition(self, recognizer, audio):
+        """Calls the backend, honoring the rate limit and retrying sr.RequestError."""
+        attempt = 0
+        while True:
+            if self._rate_limiter:
+                self._rate_limiter.acquire()
+            try:
+                return self.call_backend(recognizer, audio)
+            except sr.RequestError as e:
+                self.record_error("recognize", e)
+                if attempt >= self.request_retries:
+                    raise
+                delay = self.retry_backoff * 2 ** attempt
+                attempt += 1
+                logging.warning(f"Recognition request failed ({e}); retry {attempt}/{self.request_retries} in {delay}s")
+                time.sleep(delay)
+
+    def call_backend(self, recognizer, audio):
+        """One backend request, timed as a recognize span and in the recognizer latency histogram."""
+        start = time.perf_counter()
+        try:
+            with self._timer.span("recognize"):
+                return self.backend.recognize(recognizer, audio)
+        finally:
+            elapsed = time.perf_counter() - start
+            metrics.RECOGNIZER_SECONDS.observe(elapsed, backend=self.backend.name)
+            with self._stats_lock:
+                self._recognizer_seconds.append(elapsed)
+
+    def transcribe_clips(self, movie_name, clip_sources, stream_instance=None, completed=None):
+        """
+        Transcribes (index, source, label) tuples, where source is a WAV path or file-like
+        object, and returns the {movie}-NNN -> text dictionary in clip order, including the
+        completed clips passed in from the checkpoint journal.
+        With transcription_concurrency > 1, up to that many clips are in flight at once.
+        """
+        self._rate_limiter = RateLimiter(self.requests_per_second) if self.requests_per_second else None
+        self._vad_skipped = 0
+        self._cache = self.open_transcript_cache()
+        if self._journal:
+            self._journal.open()
+        try:
+            wav_dict = self.run_transcriptions(movie_name, clip_sources, stream_instance, completed)
+        finally:
+            self.close_transcript_cache(stream_instance)
+            if self._journal:
+                self._journal.close()
+
+        if self.vad:
+            logging.info(f"Voice activity detection skipped {self._vad_skipped} of {len(wav_dict)} clips")
+            send_stream_message(
+                stream_instance, "info",
+                f"Voice activity detection marked {self._vad_skipped} of {len(wav_dict)} clips as NO AUDIO, "
+                f"saving {self._vad_skipped} recognizer calls"
+            )
+        return wav_dict
+
+    def run_transcriptions(self, movie_name, clip_sources, stream_instance=None, completed=None):
+        wav_dict = dict(completed or {})
+
+        def attempt(ct, wa):
+            try:
+                return self.transcribe_clip(wa, self._source_keys.get(ct)), None
+            except Exception as e:
+                return None, e
+
+        if self._profiler:
+            attempt = self._profiler.wrap(attempt)
+
+        if self.transcription_concurrency > 1:
+            with ThreadPoolExecutor(max_workers=self.transcription_concurrency) as executor:
+                pending = {}
+                for ct, wa, label in clip_sources:
+                    # Bound the work handed to the pool so streaming sources are not drained ahead
+                    while len(pending) >= self.transcription_concurrency:
+                        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            self.record_transcription(wav_dict, movie_name, *pending.pop(future), *future.result(), stream_instance)
+                    pending[executor.submit(attempt, ct, wa)] = (ct, label)
+                for future in as_completed(list(pending)):
+                    self.record_transcription(wav_dict, movie_name, *pending.pop(future), *future.result(), stream_instance)
+        else:
+            for ct, wa, label in clip_sources:
+                self.record_transcription(wav_dict, movie_name, ct, label, *attempt(ct, wa), stream_instance)
+
+        return {clip: wav_dict[clip] for clip in sorted(wav_dict)}
+
+    def open_transcript_cache(self):
+        if not self.use_transcript_cache:
+            return None
+        try:
+            return transcript_cache.TranscriptCache(self.transcript_cache_path, self.transcript_cache_size)
+        except sqlite3.Error as e:
+            logging.warning(f"Transcript cache unavailable, transcribing without it: {e}")
+            return None
+
+    def close_transcript_cache(self, stream_instance=None):
+        if not self._cache:
             return
+        stats = self._cache.stats()
+        self._cache.close()
+        self._cache = None
+        logging.info(f"Transcript cache: {stats}")
+        send_stream_message(
+            stream_instance, "info",
+            f"Transcript cache: {stats['hits']} hits, {stats['misses']} misses ({stats['hit_rate']:.0%} hit rate)"
+        )
 
-        # Continue with transcription
-        wav_dict = {}
-        for ct, wa in enumerate(clip_wav_list):
+    def record_transcription(self, wav_dict, movie_name, ct, label, recog, error, stream_instance=None):
+        """Stores one clip's outcome in wav_dict and reports it to the stream."""
+        self.report_progress("transcribe", len(wav_dict) + 1)
+        if error is None:
+            wav_dict[f"{movie_name}-{ct:03d}"] = recog
+            self.checkpoint_clip(f"{movie_name}-{ct:03d}", recog)
+            self.count_clip("text")
+            logging.info(f"Transcribed [{movie_name}-{ct:03d}]: {recog}")
+            if stream_instance:
+                message = {
+                    "type": "transcription",
+                    "clip": f"{movie_name}-{ct:03d}",
+                    "text": recog
+                }
+                stream_instance.send_message(json.dumps(message))
+        elif isinstance(error, sr.UnknownValueError):
+            wav_dict[f"{movie_name}-{ct:03d}"] = "NO AUDIO"
+            self.checkpoint_clip(f"{movie_name}-{ct:03d}", "NO AUDIO")
+            self.count_clip("no_audio")
+            logging.warning(f"No audio detected in clip {label}.")
+            if stream_instance:
+                message = {
+                    "type": "warning",  # Changed from error to warning
+                    "clip": f"{movie_name}-{ct:03d}",
+                    "text": f"No speech detected in this segment"  # More user-friendly message
+                }
+                stream_instance.send_message(json.dumps(message))
+        elif isinstance(error, sr.RequestError):
+            wav_dict[f"{movie_name}-{ct:03d}"] = "TRANSCRIPTION ERROR"
+            self.count_clip("error")
+            logging.error(f"Could not request results from {self.backend.name} speech recognition service; {error}")
+            if stream_instance:
+                message = {
+                    "type": "error",
+                    "clip": f"{movie_name}-{ct:03d}",
+                    "text": f"TRANSCRIPTION ERROR: {error}"
+                }
+                stream_instance.send_message(json.dumps(message))
+        else:
+            wav_dict[f"{movie_name}-{ct:03d}"] = "TRANSCRIPTION ERROR"
+            self.count_clip("error")
+            self.record_error("transcribe", error)
+            logging.error(f"Error transcribing clip {label}: {error}")
+            if stream_instance:
+                message = {
+                    "type": "error",
+                    "clip": f"{movie_name}-{ct:03d}",
+                    "text": f"TRANSCRIPTION ERROR: {error}"
+                }
+                stream_instance.send_message(json.dumps(message))
+
+    def count_clip(self, result):
+        with self._stats_lock:
+            self._clip_results[result] += 1
+        metrics.CLIPS.inc(result=result)
+
+    def checkpoint_clip(self, clip, text):
+        """
+        Appends a finished clip to the checkpoint journal. Errors are not journaled, so
+        failed clips are retried when the job is re-run.
+        """
+        if not self._journal:
+            return
+        try:
+            self._journal.record(clip, text)
+        except OSError as e:
+            logging.warning(f"Failed to checkpoint clip {clip}: {e}")
+
+    def save_transcriptions(self, movie_name, dialog_json, wav_dict, stream_instance=None):
+        """
+        Saves the transcriptions to the columnar transcript store, writes the JSON list
+        containing the clip dictionary as an export, and updates the search index for the
+        video. Returns True once both files are written. The whole save happens under the
+        job lease, so a job that was requeued meanwhile cannot overwrite its new owner's result.
+        """
+        with self.guarded():
             try:
-                with sr.AudioFile(wa) as source:
-                    # Adjust for ambient noise with gentler settings
-                    recognizer.adjust_for_ambient_noise(source, duration=NOISE_REDUCE_TIME)
-                    # Use lower energy threshold for better voice detection
-                    recognizer.energy_threshold = ENERGY_THRESHOLD
-                    audio = recognizer.record(source)
-                    
-                # Use more lenient recognition settings
-                recog = recognizer.recognize_google(
-                    audio,
-                    language="en-US",
-                    show_all=False
+                store_file = transcript_store.save_video_transcript(
+                    movie_name, wav_dict, self.clip_duration, self._total_duration
                 )
-                wav_dict[f"{movie_name}-{ct:03d}"] = recog
-                logging.info(f"Transcribed [{movie_name}-{ct:03d}]: {recog}")
-                if stream_instance:
-                    location_seconds = f"{ct * clip_duration}-{(ct + 1) * clip_duration}"
-                    message = {
-                        "type": "transcription",
-                        "clip": f"{movie_name}-{ct:03d}",
-                        "text": recog
-                    }
-                    stream_instance.send_message(json.dumps(message))
-            except sr.UnknownValueError:
-                wav_dict[f"{movie_name}-{ct:03d}"] = "NO AUDIO"
-                logging.warning(f"No audio detected in clip {wa}.")
+                logging.info(f"Saved transcriptions to {store_file}")
+                os.makedirs(os.path.dirname(dialog_json), exist_ok=True)
+                with io.open(dialog_json, "w", encoding='utf-8') as the_dialog:
+                    # Wrap wav_dict in a list
+                    json.dump([wav_dict], the_dialog, indent=4, sort_keys=True, ensure_ascii=False)
+                    logging.info(f"Saved transcriptions to {dialog_json}")
+                    if stream_instance:
+                        message = {
+                            "type": "info",
+                            "text": f"Saved transcriptions to {dialog_json}"
+                        }
+                        stream_instance.send_message(json.dumps(message))
+                self.update_search_index(movie_name, store_file)
+                self.report_progress("save", 1, 1)
+                return True
+            except Exception as e:
+                self.record_error("save", e)
+                logging.error(f"Failed to write transcriptions to {dialog_json}: {e}")
                 if stream_instance:
-                    location_seconds = f"{ct * clip_duration}-{(ct + 1) * clip_duration}"
                     message = {
-                        "type": "warning",  # Changed from error to warning
-                        "clip": f"{movie_name}-{ct:03d}",
-                        "text": f"No speech detected in this segment"  # More user-friendly message
+                        "type": "error",
+                        "text": f"Failed to write transcriptions to {dialog_json}: {e}"
                     }
                     stream_instance.send_message(json.dumps(message))
-            except sr.RequestError as e:
-                wav_dict[f"{movie_name}-{ct:03d}"] = "TRANSCRIPTION ERROR"
-                logging.error(f"Could not request results from Google Speech Recognition service; {e}")
+                return False
+
+    def update_catalog(self, movie_name, status):
+        """Records the video's processing state. A failure is logged and does not affect the job."""
+        if not self.catalog_path:
+            return
+        completed = status == catalog.COMPLETED
+        try:
+            with self.guarded():
+                catalog.Catalog(self.catalog_path).set_processing(
+                    movie_name, status,
+                    job_id=self.job_lease.id if self.job_lease else None,
+                    clips=self._clip_length if completed else None,
+                    duration=self._total_duration,
+                    transcript_path=transcript_store.store_path(movie_name) if completed else None
+                )
+        except sqlite3.Error as e:
+            logging.warning(f"Failed to update the catalog for {movie_name}: {e}")
+
+    def update_search_index(self, movie_name, store_file):
+        """
+        Reindexes the video's clips right after its transcript is written. A failure only
+        costs search speed: the index rebuilds the video from the store on the next search.
+        """
+        if not self.search_index_path:
+            return
+        try:
+            index = search_index.index_for(self.search_index_path, movie_name, self.clip_duration)
+            index.index_video(movie_name, store_file)
+        except (sqlite3.Error, OSError, ValueError) as e:
+            logging.warning(f"Failed to update search index for {movie_name}: {e}")
+
+    def moviepy_extract_clips(self, full_movie, asc_dir, movie_name, clip_length, total_duration, stream_instance=None):
+        """
+        Writes each clip's audio with moviepy, seeking and decoding the video once per clip.
+        Kept as the fallback when ffmpeg cannot be run directly.
+        """
+        clip_duration = self.clip_duration
+        clip_wav_list = []
+        # A VideoFileClip carries its audio track; an audio-only ingest is an AudioFileClip already
+        audio = getattr(full_movie, "audio", None) or full_movie
+        for x in range(clip_length):
+            start_seconds = x * clip_duration
+            end_seconds = min(start_seconds + clip_duration, total_duration)
+            
+            try:
+                clip = audio.subclip(start_seconds, end_seconds)
+                clip_path = os.path.join(asc_dir, f"{movie_name}-{x:03d}.wav")
+                with self._timer.span("decode"):
+                    clip.write_audiofile(clip_path, fps=CLIP_FRAME_RATE, ffmpeg_params=['-ac', str(CLIP_CHANNELS)], verbose=False)
+                clip_wav_list.append(clip_path)
+                self.report_progress("extract", len(clip_wav_list))
+                logging.info(f"Created audio clip {x+1}/{clip_length}: {clip_path} ({start_seconds}-{end_seconds}s)")
                 if stream_instance:
                     message = {
-                        "type": "error",
-                        "clip": f"{movie_name}-{ct:03d}",
-                        "text": f"TRANSCRIPTION ERROR: {e}"
+                        "type": "info",
+                        "text": f"Created audio clip {x+1}/{clip_length}: {start_seconds}-{end_seconds}s"
                     }
                     stream_instance.send_message(json.dumps(message))
             except Exception as e:
-                wav_dict[f"{movie_name}-{ct:03d}"] = "TRANSCRIPTION ERROR"
-                logging.error(f"Error transcribing clip {wa}: {e}")
+                self.record_error("decode", e)
+                logging.error(f"Failed to create audio clip {x+1}/{clip_length}: {e}")
                 if stream_instance:
                     message = {
                         "type": "error",
-                        "clip": f"{movie_name}-{ct:03d}",
-                        "text": f"TRANSCRIPTION ERROR: {e}"
+                        "text": f"Failed to create audio clip {x+1}/{clip_length}: {e}"
                     }
                     stream_instance.send_message(json.dumps(message))
+                continue
 
-        # Save transcriptions to JSON as a list containing the existing dictionary
+        return clip_wav_list
+
+    def ffmpeg_extract_clips(self, movie_path, asc_dir, movie_name, clip_length, total_duration, stream_instance=None):
+        """
+        Decodes the audio track once and writes every {movie}-NNN.wav clip in the same pass
+        using ffmpeg's segment muxer. Returns an empty list if ffmpeg fails so the caller can
+        fall back to moviepy_extract_clips.
+        """
+        clip_duration = self.clip_duration
+        # The segment muxer expands printf-style patterns, so escape any literal '%'
+        output_pattern = os.path.join(asc_dir, f"{movie_name.replace('%', '%%')}-%03d.wav")
         try:
-            os.makedirs(os.path.dirname(dialog_json), exist_ok=True)
-            with io.open(dialog_json, "w", encoding='utf-8') as the_dialog:
-                # Wrap wav_dict in a list
-                json.dump([wav_dict], the_dialog, indent=4, sort_keys=True, ensure_ascii=False)
-                logging.info(f"Saved transcriptions to {dialog_json}")
-                if stream_instance:
-                    message = {
-                        "type": "info",
-                        "text": f"Saved transcriptions to {dialog_json}"
-                    }
-                    stream_instance.send_message(json.dumps(message))
-        except Exception as e:
-            logging.error(f"Failed to write transcriptions to {dialog_json}: {e}")
-            if stream_instance:
-                message = {
-                    "type": "error",
-                    "text": f"Failed to write transcriptions to {dialog_json}: {e}"
-                }
-                stream_instance.send_message(json.dumps(message))
+            with self._timer.span("decode"):
+                subprocess.run([
+                    'ffmpeg', '-y', '-v', 'error',
+                    '-i', movie_path,
+                    '-vn', '-map', '0:a:0',
+                    '-acodec', 'pcm_s16le',
+                    # Resample and downmix inside the filter graph: an output -ar/-ac would re-chunk
+                    # the 100 ms packets the muxer needs to cut each segment on the exact clip boundary
+                    '-af', f'aresample={CLIP_FRAME_RATE},aformat=channel_layouts={CLIP_CHANNELS}c,'
+                           f'asetnsamples=n={CLIP_FRAME_RATE // 10}:p=0',
+                    '-f', 'segment',
+                    '-segment_time', str(clip_duration),
+                    '-reset_timestamps', '1',
+                    output_pattern
+                ], check=True, capture_output=True)
+        except (OSError, subprocess.CalledProcessError) as e:
+            self.record_error("decode", e)
+            error = e.stderr.decode(errors='replace') if getattr(e, 'stderr', None) else e
+            logging.warning(f"Single-pass ffmpeg extraction failed, falling back to moviepy: {error}")
+            send_stream_message(stream_instance, "info", "Single-pass extraction unavailable, falling back to per-clip extraction.")
+            return []
+
+        clip_wav_list = []
+        for x in range(clip_length):
+            clip_path = os.path.join(asc_dir, f"{movie_name}-{x:03d}.wav")
+            start_seconds = x * clip_duration
+            end_seconds = min(start_seconds + clip_duration, total_duration)
+            if not os.path.isfile(clip_path):
+                logging.error(f"Failed to create audio clip {x+1}/{clip_length}: {clip_path} missing")
+                send_stream_message(stream_instance, "error", f"Failed to create audio clip {x+1}/{clip_length}: missing output")
+                continue
+            clip_wav_list.append(clip_path)
+            self.report_progress("extract", len(clip_wav_list))
+            logging.info(f"Created audio clip {x+1}/{clip_length}: {clip_path} ({start_seconds}-{end_seconds}s)")
+            send_stream_message(stream_instance, "info", f"Created audio clip {x+1}/{clip_length}: {start_seconds}-{end_seconds}s")
+
+        # The audio track can run a few milliseconds past the video duration, which makes
+        # the muxer emit a trailing sliver segment; drop anything past the expected count.
+        x = clip_length
+        while os.path.isfile(os.path.join(asc_dir, f"{movie_name}-{x:03d}.wav")):
+            os.remove(os.path.join(asc_dir, f"{movie_name}-{x:03d}.wav"))
+            x += 1
+
+        return clip_wav_list
 
     def pydub_to_audio(self, asc_dir, movie_name, clip_length, stream_instance):
         """
@@ -325,6 +1091,8 @@ class RequestSpeech(object):
         1. Convert to mono
         2. Normalize audio
         3. Apply gentler bandpass filter to focus on voice frequencies
+        With preprocess_workers > 1 the clips are processed in a process pool; the
+        returned list is still ordered by clip number.
         """
         logging.info("Converting clips to mono audio and applying voice enhancement...")
         if stream_instance:
@@ -334,128 +1102,225 @@ class RequestSpeech(object):
             }
             stream_instance.send_message(json.dumps(message))
 
-        mini_clip_wav_list = []
+        clip_paths = []
         for x in range(clip_length):
-            try:
-                input_wav = os.path.join(asc_dir, f"{movie_name}-{x:03d}.wav")
-                output_wav = os.path.join(asc_dir, f"{movie_name}-mini-{x:03d}.wav")
-                
-                if not os.path.exists(input_wav):
-                    logging.warning(f"Input file not found: {input_wav}")
-                    continue
-                    
-                # Load audio and convert to mono
-                sound = AudioSegment.from_wav(input_wav)
-                sound = sound.set_channels(1)
-                
-                # Normalize audio (less aggressively)
-                sound = normalize(sound, headroom=0.1)  # Added headroom to prevent clipping
-                
-                # Convert to numpy array for scipy processing
-                samples = np.array(sound.get_array_of_samples())
-                
-                # Apply gentler bandpass filter
-                filtered_samples = apply_bandpass_filter(
-                    samples,
-                    sound.frame_rate,
-                    LOW_CUTOFF,
-                    HIGH_CUTOFF,
-                    order=3  # Reduced from 5 to make filter gentler
-                )
-                
-                # Convert back to AudioSegment
-                filtered_sound = sound._spawn(filtered_samples.astype(np.int16))
-                
-                # Export processed audio
-                filtered_sound.export(output_wav, format="wav")
-                mini_clip_wav_list.append(output_wav)
-                
-                # Remove original file
-                os.remove(input_wav)
-                
-                logging.info(f"Processed and enhanced audio: {output_wav}")
-                if stream_instance:
-                    message = {
-                        "type": "info",
-                        "text": f"Processed and enhanced audio: {output_wav}"
-                    }
-                    stream_instance.send_message(json.dumps(message))
-            except Exception as e:
-                logging.warning(f"Failed to process clip {x}: {e}")
-                if stream_instance:
-                    message = {
-                        "type": "error",
-                        "text": f"Failed to process clip {x}: {e}"
-                    }
-                    stream_instance.send_message(json.dumps(message))
+            input_wav = os.path.join(asc_dir, f"{movie_name}-{x:03d}.wav")
+            output_wav = os.path.join(asc_dir, f"{movie_name}-mini-{x:03d}.wav")
+            if not os.path.exists(input_wav):
+                logging.warning(f"Input file not found: {input_wav}")
                 continue
+            clip_paths.append((x, input_wav, output_wav))
+
+        def report(x, output_wav, error=None):
+            if error is None:
+                logging.info(f"Processed and enhanced audio: {output_wav}")
+                send_stream_message(stream_instance, "info", f"Processed and enhanced audio: {output_wav}")
+            else:
+                logging.warning(f"Failed to process clip {x}: {error}")
+                send_stream_message(stream_instance, "error", f"Failed to process clip {x}: {error}")
+
+        processed = {}
+        if self.preprocess_workers > 1 and len(clip_paths) > 1:
+            # Each clip is independent, so fan the scipy work out across processes and
+            # report progress as clips finish; the returned list is re-ordered below.
+            # Workers are spawned: forking the multi-threaded server risks deadlocks.
+            pool = ProcessPoolExecutor(max_workers=self.preprocess_workers, mp_context=multiprocessing.get_context("spawn"))
+            with self._timer.span("preprocess"), pool as executor:
+                futures = {
+                    executor.submit(enhance_clip_file, input_wav, output_wav): (x, output_wav)
+                    for x, input_wav, output_wav in clip_paths
+                }
+                for future in as_completed(futures):
+                    x, output_wav = futures[future]
+                    try:
+                        future.result()
+                        processed[x] = output_wav
+                        self.report_progress("preprocess", len(processed), clip_length)
+                        report(x, output_wav)
+                    except Exception as e:
+                        self.record_error("preprocess", e)
+                        report(x, output_wav, e)
+        else:
+            for x, input_wav, output_wav in clip_paths:
+                try:
+                    with self._timer.span("preprocess"):
+                        enhance_clip_file(input_wav, output_wav)
+                    processed[x] = output_wav
+                    self.report_progress("preprocess", len(processed), clip_length)
+                    report(x, output_wav)
+                except Exception as e:
+                    self.record_error("preprocess", e)
+                    report(x, output_wav, e)
 
+        mini_clip_wav_list = [processed[x] for x in sorted(processed)]
         return mini_clip_wav_list
 
 class RequestUiSearch(object):
     clip_duration = RequestSpeech.clip_duration
+    search_index_path = search_index.DEFAULT_INDEX_PATH  # None scans the transcript store instead
+    search_workers = int(os.environ.get("VIDSCRIBE_SEARCH_WORKERS", os.cpu_count() or 1))  # Processes for corpus_search
+    parallel_min_videos = 32  # Smaller searches run in-process
+    max_page_size = 500
+
+    def __init__(self):
+        self._executor = None
+        self._executor_lock = threading.Lock()
 
     def uiSearch(self, ui_search_input, video_set):
-        second_sets = {}
-        try:
-            word_list = [word.strip().lower() for word in ui_search_input.split(",") if word.strip()]
-            logging.info(f"Search terms: {word_list}")
+        """
+        Returns {"<video>-<start second>": "<clip text>-word"} for every clip of the videos in
+        video_set whose transcript contains one of the comma-separated search phrases.
+        """
+        return {
+            key: f"{match['text'].replace('-', ' ')}-word"
+            for key, match in self.find_matches(ui_search_input, video_set).items()
+        }
 
-            # Collect all dialog JSON file paths
-            dialog_json_list = []
-            for key, video_name in video_set.items():
-                dialog_json_path = os.path.join("public", "results-json", f"{video_name}-dialog.json")
-                if os.path.isfile(dialog_json_path):
-                    dialog_json_list.append(dialog_json_path)
-                    logging.info(f"Added dialog JSON path: {dialog_json_path}")
-                else:
-                    logging.warning(f"Dialog JSON file does not exist: {dialog_json_path}")
-
-            # Function to find words in strings
-            def words_in_string(a_string, word_list):
-                true_sets = []
-                for phrase in word_list:
-                    if phrase in a_string:
-                        true_sets.append(a_string.replace("-", " "))
-                return sorted(true_sets, reverse=True)
-
-            # Aggregate transcriptions from all JSON files
-            dialog_data = {}
-            for dialog_json_path in dialog_json_list:
-                try:
-                    with open(dialog_json_path, 'r', encoding='utf-8') as f:
-                        data = json.load(f)
-                        if isinstance(data, list) and len(data) > 0 and isinstance(data[0], dict):
-                            dialog_data.update(data[0])
-                            logging.info(f"Loaded data from {dialog_json_path}")
-                        else:
-                            logging.warning(f"Unexpected JSON structure in {dialog_json_path}")
-                except Exception as e:
-                    logging.warning(f"Failed to load {dialog_json_path}: {e}")
-                    continue
+    def find_matches(self, ui_search_input, video_set):
+        """
+        Returns {"<video>-<start second>": {"video", "start", "end", "text", "terms"}} for every matching
+        clip, where terms lists every search phrase found in the clip.
+        """
+        if self.search_index_path:
+            try:
+                return self.index_search(ui_search_input, video_set)
+            except (sqlite3.Error, OSError, ValueError) as e:
+                logging.warning(f"Search index unavailable, scanning transcripts instead: {e}")
+            except Exception as e:
+                logging.error(f"Error during UI search: {e}")
+                return {}
+        return self.scan_search(ui_search_input, video_set)
+
+    def parse_search_input(self, ui_search_input):
+        return [word.strip().lower() for word in ui_search_input.split(",") if word.strip()]
+
+    def add_match(self, matches, video_name, start_time, end_time, video_clip_text, terms):
+        # Times come from the transcript store's columns, so hyphenated video names are fine
+        start_time = int(start_time)
+        matches[f"{video_name}-{start_time}"] = {
+            "video": video_name,
+            "start": start_time,
+            "end": end_time,
+            "text": video_clip_text,
+            "terms": terms,
+        }
+        logging.info(f"Found {terms} in {video_name} at {start_time} seconds.")
 
-            # Search for words in transcriptions
-            for video_clip, video_clip_text in dialog_data.items():
-                if video_clip_text != "NO AUDIO":
-                    video_clip_text = video_clip_text.lower()
-                    for word in words_in_string(video_clip_text, word_list):
-                        try:
-                            w1, w2 = video_clip.split("-")
-                            start_time = int(w2) * self.clip_duration
-                            second_sets[f"{w1}-{start_time}"] = f"{word}-word"
-                            logging.info(f"Found '{word}' in {video_clip} at {start_time} seconds.")
-                        except ValueError as e:
-                            logging.error(f"Error parsing video_clip '{video_clip}': {e}")
-            return second_sets
+    def index_search(self, ui_search_input, video_set):
+        """Looks the phrases up in the persistent inverted index, refreshing stale videos first."""
+        word_list = self.parse_search_input(ui_search_input)
+        logging.info(f"Search terms: {word_list}")
+        matches = {}
+        for video_name, _, start_time, end_time, video_clip_text, terms in search_index.search(
+                self.search_index_path, self.clip_duration, word_list, video_set.values()):
+            self.add_match(matches, video_name, start_time, end_time, video_clip_text.lower(), terms)
+        return matches
+
+    def corpus_search(self, ui_search_input, videos="all", page=1, page_size=50):
+        """
+        Searches an arbitrary list of videos, or "all" transcripts in the library. Videos are
+        grouped by index shard, the shards are searched in parallel worker processes, and the
+        merged results are returned in video then time order, one page at a time.
+        """
+        word_list = self.parse_search_input(ui_search_input)
+        if videos == "all":
+            video_names = transcript_store.list_videos()
+        else:
+            video_names = list(dict.fromkeys(videos))
+        page = max(1, int(page))
+        page_size = min(max(1, int(page_size)), self.max_page_size)
+
+        shards = search_index.group_by_shard(video_names)
+        if self.search_index_path and self.search_workers > 1 and len(video_names) >= self.parallel_min_videos:
+            executor = self.search_executor()
+            futures = [
+                executor.submit(search_index.search_shard, self.search_index_path, shard, self.clip_duration,
+                                word_list, shard_videos)
+                for shard, shard_videos in shards.items()
+            ]
+            results = [match for future in futures for match in future.result()]
+        elif self.search_index_path:
+            results = search_index.search(self.search_index_path, self.clip_duration, word_list, video_names)
+        else:
+            results = search_index.scan(word_list, video_names, self.clip_duration)
+
+        matches = [
+            {"video": video_name, "clip": clip_number, "start": start_time, "end": end_time,
+             "text": video_clip_text, "terms": terms}
+            for video_name, clip_number, start_time, end_time, video_clip_text, terms
+            in search_index.sort_matches(results, video_names)
+        ]
+        logging.info(f"Corpus search for {word_list} found {len(matches)} clips in {len(video_names)} videos "
+                     f"({len(shards)} shards)")
+        return {
+            "query": word_list,
+            "videos": len(video_names),
+            "total": len(matches),
+            "page": page,
+            "page_size": page_size,
+            "pages": -(-len(matches) // page_size),
+            "results": matches[(page - 1) * page_size:page * page_size],
+        }
+
+    def search_executor(self):
+        """
+        Long-lived worker pool, so searches do not pay process start-up each time.
+        Workers are spawned rather than forked from the multi-threaded server process.
+        """
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=min(self.search_workers, search_index.INDEX_SHARDS),
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+                atexit.register(self._executor.shutdown)
+            return self._executor
+
+    def scan_search(self, ui_search_input, video_set):
+        """Reads every clip from the transcript store and matches it. Used when the index is off or unavailable."""
+        matches = {}
+        try:
+            word_list = self.parse_search_input(ui_search_input)
+            logging.info(f"Search terms: {word_list}")
+            for video_name, _, start_time, end_time, video_clip_text, terms in search_index.scan(
+                    word_list, video_set.values(), self.clip_duration):
+                self.add_match(matches, video_name, start_time, end_time, video_clip_text.lower(), terms)
+            return matches
         except Exception as e:
             logging.error(f"Error during UI search: {e}")
-            return second_sets
+            return matches
 
 class MultithreadRun(object):
 
-    def __init__(self, stream_instance):
+    def __init__(self, stream_instance, **speech_options):
         self.stream_instance = stream_instance
+        self.speech_options = speech_options
+
+    def processSpeech(self, video_name, progress_callback=None, stream_instance=None, **options):
+        """options override the shared speech_options for this run, e.g. profile=True."""
+        rs = RequestSpeech(progress_callback=progress_callback, **dict(self.speech_options, **options))
+        return rs.processSpeech(video_name, stream_instance=stream_instance or self.stream_instance)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Transcribe a video or audio-only ingest.')
+    parser.add_argument('name', help='Video name (public/videos/<name>.mp4 or an audio file in public/audio)')
+    parser.add_argument('--backend', default=RequestSpeech.speech_backend,
+                        help='Speech backend: ' + ", ".join(speech_backends.BACKENDS))
+    parser.add_argument('--dsp-engine', choices=("track", "clip"), default=RequestSpeech.dsp_engine)
+    parser.add_argument('--streaming', action='store_true', help='Process clips in memory without intermediate WAVs')
+    parser.add_argument('--profile', action='store_true',
+                        help=f'Record a CPU profile and allocation snapshots in {profiling.DEFAULT_PROFILE_DIR}')
+    args = parser.parse_args()
+
+    speech = RequestSpeech(speech_backend=args.backend, dsp_engine=args.dsp_engine, streaming=args.streaming,
+                           profile=args.profile)
+    saved = speech.processSpeech(args.name)
+    print(f"{args.name}: {'transcribed' if saved else 'failed'}")
+    if speech._profile_id:
+        print(f"Profile: {os.path.join(speech.profile_dir, speech._profile_id)}")
+    return 0 if saved else 1
+
 
-    def processSpeech(self, video_name):
-        rs = RequestSpeech()
-        rs.processSpeech(video_name, stream_instance=self.stream_instance)
+if __name__ == '__main__':
+    sys.exit(main())
@@ -6,107 +6,81 @@ import tempfile
 import subprocess
 import glob
 import shutil
+from concurrent.futures import ThreadPoolExecutor
 
 import yt_dlp
-from PIL import Image
 
-CONFIG_FILE = 'videoConfig.json'
-JS_CONFIG_FILE = 'public/js/videoConfig.js'
+from crux_processor import catalog as video_catalog
+from crux_processor import thumbnails
+from crux_processor import transcript_store
 
+# Parts of a multi-URL download fetched at once, and fragments per part (HLS/DASH streams)
+DOWNLOAD_WORKERS = int(os.environ.get('VIDSCRIBE_DOWNLOAD_WORKERS', 4))
+CONCURRENT_FRAGMENTS = int(os.environ.get('VIDSCRIBE_CONCURRENT_FRAGMENTS', 1))
 
-def load_config():
-    if os.path.exists(CONFIG_FILE):
-        with open(CONFIG_FILE, 'r') as f:
-            config = json.load(f)
-    else:
-        # Create default config
-        config = {
-            "videos": [
-                {"id": "VIDEO1", "name": "FullOfLies-Eminem", "duration": 0},
-                {"id": "VIDEO2", "name": "Discovery", "duration": 0},
-                {"id": "VIDEO3", "name": "The_Carbon_Connection", "duration": 0}
-            ]
-        }
-        save_config(config)
-    return config
-
-
-def save_config(config):
-    with open(CONFIG_FILE, 'w') as f:
-        json.dump(config, f, indent=4)
-
-
-def add_video(config, name, duration=0):
-    if len(config['videos']) >= 3:
-        print("Configuration is full. Please specify a video slot to replace.")
-        return config
-    new_id = f"VIDEO{len(config['videos']) + 1}"
-    config['videos'].append({"id": new_id, "name": name, "duration": duration})
-    print(f"Added {new_id}: {name} (duration: {duration}s)")
-    save_config(config)
-    generate_js_config(config)  # Automatically generate JS config
-    return config
-
-
-def replace_video(config, replace_id, new_name, duration=0):
-    for video in config['videos']:
-        if video['id'] == replace_id:
-            old_name = video['name']
-            # Only delete old files if the new name is different
-            if old_name != new_name:
-                print(f"Deleting old files for {old_name} before replacing with {new_name}")
-                delete_video_files(replace_id, old_name)
-            video['name'] = new_name
-            video['duration'] = duration
-            print(f"Replaced {replace_id}: {old_name} with {new_name} (duration: {duration}s)")
-            save_config(config)
-            generate_js_config(config)  # Automatically generate JS config
-            return video['id'], old_name, new_name
-    print(f"No video found with ID {replace_id}")
-    return None, None, None
-
-
-def view_videos(config):
-    print("Current video entries:")
-    for video in config['videos']:
-        print(f"{video['id']}: {video['name']}")
+# Audio-only ingest: only the audio track, stored mono at the recognizer's sample rate
+# (SAMPLE_RATE in crux_processor/video_per_second.py), losslessly compressed
+AUDIO_DIR = 'public/audio'
+AUDIO_FORMAT = 'flac'
+AUDIO_SAMPLE_RATE = 16000
 
 
-def generate_js_config(config):
-    # Start with an empty string
-    js_content = ""
+def load_catalog():
+    # Migrates videoConfig.json into the catalog the first time
+    return video_catalog.open_catalog()
 
-    # Iterate over the videos and define global variables
-    for video in config['videos']:
-        js_content += f'var {video["id"]} = "{video["name"]}";\n'
 
-    # Write the content to videoConfig.js
-    with open(JS_CONFIG_FILE, 'w') as f:
-        f.write(js_content)
-    print(f"Generated JavaScript configuration at '{JS_CONFIG_FILE}'")
+def add_video(catalog, name, duration=0, kind=video_catalog.VIDEO, media_path=None):
+    slot = catalog.free_slot()
+    catalog.add_video(name, kind, media_path, duration, slot)
+    if slot is None:
+        print(f"Added {name} to the catalog (duration: {duration}s). "
+              "All UI slots are taken; pass a REPLACE_ID to show it in the UI.")
+    else:
+        print(f"Added {slot}: {name} (duration: {duration}s)")
+    return catalog
+
+
+def replace_video(catalog, replace_id, new_name, duration=0, kind=video_catalog.VIDEO, media_path=None):
+    if replace_id not in video_catalog.SLOTS:
+        print(f"No video slot with ID {replace_id}")
+        return None, None, None
+    old_name = catalog.slots()[replace_id]
+    # Only delete old files if the new name is different
+    if old_name and old_name != new_name:
+        print(f"Deleting old files for {old_name} before replacing with {new_name}")
+        delete_video_files(replace_id, old_name)
+        # Keep the old entry's download and processing history; only its slot and media go
+        catalog.clear_media(old_name)
+    catalog.add_video(new_name, kind, media_path, duration, replace_id)
+    print(f"Replaced {replace_id}: {old_name} with {new_name} (duration: {duration}s)")
+    return replace_id, old_name, new_name
+
+
+def view_videos(catalog):
+    print("Current video entries:")
+    for slot, name in catalog.slots().items():
+        print(f"{slot}: {name}")
 
 
-def manage_videos(config):
+def manage_videos(catalog):
     while True:
         print("\nVideo Management Menu:")
         print("1. Add a new video")
         print("2. Replace an existing video")
         print("3. View current videos")
-        print("4. Generate JavaScript configuration")
+        print("4. List the catalog")
         print("5. Exit")
         choice = input("Select an option (1-5): ").strip()
 
         if choice == '1':
-            if len(config['videos']) >= 3:
-                print("Configuration is full. Please replace an existing video instead.")
-            else:
-                new_name = input(f"Enter name for VIDEO{len(config['videos']) + 1}: ").strip()
-                config = add_video(config, new_name)
+            new_name = input("Enter name for the new video: ").strip()
+            catalog = add_video(catalog, new_name)
         elif choice == '2':
-            view_videos(config)
+            view_videos(catalog)
             replace_id = input("Enter the ID of the video to replace (e.g., VIDEO1): ").strip().upper()
             new_name = input(f"Enter new name for {replace_id}: ").strip()
-            replaced_id, old_name, new_name = replace_video(config, replace_id, new_name)
+            replaced_id, old_name, new_name = replace_video(catalog, replace_id, new_name)
             if replaced_id:
                 # Only clean up old video and thumbnail if names are different
                 if old_name != new_name:
@@ -119,9 +93,12 @@ def manage_videos(config):
                 if not info_dict:
                     sys.exit(1)
         elif choice == '3':
-            view_videos(config)
+            view_videos(catalog)
         elif choice == '4':
-            generate_js_config(config)
+            listing = catalog.list_videos(page_size=video_catalog.MAX_PAGE_SIZE)
+            for video in listing['videos']:
+                print(f"{video['name']}: {video['kind']}, {video['duration']:.0f}s, {video['processing']['status']}")
+            print(f"{listing['total']} videos")
         elif choice == '5':
             break
         else:
@@ -132,21 +109,23 @@ def delete_video_files(video_id, video_name):
     # Define paths
     video_path_mp4 = f'public/videos/{video_name}.mp4'
     video_path_webm = f'public/videos/{video_name}.webm'
+    audio_path = f'{AUDIO_DIR}/{video_name}.{AUDIO_FORMAT}'
     thumbnail_path = f'public/img/{video_name}.png'
 
     # Delete video files
-    for path in [video_path_mp4, video_path_webm]:
+    for path in [video_path_mp4, video_path_webm, audio_path]:
         if os.path.exists(path):
             os.remove(path)
             print(f"Deleted video file '{path}'")
 
-    # Delete thumbnail file
-    if os.path.exists(thumbnail_path):
-        os.remove(thumbnail_path)
-        print(f"Deleted thumbnail '{thumbnail_path}'")
+    # Delete thumbnail files and the timeline sprite
+    for path in [thumbnail_path] + thumbnails.preview_paths(video_name):
+        if os.path.exists(path):
+            os.remove(path)
+            print(f"Deleted thumbnail '{path}'")
 
 
-def download_video(url, name, replace_id=None, old_name=None):
+def download_video(url, name, replace_id=None, old_name=None, concurrent_fragments=CONCURRENT_FRAGMENTS):
     # Check if we're replacing with the same name
     same_name_replacement = old_name == name if old_name else False
     
@@ -161,6 +140,7 @@ def download_video(url, name, replace_id=None, old_name=None):
         'thumbnailformat': 'webp',  # Download thumbnail in webp format
         'quiet': False,
         'no_warnings': True,
+        'concurrent_fragment_downloads': concurrent_fragments,
         'postprocessors': [{
             'key': 'FFmpegVideoConvertor',
             'preferedformat': 'mp4',  # Ensure mp4 format
@@ -180,31 +160,10 @@ def download_video(url, name, replace_id=None, old_name=None):
             duration = info_dict.get('duration', 0)
             print(f"Video duration: {duration}s")
             
-            # Convert webp thumbnail to png
+            # Convert the webp thumbnail to the PNG poster and WebP sizes
             webp_path = f'public/videos/{temp_name}.webp'
-            png_path = f'public/img/{name}.png'
-            
-            # Create img directory if it doesn't exist
-            os.makedirs('public/img', exist_ok=True)
-            
             if os.path.exists(webp_path):
-                try:
-                    # Open and convert the webp image
-                    with Image.open(webp_path) as img:
-                        # Convert to RGB mode if necessary
-                        if img.mode in ('RGBA', 'LA'):
-                            background = Image.new('RGB', img.size, (255, 255, 255))
-                            background.paste(img, mask=img.split()[-1])
-                            img = background
-                        # Resize to 810x449
-                        img = img.resize((810, 449), Image.Resampling.LANCZOS)
-                        # Save as PNG
-                        img.save(png_path, 'PNG')
-                    # Remove the webp file after conversion
-                    os.remove(webp_path)
-                    print(f"Converted thumbnail to PNG and resized to 810x449")
-                except Exception as e:
-                    print(f"Error converting thumbnail: {e}")
+                convert_thumbnail(webp_path, name)
             
             # If this is a same-name replacement, handle the file swap
             if same_name_replacement:
@@ -215,78 +174,159 @@ def download_video(url, name, replace_id=None, old_name=None):
                 os.rename(temp_video_path, old_video_path)
                 print(f"Successfully replaced {name} with new version")
             
+            make_sprite(f'public/videos/{name}.mp4', name)
             return {'filepath': f'public/videos/{name}.mp4', 'duration': duration}
         except yt_dlp.utils.DownloadError as e:
             print(f"An error occurred while downloading the video: {e}")
             return None
 
 
-def convert_thumbnail(original_thumbnail_path, name, width=810, height=449):
-    print(f"Attempting to convert and resize thumbnail from: {original_thumbnail_path}")
-    try:
-        with Image.open(original_thumbnail_path) as img:
-            print(f"Original thumbnail size: {img.size} and format: {img.format}")
+def audio_only_options(outtmpl):
+    """yt-dlp options that fetch the best audio-only stream and convert it to mono AUDIO_FORMAT."""
+    return {
+        'outtmpl': outtmpl,
+        'format': 'bestaudio/best',  # Skip the video stream entirely
+        'postprocessors': [{
+            'key': 'FFmpegExtractAudio',
+            'preferredcodec': AUDIO_FORMAT,
+        }],
+        'postprocessor_args': {
+            'extractaudio': ['-ac', '1', '-ar', str(AUDIO_SAMPLE_RATE), '-sample_fmt', 's16']
+        },
+    }
 
-            # Determine the appropriate resampling filter
-            try:
-                resampling_filter = Image.Resampling.LANCZOS  # For Pillow >=10.0.0
-            except AttributeError:
-                resampling_filter = Image.LANCZOS  # For Pillow <10.0.0
 
-            resized_img = img.resize((width, height), resampling_filter)
-            print(f"Resized thumbnail to: {resized_img.size}")
+def download_audio(url, name, replace_id=None, old_name=None, concurrent_fragments=CONCURRENT_FRAGMENTS):
+    """
+    Audio-only ingest for transcription-only workloads: downloads just the audio track and
+    stores it as public/audio/<name>.flac, mono at AUDIO_SAMPLE_RATE. RequestSpeech picks it
+    up when there is no public/videos/<name>.mp4.
+    """
+    same_name_replacement = old_name == name if old_name else False
+    temp_name = f"{name}_temp" if same_name_replacement else name
+    os.makedirs(AUDIO_DIR, exist_ok=True)
 
-            # Define the new path in 'public/img'
-            thumbnail_png_path = f'public/img/{name}.png'
-            resized_img.save(thumbnail_png_path, format='PNG')
-            print(f"Thumbnail saved to '{thumbnail_png_path}'")
+    ydl_opts = audio_only_options(f'{AUDIO_DIR}/{temp_name}.%(ext)s')
+    ydl_opts.update({
+        'writethumbnail': True,
+        'thumbnailformat': 'webp',
+        'quiet': False,
+        'no_warnings': True,
+        'concurrent_fragment_downloads': concurrent_fragments,
+    })
 
-            # Optional: Delete the original thumbnail to save space
-            os.remove(original_thumbnail_path)
-            print(f"Deleted original thumbnail '{original_thumbnail_path}'")
+    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        try:
+            print(f"Starting audio-only download: '{url}'")
+            info_dict = ydl.extract_info(url, download=True)
+            duration = info_dict.get('duration') or 0
+            print(f"Audio download complete. Duration: {duration}s")
+
+            os.makedirs('public/img', exist_ok=True)
+            webp_path = f'{AUDIO_DIR}/{temp_name}.webp'
+            if os.path.exists(webp_path):
+                convert_thumbnail(webp_path, name)
+
+            audio_path = f'{AUDIO_DIR}/{name}.{AUDIO_FORMAT}'
+            if same_name_replacement:
+                os.replace(f'{AUDIO_DIR}/{temp_name}.{AUDIO_FORMAT}', audio_path)
+                print(f"Successfully replaced {name} with new version")
+            return {'filepath': audio_path, 'duration': duration}
+        except yt_dlp.utils.DownloadError as e:
+            print(f"An error occurred while downloading the audio: {e}")
+            return None
+
+
+def convert_thumbnail(original_thumbnail_path, name):
+    """Writes the PNG poster and WebP thumbnail sizes for name, then deletes the original."""
+    print(f"Generating thumbnails from: {original_thumbnail_path}")
+    try:
+        for path in thumbnails.make_thumbnails(original_thumbnail_path, name):
+            print(f"Thumbnail saved to '{path}'")
+        os.remove(original_thumbnail_path)
+        print(f"Deleted original thumbnail '{original_thumbnail_path}'")
     except IOError as e:
         print(f"Error processing the thumbnail image: {e}")
     except Exception as e:
         print(f"An unexpected error occurred during thumbnail conversion: {e}")
 
 
-def download_multiple_videos(urls, name, replace_id=None, old_name=None):
+def make_sprite(video_path, name):
+    """Builds the video's timeline sprite sheet for search previews."""
+    try:
+        manifest = thumbnails.make_sprite(video_path, name)
+        if manifest:
+            print(f"Generated timeline sprite with {manifest['frames']} frames")
+    except Exception as e:
+        print(f"Error generating timeline sprite: {e}")
+
+
+def download_part(url, index, name, temp_dir, concurrent_fragments=CONCURRENT_FRAGMENTS, show_progress=True,
+                  audio_only=False):
+    """
+    Downloads one part of a multi-URL video into temp_dir. Returns a dict with the part's
+    index, url, filepath and duration, and error set to a message if the download failed.
+    """
+    temp_name = f"{name}_part{index}"
+    extension = AUDIO_FORMAT if audio_only else 'mp4'
+    ydl_opts = {
+        'outtmpl': os.path.join(temp_dir, f'{temp_name}.%(ext)s'),
+        'format': 'bestvideo+bestaudio/best',
+        'merge_output_format': 'mp4',
+        'writethumbnail': True if index == 0 else False,  # Only get thumbnail from first video
+        'thumbnailformat': 'webp',
+        'quiet': False,
+        'noprogress': not show_progress,  # Progress bars of concurrent parts would interleave
+        'no_warnings': True,
+        'concurrent_fragment_downloads': concurrent_fragments,
+        'postprocessors': [{
+            'key': 'FFmpegVideoConvertor',
+            'preferedformat': 'mp4',
+        }],
+    }
+    if audio_only:
+        ydl_opts.update(audio_only_options(ydl_opts['outtmpl']))
+        ydl_opts.pop('merge_output_format')
+    part = {'index': index, 'url': url, 'filepath': os.path.join(temp_dir, f'{temp_name}.{extension}'),
+            'duration': 0, 'error': None}
+
+    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        try:
+            print(f"Starting download of part {index+1}: '{url}'")
+            info_dict = ydl.extract_info(url, download=True)
+            part['duration'] = info_dict.get('duration') or 0
+            if not os.path.exists(part['filepath']):
+                part['error'] = f"expected output file '{part['filepath']}' was not created"
+            else:
+                print(f"Part {index+1} duration: {part['duration']}s")
+        except yt_dlp.utils.DownloadError as e:
+            part['error'] = str(e)
+    return part
+
+
+def download_multiple_videos(urls, name, replace_id=None, old_name=None,
+                             workers=DOWNLOAD_WORKERS, concurrent_fragments=CONCURRENT_FRAGMENTS, audio_only=False):
     # Create a temporary directory for intermediate files
     with tempfile.TemporaryDirectory() as temp_dir:
-        video_files = []
-        total_duration = 0
-        individual_durations = []
-        
-        # Download each video separately
-        for i, url in enumerate(urls):
-            temp_name = f"{name}_part{i}"
-            ydl_opts = {
-                'outtmpl': os.path.join(temp_dir, f'{temp_name}.%(ext)s'),
-                'format': 'bestvideo+bestaudio/best',
-                'merge_output_format': 'mp4',
-                'writethumbnail': True if i == 0 else False,  # Only get thumbnail from first video
-                'thumbnailformat': 'webp',
-                'quiet': False,
-                'no_warnings': True,
-                'postprocessors': [{
-                    'key': 'FFmpegVideoConvertor',
-                    'preferedformat': 'mp4',
-                }],
-            }
-
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                try:
-                    print(f"Starting download of part {i+1}: '{url}'")
-                    info_dict = ydl.extract_info(url, download=True)
-                    video_files.append(os.path.join(temp_dir, f'{temp_name}.mp4'))
-                    # Add duration of each video
-                    duration = info_dict.get('duration', 0)
-                    individual_durations.append(duration)
-                    total_duration += duration
-                    print(f"Part {i+1} duration: {duration}s")
-                except yt_dlp.utils.DownloadError as e:
-                    print(f"Error downloading video part {i+1}: {e}")
-                    return None
+        # Download up to `workers` parts at once; results are put back in URL order for the concat
+        workers = max(1, min(workers, len(urls)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(download_part, url, i, name, temp_dir, concurrent_fragments, workers == 1, audio_only)
+                for i, url in enumerate(urls)
+            ]
+            parts = [future.result() for future in futures]
+
+        failed = [part for part in parts if part['error']]
+        for part in failed:
+            print(f"Error downloading video part {part['index']+1} ('{part['url']}'): {part['error']}")
+        if failed:
+            print(f"{len(failed)} of {len(parts)} parts failed; not concatenating.")
+            return None
+
+        video_files = [part['filepath'] for part in parts]
+        individual_durations = [part['duration'] for part in parts]
+        total_duration = sum(individual_durations)
 
         if not video_files:
             return None
@@ -301,7 +341,8 @@ def download_multiple_videos(urls, name, replace_id=None, old_name=None):
                 f.write(f"file '{video_file}'\n")
 
         # Verify the actual duration using ffprobe after concatenation
-        output_path = f'public/videos/{name}.mp4'
+        output_path = f'{AUDIO_DIR}/{name}.{AUDIO_FORMAT}' if audio_only else f'public/videos/{name}.mp4'
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
         try:
             subprocess.run([
                 'ffmpeg', '-f', 'concat', '-safe', '0',
@@ -320,7 +361,7 @@ def download_multiple_videos(urls, name, replace_id=None, old_name=None):
                 actual_duration = float(probe_data['format']['duration'])
                 print(f"Actual concatenated video duration (ffprobe): {actual_duration}s")
                 total_duration = actual_duration  # Use the actual duration instead
-            except (subprocess.CalledProcessError, json.JSONDecodeError, KeyError) as e:
+            except (subprocess.CalledProcessError, FileNotFoundError, json.JSONDecodeError, KeyError) as e:
                 print(f"Warning: Could not verify final duration: {e}")
             
             print(f"Successfully concatenated videos (final duration: {total_duration}s)")
@@ -329,11 +370,14 @@ def download_multiple_videos(urls, name, replace_id=None, old_name=None):
             thumbnail_path = os.path.join(temp_dir, f'{name}_part0.webp')
             if os.path.exists(thumbnail_path):
                 print(f"Thumbnail downloaded at '{thumbnail_path}'")
-                convert_thumbnail(thumbnail_path, name, width=810, height=449)
+                convert_thumbnail(thumbnail_path, name)
             else:
                 print("Thumbnail was not downloaded.")
+            if not audio_only:
+                make_sprite(output_path, name)
             
-            return {'filepath': output_path, 'duration': total_duration}
+            return {'filepath': output_path, 'duration': total_duration,
+                    'parts': [{'url': part['url'], 'duration': part['duration']} for part in parts]}
         except subprocess.CalledProcessError as e:
             print(f"Error concatenating videos: {e.stderr.decode()}")
             return None
@@ -345,14 +389,20 @@ def wipe_data():
     This includes:
     - asc/ directory and its contents
     - public/videos/*.mp4 files
-    - public/img/*.png files
+    - public/img/*.png files, thumbnail sizes and timeline sprites
     - public/results-json/*.json files
+    - public/results-store/*.transcript files
+    - public/audio/* audio-only ingests
     """
     paths_to_clean = [
         ('asc', '*'),  # All ASC directories and files
         ('public/videos', '*.mp4'),  # All videos
+        (AUDIO_DIR, f'*.{AUDIO_FORMAT}'),  # All audio-only ingests
         ('public/img', '*.png'),  # All thumbnails
-        ('public/results-json', '*.json')  # All transcription results
+        (thumbnails.THUMB_DIR, '*'),  # All thumbnail sizes
+        (thumbnails.SPRITE_DIR, '*'),  # All timeline sprites
+        ('public/results-json', '*.json'),  # All transcription results (JSON export)
+        ('public/results-store', '*.transcript')  # All transcription results (columnar store)
     ]
     
     for base_dir, pattern in paths_to_clean:
@@ -379,6 +429,9 @@ def wipe_data():
         except Exception as e:
             print(f"Error processing {base_dir}: {e}")
     
+    # The results are gone, so no video counts as processed any more, and the search index rechecks
+    transcript_store.bump_generation()
+    video_catalog.Catalog().clear_processing()
     print("Data wipe complete. Workspace reset to clean state.")
 
 
@@ -387,6 +440,12 @@ def main():
     parser.add_argument('--download', type=str, help='Download video from URL')
     parser.add_argument('--manage', action='store_true', help='Open video management menu')
     parser.add_argument('--wipeData', action='store_true', help='Wipe all temporary and output files')
+    parser.add_argument('--workers', type=int, default=DOWNLOAD_WORKERS,
+                        help='Parts of a multi-URL download to fetch concurrently')
+    parser.add_argument('--fragments', type=int, default=CONCURRENT_FRAGMENTS,
+                        help='Concurrent fragment downloads within each video (HLS/DASH)')
+    parser.add_argument('--audio-only', action='store_true',
+                        help=f'Store only the audio track (mono {AUDIO_SAMPLE_RATE} Hz {AUDIO_FORMAT}) for transcription')
     parser.add_argument('args', nargs='*', help='Additional arguments')
     
     args = parser.parse_args()
@@ -395,10 +454,10 @@ def main():
         wipe_data()
         return
         
-    config = load_config()
+    catalog = load_catalog()
     
     if args.manage:
-        manage_videos(config)
+        manage_videos(catalog)
     elif args.download:
         if len(args.args) < 2:
             print("Error: --download requires NAME and REPLACE_ID arguments.")
@@ -408,31 +467,37 @@ def main():
         name = args.args[0]
         replace_id = args.args[1].upper() if len(args.args) >= 2 else None
         urls = [url.strip() for url in args.download.split(',')]
+        download_single = download_audio if args.audio_only else download_video
+        kind = video_catalog.AUDIO if args.audio_only else video_catalog.VIDEO
+        ingest_id = catalog.start_ingest(name, urls, kind)
         
         if replace_id:
             # Get the old name before replacement
-            old_name = None
-            for video in config['videos']:
-                if video['id'] == replace_id:
-                    old_name = video['name']
-                    break
+            old_name = catalog.slots().get(replace_id) or None
             
             # Download the video regardless of name
             if len(urls) > 1:
-                info_dict = download_multiple_videos(urls, name, replace_id, old_name)
+                info_dict = download_multiple_videos(urls, name, replace_id, old_name, args.workers, args.fragments,
+                                                     args.audio_only)
             else:
-                info_dict = download_video(urls[0], name, replace_id, old_name)
+                info_dict = download_single(urls[0], name, replace_id, old_name, args.fragments)
             
             if info_dict:
-                replace_video(config, replace_id, name, info_dict.get('duration', 0))
+                replace_video(catalog, replace_id, name, info_dict.get('duration', 0), kind, info_dict['filepath'])
         else:
             if len(urls) > 1:
-                info_dict = download_multiple_videos(urls, name)
+                info_dict = download_multiple_videos(urls, name, workers=args.workers,
+                                                     concurrent_fragments=args.fragments, audio_only=args.audio_only)
             else:
-                info_dict = download_video(urls[0], name)
+                info_dict = download_single(urls[0], name, concurrent_fragments=args.fragments)
             
             if info_dict:
-                add_video(config, name, info_dict.get('duration', 0))
+                add_video(catalog, name, info_dict.get('duration', 0), kind, info_dict['filepath'])
+
+        if info_dict:
+            catalog.finish_ingest(ingest_id, info_dict['filepath'], info_dict.get('duration', 0))
+        else:
+            catalog.finish_ingest(ingest_id, error="Download failed; see the output above.")
     else:
         parser.print_help()
 
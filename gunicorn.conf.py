@@ -0,0 +1,64 @@
+"""
+Multi-process production server: gunicorn reads this file from the working directory,
+so `gunicorn api:app` starts vidscribe with several worker processes.
+
+Job state, progress events and the search index live in local SQLite stores under
+cache/, so any worker can accept a job, stream its progress or search. On SIGTERM
+(or a HUP reload) each worker ends its event streams, stops taking jobs and finishes
+the ones it is running before exiting; jobs that outlast VIDSCRIBE_DRAIN_TIMEOUT are
+requeued and resume from their checkpoint in another worker.
+"""
+import os
+import signal
+import threading
+
+from crux_processor import static_assets
+
+bind = os.environ.get("VIDSCRIBE_BIND", "0.0.0.0:4000")
+workers = int(os.environ.get("VIDSCRIBE_SERVER_WORKERS", os.cpu_count() or 1))
+worker_class = "gthread"
+threads = int(os.environ.get("VIDSCRIBE_SERVER_THREADS", 16))  # Each open /stream client holds a thread
+# The job scheduler and event poller start threads, which must happen in each worker after the fork
+preload_app = False
+# One processing job per worker process unless configured otherwise
+os.environ.setdefault("VIDSCRIBE_PROCESS_WORKERS", "1")
+drain_timeout = float(os.environ.get("VIDSCRIBE_DRAIN_TIMEOUT", 300))
+# Workers still alive this long after SIGTERM are killed by the master
+graceful_timeout = int(drain_timeout) + 15
+
+
+def on_starting(server):
+    # Refresh precompressed variants of any static files edited since the last build
+    static_assets.build("public")
+
+
+def post_worker_init(worker):
+    import api
+    api.start_services()
+
+    def start_drain():
+        if worker.drain is None:
+            worker.drain = threading.Thread(target=api.shutdown, args=(drain_timeout,), name="drain")
+            worker.drain.start()
+
+    handle_exit = worker.handle_exit
+
+    def begin_drain(signum, frame):
+        handle_exit(signum, frame)
+        # Closing the event streams lets gunicorn's wait for open connections end promptly
+        start_drain()
+
+    run = worker.run
+
+    def run_and_drain():
+        run()
+        start_drain()
+        # Keep heartbeating so the master does not take a draining worker for a hung one
+        while worker.drain.is_alive():
+            worker.notify()
+            worker.drain.join(1)
+        worker.log.info(f"Worker drained (pid: {worker.pid})")
+
+    worker.drain = None
+    worker.run = run_and_drain
+    signal.signal(signal.SIGTERM, begin_drain)
@@ -3,6 +3,8 @@ var VIDEOSET = {};
 
 // Update the videoImageSet and videoSet arrays based on the global variables
 var videoImageSet = [VIDEO1 + ".png", VIDEO2 + ".png", VIDEO3 + ".png"];
+// Tiles use the compact WebP thumbnail and fall back to the PNG poster for older downloads
+var videoThumbSet = [VIDEO1, VIDEO2, VIDEO3].map(name => "img/thumbs/" + name + "-medium.webp");
 var videoSet = [VIDEO1 + ".mp4", VIDEO2 + ".mp4", VIDEO3 + ".mp4"];
 var videoArrayLength = videoSet.length;
 
@@ -55,52 +57,43 @@ $('#my-video-1, #my-video-2, #my-video-3, #my-video').hover(function toggleContr
     $('#myimage-' + this.getAttribute("data-vid")).addClass('box');
 });
 
-// Bind onload to handle video and image setup
-var bindOnload = function (xhr, i) {
-    xhr.onload = function (e) {
-        if (this.status === 200) {
-            var myBlob = this.response;
-            var vid = (window.URL ? window.URL : window.webkitURL).createObjectURL(myBlob);
+// Point each video and its tile at the server; the player fetches byte ranges as it
+// plays and seeks instead of downloading the whole file first
+var bindVideo = function (i) {
+    var videoIndex = i + 1;
 
-            var videoIndex = i + 1; // Assuming i starts at 0
-
-            // Get the video element
-            var video = document.getElementById('my-video-' + videoIndex);
-            if (video) {
-                video.src = vid;
-                video.setAttribute('poster', "img/" + videoImageSet[i]);
-            } else {
-                console.error(`Video element with ID 'my-video-${videoIndex}' not found.`);
-            }
+    // Get the video element
+    var video = document.getElementById('my-video-' + videoIndex);
+    if (video) {
+        video.preload = "metadata";
+        video.src = '/api/Video/starter/' + encodeURIComponent(videoSet[i]);
+        video.setAttribute('poster', "img/" + videoImageSet[i]);
+    } else {
+        console.error(`Video element with ID 'my-video-${videoIndex}' not found.`);
+    }
 
-            // Get the image element
-            var image = document.getElementById('myimage-' + videoIndex);
-            if (image) {
-                image.src = "img/" + videoImageSet[i];
-            } else {
-                console.error(`Image element with ID 'myimage-${videoIndex}' not found.`);
-            }
+    // Get the image element
+    var image = document.getElementById('myimage-' + videoIndex);
+    if (image) {
+        image.onerror = function () {
+            this.onerror = null;
+            this.src = "img/" + videoImageSet[i];
+        };
+        image.src = videoThumbSet[i];
+    } else {
+        console.error(`Image element with ID 'myimage-${videoIndex}' not found.`);
+    }
 
-            // Update VIDEOSET (ensure VIDEOSET is defined elsewhere)
-            if (typeof VIDEOSET !== 'undefined') {
-                VIDEOSET[`video${videoIndex}`] = "img/" + videoImageSet[i];
-            } else {
-                console.warn("VIDEOSET is not defined.");
-            }
-        }
-        else {
-            console.log("error: " + e);
-        }
-    };
+    // Update VIDEOSET (ensure VIDEOSET is defined elsewhere)
+    if (typeof VIDEOSET !== 'undefined') {
+        VIDEOSET[`video${videoIndex}`] = "img/" + videoImageSet[i];
+    } else {
+        console.warn("VIDEOSET is not defined.");
+    }
 };
 
-// Fetch and bind video sources
 for (var i = 0; i < videoArrayLength; i++) {
-    var xhr = new XMLHttpRequest();
-    xhr.open('GET', '/api/Video/starter/' + videoSet[i], true);
-    xhr.responseType = 'blob';
-    bindOnload(xhr, i);
-    xhr.send();
+    bindVideo(i);
 }
 
 // Update video titles
@@ -113,9 +106,7 @@ for (var a = 0; a < videoArrayLength; a++) {
 
 // Function to process video and handle SSE messages
 function postProcessVideo(position, video) {
-    const source = new EventSource('/stream');
-
-    source.onmessage = event => {
+    const onStreamMessage = event => {
         try {
             const data_pack = JSON.parse(event.data);
 
@@ -134,6 +125,9 @@ function postProcessVideo(position, video) {
             } else if (data_pack.type === "error") {
                 const errorMessage = `ERROR: [${data_pack.clip}] ${data_pack.text}`;
                 serverDataSpeech.innerHTML = `${errorMessage}<br>${serverDataSpeech.innerHTML}`;
+            } else if (data_pack.type === "metrics") {
+                // Stage timings and clip counts, for tooling; not shown in the transcript panel
+                console.debug("Processing metrics:", data_pack);
             } else {
                 // Handle any other message types if necessary
                 console.warn("Unknown message type:", data_pack.type);
@@ -153,14 +147,12 @@ function postProcessVideo(position, video) {
     $.post(url, dat)
         .done(data => {
             const $notLoading = $(`.group-${position} span.not-loading`);
-            // Check if the status is completed
-            if (data.status === "completed") {
-                $notLoading.removeClass("loading");
-                $notLoading.html(`<span class="btn-notice btn-success">${data.message}</span>`);
-                source.close();
-            } else {
-                $notLoading.append(`<span class="loaded-two btn-notice">${data.message}</span>`);
-            }
+            $notLoading.append(`<span class="loaded-two btn-notice">${data.message}</span>`);
+            // Follow only this job's channel, replaying anything published before we connected
+            const source = new EventSource(`/stream?channel=${data.job_id}&lastEventId=0`);
+            source.onmessage = onStreamMessage;
+            // Processing runs as a background job; poll its status until it finishes
+            pollJob(data.job_id, position, source);
         })
         .fail(data => {
             const $notLoading = $(`.group-${position} span.not-loading`);
@@ -168,10 +160,32 @@ function postProcessVideo(position, video) {
             // Display error message from backend if available
             const errorMsg = data.responseJSON?.error || "An error occurred.";
             $notLoading.html(`<span class="btn-notice btn-danger">${errorMsg}</span>`);
-            source.close();
         });
 }
 
+// Poll a processing job until it completes or fails
+function pollJob(jobId, position, source) {
+    $.getJSON(`/api/Jobs/${jobId}`)
+        .done(job => {
+            const $notLoading = $(`.group-${position} span.not-loading`);
+            if (job.status === "completed") {
+                $notLoading.removeClass("loading");
+                $notLoading.html(`<span class="btn-notice btn-success">${job.video_name} speech processing completed.</span>`);
+                source.close();
+            } else if (job.status === "failed") {
+                $notLoading.removeClass("loading");
+                $notLoading.html(`<span class="btn-notice btn-danger">${job.error || "Processing failed."}</span>`);
+                source.close();
+            } else {
+                const progress = job.stages[job.stage];
+                const stageText = progress ? `${job.stage} ${progress.done}/${progress.total}` : job.status;
+                $notLoading.find('.loaded-two').text(stageText);
+                setTimeout(() => pollJob(jobId, position, source), 2000);
+            }
+        })
+        .fail(() => setTimeout(() => pollJob(jobId, position, source), 5000));
+}
+
 // Function to perform search
 function postWordList() {
     var url = "/api/Words";
@@ -199,11 +213,12 @@ function postWordList() {
 
             // 'data' is already a JavaScript object
             $.each(data, function (key, value) {
-                var keySplit = key.split('-');
+                // Keys are "<video>-<second>"; video names may contain hyphens themselves
+                var keySplit = key.lastIndexOf('-');
                 var valueSplit = value.split('-');
                 var glyph = (valueSplit[1] === "tag" ? "tag" : "user"); // Ensure correct glyph class
-                var videoTitle = keySplit[0];
-                var videoSec = keySplit[1];
+                var videoTitle = key.substring(0, keySplit);
+                var videoSec = key.substring(keySplit + 1);
                 var videoNumber = getVideoNumber(videoTitle);
                 var btnClass = `btn-skittle btn-${valueSplit[1]}`;
                 var btnHtml = `
@@ -211,7 +226,7 @@ function postWordList() {
                          onclick="postSecond(${videoNumber}, ${videoSec})" 
                          class="row ${btnClass}" data-vid="${videoNumber}" data-sec="${videoSec}">
                         <span class="col-xs-1 glyphicon glyphicon-${glyph} glyph-${glyph}"></span>
-                        <span class="col-xs-10 link-text-body">${valueSplit[0]}</span>
+                        <span class="col-xs-10 link-text-body">${valueSplit[0]}${clipPreview(videoTitle, videoSec)}</span>
                         <span class="col-xs-1 btn-span">${videoSec} s</span>
                     </div>`;
 
@@ -235,6 +250,33 @@ function postWordList() {
     });
 }
 
+// Timeline sprite manifests by video name, written by crux_processor/thumbnails.py
+var SPRITES = {};
+
+function loadSprite(name) {
+    if (!name || name in SPRITES) {
+        return;
+    }
+    SPRITES[name] = null;
+    $.getJSON(`img/sprites/${encodeURIComponent(name)}.json`)
+        .done(manifest => { SPRITES[name] = manifest; });
+}
+
+// Preview frame of the clip at `second`, cropped from the video's sprite sheet
+function clipPreview(name, second) {
+    const sprite = SPRITES[name];
+    if (!sprite) {
+        return "";
+    }
+    const frame = Math.min(Math.floor(second / sprite.interval), sprite.frames - 1);
+    const x = (frame % sprite.columns) * sprite.frame_width;
+    const y = Math.floor(frame / sprite.columns) * sprite.frame_height;
+    return `<span class="clip-preview" style="width: ${sprite.frame_width}px; height: ${sprite.frame_height}px;
+        background-image: url('img/sprites/${encodeURIComponent(sprite.image)}'); background-position: -${x}px -${y}px;"></span>`;
+}
+
+[VIDEO1, VIDEO2, VIDEO3].forEach(loadSprite);
+
 // Helper function to get video number based on title
 function getVideoNumber(title) {
     for (let i = 1; i <= videoArrayLength; i++) {
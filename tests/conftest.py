@@ -0,0 +1,25 @@
+import io
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from crux_processor.video_per_second import write_wav  # noqa: E402
+
+TEST_FRAME_RATE = 16000
+
+
+@pytest.fixture
+def make_clip():
+    """Returns make_clip(seed, seconds=1.0, amplitude=3000): an in-memory WAV of noise, distinct per seed."""
+    def make(seed, seconds=1.0, amplitude=3000):
+        rng = np.random.default_rng(seed)
+        samples = (rng.standard_normal(int(TEST_FRAME_RATE * seconds)) * amplitude).astype(np.int16)
+        buffer = io.BytesIO()
+        write_wav(buffer, samples, TEST_FRAME_RATE)
+        buffer.seek(0)
+        return buffer
+    return make
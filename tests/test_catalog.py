@@ -0,0 +1,51 @@
+import pytest
+
+import download_video
+from crux_processor import catalog
+
+
+@pytest.fixture
+def video_catalog(tmp_path):
+    return catalog.Catalog(str(tmp_path / "catalog.sqlite3"))
+
+
+def status(video_catalog, name="movie"):
+    processing = video_catalog.get_video(name)["processing"]
+    return processing["status"], processing["job_id"]
+
+
+@pytest.mark.parametrize("claimed_state", [catalog.RUNNING, catalog.COMPLETED, catalog.FAILED])
+def test_queued_does_not_overwrite_a_claimed_job(video_catalog, claimed_state):
+    # The worker claimed the job and wrote its state before the submitter recorded it as queued
+    video_catalog.set_processing("movie", claimed_state, job_id="job-1")
+    video_catalog.set_processing("movie", catalog.QUEUED, job_id="job-1")
+    assert status(video_catalog) == (claimed_state, "job-1")
+
+
+def test_a_new_job_is_queued_over_a_finished_one(video_catalog):
+    video_catalog.set_processing("movie", catalog.QUEUED, job_id="job-1")
+    video_catalog.set_processing("movie", catalog.RUNNING, job_id="job-1")
+    video_catalog.set_processing("movie", catalog.COMPLETED, job_id="job-1", clips=4)
+    video_catalog.set_processing("movie", catalog.QUEUED, job_id="job-2")
+    assert status(video_catalog) == (catalog.QUEUED, "job-2")
+    assert video_catalog.get_video("movie")["processing"]["clips"] == 4
+
+    video_catalog.set_processing("movie", catalog.QUEUED, job_id="job-2")
+    video_catalog.set_processing("movie", catalog.RUNNING)  # Processing outside the scheduler
+    assert status(video_catalog) == (catalog.RUNNING, "job-2")
+
+
+def test_replacing_a_video_keeps_the_old_entry_and_its_history(video_catalog, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    ingest_id = video_catalog.start_ingest("old", ["https://example.com/old.mp4"])
+    video_catalog.finish_ingest(ingest_id, "public/videos/old.mp4", 30)
+    video_catalog.assign_slot("VIDEO1", "old")
+    video_catalog.set_processing("old", catalog.COMPLETED, job_id="job-1", clips=3)
+
+    assert download_video.replace_video(video_catalog, "VIDEO1", "new", 20, media_path="public/videos/new.mp4") == \
+        ("VIDEO1", "old", "new")
+    assert video_catalog.slots()["VIDEO1"] == "new"
+    old = video_catalog.get_video("old")
+    assert (old["slot"], old["media_path"], old["duration"]) == (None, None, 30)
+    assert status(video_catalog, "old") == (catalog.COMPLETED, "job-1")
+    assert [ingest["id"] for ingest in old["ingests"]] == [ingest_id]
@@ -0,0 +1,121 @@
+import functools
+import http.server
+import os
+import shutil
+import subprocess
+import threading
+import time
+import wave
+
+import moviepy.editor as mp
+import pytest
+
+import download_video
+
+PART_SECONDS = [2, 3, 4]
+
+
+def make_part(path, seconds):
+    subprocess.run([
+        'ffmpeg', '-y', '-v', 'error',
+        '-f', 'lavfi', '-i', f'testsrc=size=320x240:rate=10:duration={seconds}',
+        '-f', 'lavfi', '-i', f'sine=frequency=440:sample_rate=44100:duration={seconds}',
+        '-c:v', 'libx264', '-preset', 'ultrafast',
+        '-c:a', 'aac', '-ac', '2', '-shortest',
+        path
+    ], check=True)
+
+
+class ThrottledHandler(http.server.SimpleHTTPRequestHandler):
+    """Serves files at bytes_per_second per connection, a stand-in for a remote host's bandwidth."""
+    bytes_per_second = 250000
+
+    def copyfile(self, source, outputfile):
+        chunk = 16384
+        while True:
+            data = source.read(chunk)
+            if not data:
+                break
+            outputfile.write(data)
+            time.sleep(len(data) / self.bytes_per_second)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class QuietServer(http.server.ThreadingHTTPServer):
+    def handle_error(self, request, client_address):
+        # yt-dlp closes probing connections early; that is expected here
+        pass
+
+
+def serve(directory, bytes_per_second):
+    handler = type('Handler', (ThrottledHandler,), {'bytes_per_second': bytes_per_second})
+    server = QuietServer(('127.0.0.1', 0), functools.partial(handler, directory=directory))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+@pytest.fixture(scope="module")
+def part_urls(tmp_path_factory):
+    """URLs of PART_SECONDS-long test videos on a local throttled server."""
+    serve_dir = tmp_path_factory.mktemp("serve")
+    for n, seconds in enumerate(PART_SECONDS):
+        make_part(str(serve_dir / f"part{n}.mp4"), seconds)
+    server = serve(str(serve_dir), 2000000)
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    yield [f"{base}/part{n}.mp4" for n in range(len(PART_SECONDS))]
+    server.shutdown()
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("public/videos")
+    os.makedirs("public/img")
+    return tmp_path
+
+
+def test_download_part_fetches_one_part(part_urls, tmp_path):
+    part = download_video.download_part(part_urls[1], 1, "movie", str(tmp_path), show_progress=False)
+    assert part['error'] is None
+    assert part['index'] == 1 and part['url'] == part_urls[1]
+    assert part['filepath'] == str(tmp_path / "movie_part1.mp4")
+    assert os.path.getsize(part['filepath']) > 0
+
+
+@pytest.mark.parametrize("audio_only", [False, True])
+def test_download_part_reports_a_failed_part(part_urls, tmp_path, audio_only):
+    missing = part_urls[0].replace("part0", "missing")
+    part = download_video.download_part(missing, 2, "movie", str(tmp_path), show_progress=False,
+                                        audio_only=audio_only)
+    assert part['error']
+    assert not os.path.exists(part['filepath'])
+
+
+def test_multiple_urls_are_concatenated_in_url_order(part_urls, workdir):
+    info = download_video.download_multiple_videos(part_urls, "movie", workers=3)
+    assert info is not None
+    assert [part['url'] for part in info['parts']] == part_urls
+    assert os.path.isfile("public/videos/movie.mp4")
+    with mp.VideoFileClip("public/videos/movie.mp4") as clip:
+        assert abs(clip.duration - sum(PART_SECONDS)) < 1
+
+
+def test_one_failed_part_fails_the_download(part_urls, workdir):
+    urls = part_urls[:1] + [part_urls[0].replace("part0", "missing")] + part_urls[1:]
+    assert download_video.download_multiple_videos(urls, "movie", workers=3) is None
+    assert not os.path.exists("public/videos/movie.mp4")
+
+
+@pytest.mark.skipif(shutil.which("ffprobe") is None, reason="yt-dlp audio extraction needs ffprobe")
+def test_download_part_audio_only(part_urls, tmp_path):
+    part = download_video.download_part(part_urls[0], 0, "movie", str(tmp_path), show_progress=False,
+                                        audio_only=True)
+    assert part['error'] is None
+    assert part['filepath'] == str(tmp_path / f"movie_part0.{download_video.AUDIO_FORMAT}")
+    decoded = str(tmp_path / "decoded.wav")
+    subprocess.run(['ffmpeg', '-y', '-v', 'error', '-i', part['filepath'], decoded], check=True)
+    with wave.open(decoded) as w:
+        assert w.getnchannels() == 1
+        assert w.getframerate() == download_video.AUDIO_SAMPLE_RATE
@@ -0,0 +1,122 @@
+import threading
+import time
+
+import pytest
+
+from crux_processor import events
+
+
+def drain(sub, timeout=0.01):
+    """The events queued for sub, as (event_id, channel, message) tuples."""
+    received = []
+    while True:
+        event = sub.pop(timeout)
+        if event is None:
+            return received
+        received.append(event)
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def shared_path(tmp_path):
+    return str(tmp_path / "events.sqlite3")
+
+
+def test_every_subscriber_gets_every_event_of_its_channel():
+    broker = events.EventBroker()
+    everything = [broker.subscribe(), broker.subscribe()]
+    job = broker.subscribe("job-1")
+    first = broker.publish("started", "job-1")
+    second = broker.publish("started", "job-2")
+
+    for sub in everything:
+        assert drain(sub) == [(first, "job-1", "started"), (second, "job-2", "started")]
+    assert drain(job) == [(first, "job-1", "started")]
+
+
+def test_a_lagging_subscriber_drops_the_oldest_events():
+    broker = events.EventBroker(subscriber_queue_size=3)
+    slow, fast = broker.subscribe(), broker.subscribe()
+    ids = []
+    for n in range(5):
+        ids.append(broker.publish(f"message {n}"))
+        assert drain(fast)[0][0] == ids[-1]
+
+    assert [event[0] for event in drain(slow)] == ids[2:]
+    assert (slow.dropped, fast.dropped) == (2, 0)
+
+
+def test_last_event_id_replays_the_channels_buffered_events():
+    broker = events.EventBroker()
+    first = broker.publish("a", "job-1")
+    other = broker.publish("b", "job-2")
+    last = broker.publish("c", "job-1")
+
+    assert drain(broker.subscribe("job-1", last_event_id=first)) == [(last, "job-1", "c")]
+    assert drain(broker.subscribe(last_event_id=first)) == [(other, "job-2", "b"), (last, "job-1", "c")]
+    assert drain(broker.subscribe("job-1")) == []
+
+
+def test_event_stream_formats_events_and_ends_on_close():
+    broker = events.EventBroker(heartbeat_interval=0.05)
+    stream = broker.event_stream("job-1")
+    received = []
+
+    def read():
+        for chunk in stream:
+            received.append(chunk)
+
+    reader = threading.Thread(target=read)
+    reader.start()
+    wait_for(lambda: broker.subscriber_count() == 1)
+    event_id = broker.publish("progress 50", "job-1")
+    wait_for(lambda: f"id: {event_id}\ndata: progress 50\n\n" in received)
+    wait_for(lambda: ": heartbeat\n\n" in received)
+
+    broker.close()
+    reader.join(1)
+    assert not reader.is_alive()
+    assert broker.subscriber_count() == 0
+    assert broker.subscribe().closed
+
+
+def test_shared_events_reach_subscribers_of_another_instance(shared_path):
+    publisher = events.SharedEventBroker(shared_path, poll_interval=0.02)
+    subscriber = events.SharedEventBroker(shared_path, poll_interval=0.02)
+    sub = subscriber.subscribe("job-1")
+    event_id = publisher.publish("done", "job-1")
+    publisher.publish("done", "job-2")
+
+    wait_for(lambda: subscriber.last_id == event_id + 1)
+    assert drain(sub) == [(event_id, "job-1", "done")]
+    # Ids come from the shared table, so a Last-Event-ID from one process is valid in another
+    assert drain(publisher.subscribe(last_event_id=event_id - 1))[0] == (event_id, "job-1", "done")
+    publisher.close()
+    subscriber.close()
+
+
+def test_shared_subscribe_hands_off_from_replay_to_live_events(shared_path):
+    publisher = events.SharedEventBroker(shared_path, poll_interval=0.02)
+    # Polls only when woken, so the test decides which events it has seen
+    subscriber = events.SharedEventBroker(shared_path, poll_interval=3600)
+    first = publisher.publish("a", "job-1")
+    replayed = publisher.publish("b", "job-1")
+    publisher.publish("c", "job-2")
+    subscriber.wakeup.set()
+    wait_for(lambda: subscriber.last_id == replayed + 1)
+    live = publisher.publish("d", "job-1")
+
+    sub = subscriber.subscribe("job-1", last_event_id=first)
+    assert drain(sub) == [(replayed, "job-1", "b")]
+    subscriber.wakeup.set()
+    wait_for(lambda: subscriber.last_id == live)
+    # Each event exactly once, in order
+    assert drain(sub) == [(live, "job-1", "d")]
+    publisher.close()
+    subscriber.close()
@@ -0,0 +1,78 @@
+import os
+import wave
+
+import numpy as np
+import pytest
+
+from crux_processor.video_per_second import CLIP_CHANNELS, CLIP_FRAME_RATE, RequestSpeech
+
+SOURCE_FRAME_RATE = 44100  # A typical video soundtrack, resampled by the decoder
+
+
+def write_audio(path, seconds):
+    with wave.open(str(path), "wb") as w:
+        w.setnchannels(2)
+        w.setsampwidth(2)
+        w.setframerate(SOURCE_FRAME_RATE)
+        noise = np.random.default_rng(0).standard_normal(int(SOURCE_FRAME_RATE * seconds)) * 3000
+        w.writeframes(np.repeat(noise.astype(np.int16), 2).tobytes())
+
+
+def make_speech(clip_length, **options):
+    speech = RequestSpeech(speech_backend="stub", use_transcript_cache=False, **options)
+    speech._clip_length = clip_length  # Set by transcribe_media from the container duration
+    return speech
+
+
+@pytest.mark.parametrize("engine", ["track", "clip"])
+def test_streaming_drops_the_trailing_sliver_clip(tmp_path, engine):
+    # An audio track 5 ms longer than the 20 s the clip count was computed from
+    write_audio(tmp_path / "movie.wav", 20.005)
+    speech = make_speech(2, streaming=True, dsp_engine=engine)
+    sources = list(speech.stream_clip_sources(str(tmp_path / "movie.wav"), str(tmp_path), "movie"))
+    assert [x for x, _, _ in sources] == [0, 1]
+
+
+def test_track_engine_writes_the_expected_clip_count(tmp_path):
+    write_audio(tmp_path / "movie.wav", 20.005)
+    clips = make_speech(2).track_extract_clips(str(tmp_path / "movie.wav"), str(tmp_path), "movie")
+    assert [os.path.basename(path) for path in clips] == ["movie-mini-000.wav", "movie-mini-001.wav"]
+    assert sorted(name for name in os.listdir(tmp_path) if name.startswith("movie-mini")) == \
+        ["movie-mini-000.wav", "movie-mini-001.wav"]
+
+
+def test_short_last_clip_is_kept(tmp_path):
+    write_audio(tmp_path / "movie.wav", 25)
+    clips = make_speech(3).track_extract_clips(str(tmp_path / "movie.wav"), str(tmp_path), "movie")
+    assert len(clips) == 3
+    with wave.open(clips[-1]) as w:
+        assert w.getnframes() == 5 * CLIP_FRAME_RATE
+
+
+def test_ffmpeg_clips_are_cut_exactly_at_the_decode_format(tmp_path):
+    write_audio(tmp_path / "movie.wav", 25)
+    clips = make_speech(3).ffmpeg_extract_clips(str(tmp_path / "movie.wav"), str(tmp_path), "movie", 3, 25)
+    assert len(clips) == 3
+    for path, seconds in zip(clips, [10, 10, 5]):
+        with wave.open(path) as w:
+            assert (w.getnchannels(), w.getframerate()) == (CLIP_CHANNELS, CLIP_FRAME_RATE)
+            assert w.getnframes() == seconds * CLIP_FRAME_RATE
+
+
+def test_pooled_preprocessing_matches_serial_output_in_clip_order(tmp_path, make_clip):
+    outputs = {}
+    for workers in (1, 2):
+        asc_dir = tmp_path / f"workers-{workers}"
+        os.makedirs(asc_dir)
+        for x in range(5):
+            if x != 3:  # A clip that failed to extract is skipped
+                # Longest first, so pooled clips tend to finish out of order
+                (asc_dir / f"movie-{x:03d}.wav").write_bytes(make_clip(x, seconds=8.0 - x).getvalue())
+        speech = make_speech(5, preprocess_workers=workers)
+        clips = speech.pydub_to_audio(str(asc_dir), "movie", 5, None)
+        assert [os.path.basename(path) for path in clips] == [f"movie-mini-{x:03d}.wav" for x in (0, 1, 2, 4)]
+        outputs[workers] = []
+        for path in clips:
+            with open(path, "rb") as f:
+                outputs[workers].append(f.read())
+    assert outputs[2] == outputs[1]
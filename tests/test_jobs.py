@@ -0,0 +1,182 @@
+import os
+import socket
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from crux_processor import jobs
+
+LEASE = 0.6  # Seconds; the scheduler renews every LEASE / HEARTBEATS_PER_LEASE
+
+
+@pytest.fixture
+def store_path(tmp_path):
+    return str(tmp_path / "jobs.sqlite3")
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+class GuardedWriter(object):
+    """run_job that writes through the job's guard until it completes or loses its lease."""
+
+    def __init__(self, seconds=None):
+        self.seconds = seconds
+        self.writes = []
+        self.lost = threading.Event()
+        self.started = threading.Event()
+
+    def __call__(self, job):
+        self.started.set()
+        end = None if self.seconds is None else time.monotonic() + self.seconds
+        try:
+            while end is None or time.monotonic() < end:
+                with job.guard():
+                    self.writes.append(time.time())
+                time.sleep(0.01)
+        except jobs.LeaseLost:
+            self.lost.set()
+            raise
+        return True
+
+
+def test_a_stale_heartbeat_is_requeued_whatever_the_owner_pid(store_path):
+    store = jobs.JobStore(store_path, lease_timeout=0.2)
+    job, _ = store.create("movie", max_queue=4)
+    # The pid is alive (it is this process), as a reused pid would be after a container restart
+    claimed = store.claim(f"{socket.gethostname()}:{os.getpid()}:old")
+    assert claimed.id == job.id
+    assert store.requeue_expired() == []
+
+    time.sleep(0.3)
+    assert store.requeue_expired() == [job.id]
+    requeued = store.get(job.id)
+    assert (requeued.status, requeued.owner) == (jobs.QUEUED, None)
+
+
+def test_renewed_leases_are_not_requeued(store_path):
+    writer = GuardedWriter(seconds=3 * LEASE)
+    scheduler = jobs.JobScheduler(writer, max_workers=1, store_path=store_path, lease_timeout=LEASE)
+    other = jobs.JobStore(store_path, lease_timeout=LEASE)
+    job, _ = scheduler.submit("movie")
+
+    writer.started.wait(5)
+    while scheduler.get(job.id).status == jobs.RUNNING:
+        assert other.requeue_expired() == []
+        time.sleep(0.05)
+    assert scheduler.get(job.id).status == jobs.COMPLETED
+    assert not writer.lost.is_set()
+    scheduler.shutdown(1)
+
+
+def test_stalled_heartbeat_stops_the_job_before_it_can_be_requeued(store_path, monkeypatch):
+    writer = GuardedWriter()
+    scheduler = jobs.JobScheduler(writer, max_workers=1, store_path=store_path, lease_timeout=LEASE)
+
+    def locked(leases):
+        raise sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(scheduler.store, "renew", locked)
+    other = jobs.JobStore(store_path, lease_timeout=LEASE)
+    job, _ = scheduler.submit("movie")
+    writer.started.wait(5)
+
+    wait_for(lambda: other.requeue_expired() == [job.id])
+    requeued_at = time.time()
+    assert writer.lost.is_set()
+    assert writer.writes and max(writer.writes) < requeued_at - LEASE / 4
+    scheduler.shutdown(1)
+
+
+def test_a_job_requeued_elsewhere_is_cancelled_at_the_next_heartbeat(store_path):
+    writer = GuardedWriter()
+    scheduler = jobs.JobScheduler(writer, max_workers=1, store_path=store_path, lease_timeout=LEASE)
+    job, _ = scheduler.submit("movie")
+    writer.started.wait(5)
+
+    store = jobs.JobStore(store_path)
+    store.requeue([(job.id, store.get(job.id).owner)])
+    assert store.claim("elsewhere").id == job.id
+    assert writer.lost.wait(LEASE)
+    # The new owner's lease is left alone
+    assert store.get(job.id).owner == "elsewhere"
+    assert scheduler.shutdown(1) == 0
+
+
+def test_shutdown_cancels_running_jobs_before_requeueing_them(store_path):
+    writer = GuardedWriter()
+    scheduler = jobs.JobScheduler(writer, max_workers=1, store_path=store_path, lease_timeout=LEASE)
+    job, _ = scheduler.submit("movie")
+    writer.started.wait(5)
+
+    assert scheduler.shutdown(0.1) == 1
+    stopped = time.time()
+    requeued = scheduler.get(job.id)
+    assert (requeued.status, requeued.owner) == (jobs.QUEUED, None)
+    assert writer.lost.wait(1)
+    assert max(writer.writes) < stopped
+
+    # Another process picks it up and finishes it
+    successor = jobs.JobScheduler(lambda job: True, max_workers=1, store_path=store_path, lease_timeout=LEASE)
+    wait_for(lambda: successor.get(job.id).status == jobs.COMPLETED)
+    successor.shutdown(1)
+
+
+def test_a_job_that_runs_alone_shares_the_process_with_no_other_job(store_path):
+    active = []
+    overlaps = []
+    lock = threading.Lock()
+
+    def run_job(job):
+        with lock:
+            active.append(job.video_name)
+            overlaps.append(list(active))
+        time.sleep(0.2)
+        with lock:
+            active.remove(job.video_name)
+        return True
+
+    scheduler = jobs.JobScheduler(run_job, max_workers=3, store_path=store_path, lease_timeout=LEASE,
+                                  runs_alone=lambda job: job.video_name == "profiled")
+    submitted = [scheduler.submit(name)[0] for name in ("first", "profiled", "second", "third")]
+    wait_for(lambda: all(scheduler.get(job.id).status == jobs.COMPLETED for job in submitted))
+    scheduler.shutdown(1)
+
+    assert ["profiled"] in overlaps
+    assert not any("profiled" in names and len(names) > 1 for names in overlaps)
+    # The jobs around it still ran side by side
+    assert any(len(names) > 1 for names in overlaps)
+
+
+def test_a_failed_store_write_does_not_stop_the_worker(store_path, monkeypatch):
+    runs = []
+    scheduler = jobs.JobScheduler(lambda job: runs.append(job.video_name) or True, max_workers=1,
+                                  store_path=store_path, lease_timeout=LEASE)
+    failures = {"claim": 1, "finish": 1}
+
+    def failing(name):
+        method = getattr(scheduler.store, name)
+
+        def call(*args):
+            if failures[name]:
+                failures[name] -= 1
+                raise sqlite3.OperationalError("database is locked")
+            return method(*args)
+        return call
+
+    for name in failures:
+        monkeypatch.setattr(scheduler.store, name, failing(name))
+    first, _ = scheduler.submit("first")
+    second, _ = scheduler.submit("second")
+
+    # The first outcome was lost: its lease expires and it runs again
+    wait_for(lambda: all(scheduler.get(job.id).status == jobs.COMPLETED for job in (first, second)))
+    assert sorted(runs) == ["first", "first", "second"]
+    assert all(worker.is_alive() for worker in scheduler.workers)
+    scheduler.shutdown(1)
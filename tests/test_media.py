@@ -0,0 +1,55 @@
+import os
+
+import pytest
+from werkzeug.wsgi import FileWrapper
+
+import api
+
+SIZE = 1000000
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    os.makedirs(tmp_path / "videos")
+    (tmp_path / "videos" / "movie.mp4").write_bytes(bytes(range(256)) * (SIZE // 256) + bytes(SIZE % 256))
+    monkeypatch.setattr(api.app, "static_folder", str(tmp_path))
+    # The file wrapper the development server (app.run) provides
+    client = api.app.test_client()
+    client.environ_base["wsgi.file_wrapper"] = FileWrapper
+    return client
+
+
+def test_a_range_request_sends_only_the_range(client):
+    response = client.get("/api/Video/starter/movie.mp4", headers={"Range": "bytes=100-199"})
+    assert response.status_code == 206
+    assert response.headers["Content-Range"] == f"bytes 100-199/{SIZE}"
+    assert response.headers["Content-Length"] == "100"
+    assert response.get_data() == bytes(range(100, 200))
+
+
+def test_an_open_ended_range_runs_to_the_end_of_the_file(client):
+    response = client.get("/api/Video/starter/movie.mp4", headers={"Range": f"bytes={SIZE - 10}-"})
+    assert response.status_code == 206
+    assert len(response.get_data()) == 10
+
+
+def test_an_unsatisfiable_range_is_416(client):
+    response = client.get("/api/Video/starter/movie.mp4", headers={"Range": f"bytes={SIZE}-"})
+    assert response.status_code == 416
+    assert response.headers["Content-Range"] == f"bytes */{SIZE}"
+
+
+def test_validators_and_304(client):
+    response = client.get("/api/Video/starter/movie.mp4")
+    assert response.status_code == 200
+    assert len(response.get_data()) == SIZE
+    etag, last_modified = response.headers["ETag"], response.headers["Last-Modified"]
+
+    assert client.get("/api/Video/starter/movie.mp4", headers={"If-None-Match": etag}).status_code == 304
+    assert client.get("/api/Video/starter/movie.mp4",
+                      headers={"If-Modified-Since": last_modified}).status_code == 304
+    assert client.get("/api/Video/starter/movie.mp4", headers={"If-None-Match": '"other"'}).status_code == 200
+
+
+def test_missing_video_is_404(client):
+    assert client.get("/api/Video/starter/missing.mp4").status_code == 404
@@ -0,0 +1,94 @@
+import json
+import os
+import threading
+
+import pytest
+
+from crux_processor import metrics
+
+DEAD_PID = 2 ** 22 + 1  # Above the default pid_max, so no process has it
+
+
+@pytest.fixture
+def registry(tmp_path):
+    return metrics.Registry(str(tmp_path / "metrics"))
+
+
+def sample_lines(text, name):
+    return [line for line in text.splitlines() if line.startswith(name)]
+
+
+def test_histogram_buckets_are_upper_bounds(registry):
+    seconds = registry.histogram("job_seconds", "Job time", ["stage"], buckets=(5, 1, 2))
+    for value in (1, 1.5, 2, 7):
+        seconds.observe(value, stage="decode")
+
+    assert sample_lines(metrics.render(registry.snapshot()), "job_seconds") == [
+        'job_seconds_bucket{stage="decode",le="1.0"} 1',
+        'job_seconds_bucket{stage="decode",le="2.0"} 3',
+        'job_seconds_bucket{stage="decode",le="5.0"} 3',
+        'job_seconds_bucket{stage="decode",le="+Inf"} 4',
+        'job_seconds_sum{stage="decode"} 11.5',
+        'job_seconds_count{stage="decode"} 4',
+    ]
+
+
+def test_labels_are_checked(registry):
+    clips = registry.counter("clips_total", "Clips", ["result"])
+    with pytest.raises(ValueError):
+        clips.inc(stage="decode")
+
+
+def test_merge_sums_snapshots_label_by_label(tmp_path):
+    first, second = metrics.Registry(str(tmp_path)), metrics.Registry(str(tmp_path))
+    for registry, results, latency in ((first, ["text", "text", "no_audio"], 0.5), (second, ["text"], 3)):
+        clips = registry.counter("clips_total", "Clips", ["result"])
+        for result in results:
+            clips.inc(result=result)
+        registry.gauge("subscribers", "Subscribers").set(2)
+        registry.histogram("latency_seconds", "Latency", buckets=(1, 5)).observe(latency)
+
+    merged = metrics.merge([first.snapshot(), second.snapshot()])
+    assert sorted(merged["clips_total"]["values"]) == [[["no_audio"], 1], [["text"], 3]]
+    assert merged["subscribers"]["values"] == [[[], 4]]
+    assert merged["latency_seconds"]["values"] == [[[], ([1, 1], 3.5, 2)]]
+
+
+def test_exited_processes_keep_counters_but_not_gauges(registry):
+    registry.counter("clips_total", "Clips", ["result"]).inc(2, result="text")
+    registry.gauge("subscribers", "Subscribers").set(1)
+    os.makedirs(registry.directory)
+    dead = metrics.Registry(registry.directory)
+    dead.counter("clips_total", "Clips", ["result"]).inc(5, result="text")
+    dead.gauge("subscribers", "Subscribers").set(7)
+    with open(registry.snapshot_path(DEAD_PID), "w") as f:
+        json.dump({"pid": DEAD_PID, "written": 0, "metrics": dead.snapshot()}, f)
+
+    for _ in range(2):  # Retired once, then read from retired.json
+        collected = registry.collect()
+        assert collected["clips_total"]["values"] == [[["text"], 7]]
+        assert collected["subscribers"]["values"] == [[[], 1]]
+    assert not os.path.exists(registry.snapshot_path(DEAD_PID))
+    with open(os.path.join(registry.directory, "retired.json")) as f:
+        assert "subscribers" not in json.load(f)["metrics"]
+
+
+def test_concurrent_snapshot_writes(registry):
+    registry.counter("clips_total", "Clips", ["result"]).inc(result="text")
+    errors = []
+
+    def write():
+        try:
+            for _ in range(100):
+                registry.write_snapshot()
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=write) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    with open(registry.snapshot_path()) as f:
+        assert json.load(f)["metrics"]["clips_total"]["values"] == [[["text"], 1]]
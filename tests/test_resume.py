@@ -0,0 +1,156 @@
+import contextlib
+import json
+import os
+import wave
+
+import numpy as np
+import pytest
+
+from crux_processor import audio_stream, catalog, jobs, speech_backends
+from crux_processor.video_per_second import CLIP_FRAME_RATE, RequestSpeech
+
+NAME = "talk"
+CLIPS = 3
+
+
+class Crash(BaseException):
+    """Stands in for the process dying: not caught by the per-clip error handling."""
+
+
+class CountingStub(speech_backends.StubBackend):
+    def __init__(self, crash_after=None, **settings):
+        super().__init__(**settings)
+        self.calls = 0
+        self.crash_after = crash_after
+
+    def recognize(self, recognizer, audio):
+        if self.crash_after is not None and self.calls >= self.crash_after:
+            raise Crash()
+        self.calls += 1
+        return super().recognize(recognizer, audio)
+
+
+@pytest.fixture
+def media(tmp_path, monkeypatch):
+    """A 25 second audio-only ingest (three clips) in a fresh working directory."""
+    monkeypatch.chdir(tmp_path)
+    os.makedirs(os.path.join("public", "audio"))
+    with wave.open(os.path.join("public", "audio", f"{NAME}.wav"), "wb") as w:
+        w.setnchannels(2)
+        w.setsampwidth(2)
+        w.setframerate(CLIP_FRAME_RATE)
+        noise = np.random.default_rng(0).standard_normal(CLIP_FRAME_RATE * 25) * 3000
+        w.writeframes(np.repeat(noise.astype(np.int16), 2).tobytes())
+    return tmp_path
+
+
+class ExpiringLease(object):
+    """A job lease that is lost after a number of guarded writes."""
+    id = "job-1"
+
+    def __init__(self, writes):
+        self.writes = writes
+        self.guarded = 0
+
+    @contextlib.contextmanager
+    def guard(self):
+        if self.guarded >= self.writes:
+            raise jobs.LeaseLost("requeued")
+        self.guarded += 1
+        yield
+
+
+def make_speech(backend, **options):
+    return RequestSpeech(speech_backend=backend, use_transcript_cache=False, **options)
+
+
+def saved_clips():
+    with open(os.path.join("public", "results-json", f"{NAME}-dialog.json")) as f:
+        return sorted(json.load(f)[0])
+
+
+def journal_path():
+    return os.path.join("asc", NAME, f"{NAME}-journal.jsonl")
+
+
+def journaled_clips():
+    with open(journal_path(), encoding="utf-8") as f:
+        return sum('"clip"' in line for line in f)
+
+
+def test_partial_clip_files_are_not_taken_for_a_finished_extraction(media):
+    # A run that died after writing the first clip, before journaling the extraction
+    os.makedirs(os.path.join("asc", NAME))
+    with wave.open(os.path.join("asc", NAME, f"{NAME}-mini-000.wav"), "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(CLIP_FRAME_RATE)
+        w.writeframes(b"\0\0" * 100)
+
+    backend = CountingStub()
+    assert make_speech(backend).processSpeech(NAME)
+    assert saved_clips() == [f"{NAME}-{ct:03d}" for ct in range(CLIPS)]
+    assert backend.calls == CLIPS
+    assert not os.path.exists(journal_path())
+
+
+def test_resume_reuses_journaled_clips(media, monkeypatch):
+    with pytest.raises(Crash):
+        make_speech(CountingStub(crash_after=1)).processSpeech(NAME)
+    assert os.path.exists(journal_path())
+
+    def no_extraction(*args):
+        raise AssertionError("clips should have been reused")
+
+    monkeypatch.setattr(RequestSpeech, "track_extract_clips", no_extraction)
+    backend = CountingStub()
+    assert make_speech(backend).processSpeech(NAME)
+    assert backend.calls == CLIPS - 1
+    assert saved_clips() == [f"{NAME}-{ct:03d}" for ct in range(CLIPS)]
+
+
+def test_missing_clip_file_is_extracted_again(media):
+    with pytest.raises(Crash):
+        make_speech(CountingStub(crash_after=1)).processSpeech(NAME)
+    os.remove(os.path.join("asc", NAME, f"{NAME}-mini-002.wav"))
+
+    backend = CountingStub()
+    assert make_speech(backend).processSpeech(NAME)
+    assert backend.calls == CLIPS - 1
+    assert saved_clips() == [f"{NAME}-{ct:03d}" for ct in range(CLIPS)]
+
+
+def test_failed_streaming_decode_fails_the_job_and_keeps_the_journal(media, monkeypatch):
+    iter_pcm_clips = audio_stream.iter_pcm_clips
+
+    def broken_decoder(*args, **kwargs):
+        for x, pcm in iter_pcm_clips(*args, **kwargs):
+            if x == 2:
+                raise RuntimeError("ffmpeg died")
+            yield x, pcm
+
+    monkeypatch.setattr(audio_stream, "iter_pcm_clips", broken_decoder)
+    assert not make_speech(CountingStub(), streaming=True).processSpeech(NAME)
+    assert not os.path.exists(os.path.join("public", "results-json", f"{NAME}-dialog.json"))
+    assert os.path.exists(journal_path())
+    journaled = journaled_clips()
+    assert journaled < CLIPS
+
+    monkeypatch.setattr(audio_stream, "iter_pcm_clips", iter_pcm_clips)
+    backend = CountingStub()
+    assert make_speech(backend, streaming=True).processSpeech(NAME)
+    assert backend.calls == CLIPS - journaled
+    assert saved_clips() == [f"{NAME}-{ct:03d}" for ct in range(CLIPS)]
+
+
+def test_a_job_that_lost_its_lease_stops_writing(media):
+    lease = ExpiringLease(writes=4)  # Catalog RUNNING, journal header, extraction record, first clip
+    backend = CountingStub()
+    with pytest.raises(jobs.LeaseLost):
+        make_speech(backend, job_lease=lease).processSpeech(NAME)
+
+    assert journaled_clips() == 1
+    assert not os.path.exists(os.path.join("public", "results-json", f"{NAME}-dialog.json"))
+    # The new owner records the outcome; the old thread leaves the catalog at running
+    processing = catalog.Catalog().get_video(NAME)["processing"]
+    assert (processing["status"], processing["job_id"]) == (catalog.RUNNING, "job-1")
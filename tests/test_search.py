@@ -0,0 +1,160 @@
+import json
+import os
+import random
+import threading
+
+import pytest
+
+from crux_processor import phrase_matcher, transcript_store
+from crux_processor.video_per_second import RequestUiSearch
+
+WORDS = (
+    "the quick brown fox jumps over lazy dog river mountain signal engine data music voice market weather "
+    "garden station window summer orange planet coffee letter morning state-of-the-art don't café 1984 x"
+).split()
+
+QUERIES = [
+    "fox", "brown fox", "quick, lazy", "o", "ing", "engine data", "zebra", "   ", "dog,", "t d", "-", "FOX",
+    "river mountain, coffee", "e", "no audio", "error", "state-of", "don't", "caf", "84", "x", "fox, fox",
+    "n d", ", ,", "the quick brown fox jumps",
+]
+
+
+def legacy_ui_search(ui_search_input, video_set, clip_duration=10):
+    """The original uiSearch: json.load every dialog file and substring-scan every clip per term."""
+    second_sets = {}
+    word_list = [word.strip().lower() for word in ui_search_input.split(",") if word.strip()]
+    dialog_data = {}
+    for video_name in video_set.values():
+        path = os.path.join("public", "results-json", f"{video_name}-dialog.json")
+        if os.path.isfile(path):
+            with open(path, encoding="utf-8") as f:
+                dialog_data.update(json.load(f)[0])
+    for video_clip, video_clip_text in dialog_data.items():
+        if video_clip_text != "NO AUDIO":
+            video_clip_text = video_clip_text.lower()
+            for phrase in word_list:
+                if phrase in video_clip_text:
+                    w1, w2 = video_clip.split("-")
+                    second_sets[f"{w1}-{int(w2) * clip_duration}"] = f"{video_clip_text.replace('-', ' ')}-word"
+    return second_sets
+
+
+def write_corpus(videos=8, clips=30, seed=0, separator=""):
+    rng = random.Random(seed)
+    os.makedirs(transcript_store.RESULTS_DIR, exist_ok=True)
+    video_set = {}
+    for v in range(videos):
+        name = f"video{separator}{v:03d}"
+        texts = {}
+        for c in range(clips):
+            roll = rng.random()
+            if roll < 0.1:
+                text = "NO AUDIO"
+            elif roll < 0.15:
+                text = "TRANSCRIPTION ERROR: synthetic"
+            else:
+                words = rng.choices(WORDS, k=rng.randint(1, 12))
+                text = " ".join(word.upper() if rng.random() < 0.1 else word for word in words)
+            texts[f"{name}-{c:03d}"] = text
+        with open(transcript_store.dialog_json_path(name), "w", encoding="utf-8") as f:
+            json.dump([texts], f, indent=4, sort_keys=True)
+        video_set[str(v)] = name
+    return video_set
+
+
+@pytest.fixture
+def corpus(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return write_corpus()
+
+
+@pytest.mark.parametrize("query", QUERIES)
+def test_index_matches_legacy_scan(corpus, query):
+    searcher = RequestUiSearch()
+    assert searcher.uiSearch(query, corpus) == legacy_ui_search(query, corpus)
+
+
+@pytest.mark.parametrize("query", QUERIES)
+def test_index_matches_store_scan(tmp_path, monkeypatch, query):
+    monkeypatch.chdir(tmp_path)
+    video_set = write_corpus(separator="-")  # Hyphenated names, which the legacy scan could not parse
+    searcher = RequestUiSearch()
+    assert searcher.index_search(query, video_set) == searcher.scan_search(query, video_set)
+
+
+def test_index_follows_rewritten_transcripts(corpus):
+    searcher = RequestUiSearch()
+    assert searcher.uiSearch("zebra", corpus) == {}
+
+    transcript_store.save_video_transcript(corpus["0"], {f"{corpus['0']}-000": "a brand new zebra sentence"}, 10)
+    assert searcher.uiSearch("zebra", corpus) == {"video000-0": "a brand new zebra sentence-word"}
+    assert searcher.index_search("fox, zebra", corpus) == searcher.scan_search("fox, zebra", corpus)
+
+
+def test_corpus_search_matches_scan(corpus):
+    searcher = RequestUiSearch()
+    indexed = searcher.corpus_search("fox, river mountain", page_size=500)
+    searcher.search_index_path = None
+    assert searcher.corpus_search("fox, river mountain", page_size=500) == indexed
+    assert indexed["total"] == len(searcher.scan_search("fox, river mountain", corpus))
+
+
+@pytest.mark.parametrize("count", [1, 10, 300])
+def test_phrase_matcher_matches_per_phrase_loop(count):
+    rng = random.Random(count)
+    texts = [" ".join(rng.choices(WORDS, k=rng.randint(0, 30))) for _ in range(200)]
+    terms = [rng.choice(WORDS)[:rng.randint(1, 6)] for _ in range(count)]
+    terms += [f"{rng.choice(WORDS)} {rng.choice(WORDS)}" for _ in range(count // 10)]
+    expected = [[term for term in dict.fromkeys(terms) if term in text] for text in texts]
+
+    for direct_max_phrases in (0, phrase_matcher.DIRECT_MAX_PHRASES):
+        matcher = phrase_matcher.PhraseMatcher(terms, direct_max_phrases)
+        assert [matcher.find(text) for text in texts] == expected
+
+
+def test_search_checks_the_store_only_after_a_save(corpus, monkeypatch):
+    searcher = RequestUiSearch()
+    expected = searcher.uiSearch("fox", corpus)
+    checked = []
+    ensure = transcript_store.ensure_video_transcript
+    monkeypatch.setattr(transcript_store, "ensure_video_transcript",
+                        lambda video_name, clip_duration: checked.append(video_name) or ensure(video_name, clip_duration))
+
+    assert searcher.uiSearch("fox", corpus) == expected
+    assert checked == []
+
+    transcript_store.save_video_transcript(corpus["3"], {f"{corpus['3']}-000": "no match here"}, 10)
+    assert "video003-0" not in searcher.uiSearch("fox", corpus)
+    assert sorted(checked) == sorted(corpus.values())
+
+    os.remove(transcript_store.store_path(corpus["5"]))
+    os.remove(transcript_store.dialog_json_path(corpus["5"]))
+    transcript_store.bump_generation()
+    assert not any(key.startswith("video005-") for key in searcher.uiSearch("fox", corpus))
+
+
+def test_concurrent_transcript_writers_install_whole_files(tmp_path):
+    path = str(tmp_path / "movie.transcript")
+    # Different sizes, so interleaved writes would not line up
+    versions = [[("movie", c, c * 10, c * 10 + 10, f"writer {w} " * (w + 1) * 20) for c in range(50 * (w + 1))]
+                for w in range(4)]
+    expected = [{f"movie-{c:03d}": record[4] for c, record in enumerate(records)} for records in versions]
+    errors = []
+
+    def write(records):
+        try:
+            for _ in range(30):
+                transcript_store.write_transcript_file(path, records)
+                with transcript_store.TranscriptFile(path) as transcript:
+                    assert transcript.to_dialog() in expected
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=write, args=(records,)) for records in versions]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert os.listdir(tmp_path) == ["movie.transcript"]
@@ -0,0 +1,91 @@
+import gzip
+import os
+
+import pytest
+
+import api
+from crux_processor import static_assets
+
+
+@pytest.fixture
+def public(tmp_path, monkeypatch):
+    for directory, name in (("js", "app.js"), ("results-profiles/movie-1", "profile.json")):
+        os.makedirs(tmp_path / directory, exist_ok=True)
+        (tmp_path / directory / name).write_text("{}" + " " * 4096)
+    monkeypatch.setattr(api.app, "static_folder", str(tmp_path))
+    monkeypatch.setattr(api, "asset_versions", static_assets.AssetVersions(str(tmp_path)))
+    return tmp_path
+
+
+def write_br(path):
+    # Stands in for a brotli variant; the server picks variants by name and age, not content
+    with open(f"{path}.br", "wb") as f:
+        f.write(b"brotli bytes")
+
+
+def test_profiles_are_not_precompressed(public):
+    static_assets.build(str(public))
+    assert os.path.isfile(public / "js" / "app.js.gz")
+    assert not any(name != "profile.json" for name in os.listdir(public / "results-profiles" / "movie-1"))
+
+
+@pytest.mark.parametrize("path", ["results-profiles/movie-1/profile.json", "js/../results-profiles/movie-1/profile.json",
+                                  "./results-profiles/movie-1/profile.json"])
+def test_profiles_are_not_served_as_static_files(public, path):
+    client = api.app.test_client()
+    assert client.get("/public/js/app.js").status_code == 200
+    assert client.get(f"/public/{path}").status_code == 404
+
+
+@pytest.mark.parametrize("accept, encoding", [("gzip", "gzip"), ("br, gzip", "br"), ("br;q=0, gzip", "gzip"),
+                                              ("", None), ("identity", None)])
+def test_the_preferred_accepted_variant_is_sent(public, accept, encoding):
+    static_assets.build(str(public))
+    write_br(public / "js" / "app.js")
+    response = api.app.test_client().get("/public/js/app.js", headers={"Accept-Encoding": accept})
+
+    assert response.status_code == 200
+    assert response.content_encoding == encoding
+    assert "Accept-Encoding" in response.vary
+    assert response.mimetype in ("text/javascript", "application/javascript")
+    body = response.get_data()
+    if encoding == "gzip":
+        body = gzip.decompress(body)
+    if encoding == "br":
+        assert body == b"brotli bytes"
+    else:
+        assert body == (public / "js" / "app.js").read_bytes()
+
+
+def test_a_variant_older_than_its_file_is_not_sent(public):
+    static_assets.build(str(public))
+    stat = os.stat(public / "js" / "app.js.gz")
+    os.utime(public / "js" / "app.js", ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    response = api.app.test_client().get("/public/js/app.js", headers={"Accept-Encoding": "gzip"})
+    assert response.content_encoding is None
+    assert response.get_data() == (public / "js" / "app.js").read_bytes()
+
+
+def test_versioned_assets_are_immutable_and_others_revalidate(public):
+    client = api.app.test_client()
+    version = api.asset_versions.version("js/app.js")
+
+    versioned = client.get(f"/public/js/app.js?v={version}")
+    assert versioned.cache_control.max_age == static_assets.VERSIONED_MAX_AGE
+    assert versioned.cache_control.immutable
+
+    for url in ("/public/js/app.js", "/public/js/app.js?v=stale"):
+        response = client.get(url)
+        assert response.cache_control.max_age == static_assets.STATIC_MAX_AGE
+        assert not response.cache_control.immutable
+        assert response.headers["ETag"] and response.headers["Last-Modified"]
+        assert client.get(url, headers={"If-None-Match": response.headers["ETag"]}).status_code == 304
+
+
+def test_html_pages_reference_versioned_assets(public):
+    (public / "index.html").write_text('<script src="js/app.js"></script><img src="img/missing.png">')
+    response = api.app.test_client().get("/public/index.html")
+    version = api.asset_versions.version("js/app.js")
+
+    assert response.get_data(as_text=True) == f'<script src="js/app.js?v={version}"></script><img src="img/missing.png">'
+    assert response.cache_control.no_cache
@@ -0,0 +1,61 @@
+import os
+
+import pytest
+from PIL import Image
+
+from crux_processor import thumbnails
+
+
+def write_source(path, size, mode="RGB", color=(200, 40, 40)):
+    Image.new(mode, size, color).save(path, "WEBP", quality=90)
+
+
+@pytest.mark.parametrize("source_size, expected", [((1920, 1080), (960, 540)), ((1280, 720), (1280, 720))])
+def test_large_webp_sources_are_reduced_before_resizing(tmp_path, source_size, expected):
+    write_source(tmp_path / "thumb.webp", source_size)
+    with thumbnails.load_rgb(str(tmp_path / "thumb.webp"), thumbnails.POSTER_SIZE) as img:
+        assert img.mode == "RGB"
+        assert img.size == expected
+
+
+def test_transparent_sources_are_flattened_on_white(tmp_path):
+    write_source(tmp_path / "thumb.webp", (400, 300), mode="RGBA", color=(0, 0, 0, 0))
+    with thumbnails.load_rgb(str(tmp_path / "thumb.webp"), (200, 150)) as img:
+        assert img.getpixel((10, 10)) == (255, 255, 255)
+
+
+def test_every_size_is_written(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs(thumbnails.IMG_DIR)
+    write_source("thumb.webp", (1920, 1080))
+    written = thumbnails.make_thumbnails("thumb.webp", "movie")
+
+    with Image.open(written[0]) as poster:
+        assert (poster.format, poster.size) == ("PNG", thumbnails.POSTER_SIZE)
+    for size_name, size in thumbnails.THUMBNAIL_SIZES.items():
+        path = thumbnails.thumbnail_path("movie", size_name)
+        assert path in written
+        with Image.open(path) as img:
+            assert (img.format, img.size) == ("WEBP", size)
+            red, green, blue = img.convert("RGB").getpixel((size[0] // 2, size[1] // 2))
+            assert red > 150 and green < 90 and blue < 90
+
+
+def test_a_wide_short_size_does_not_lower_the_decode_size(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs(thumbnails.IMG_DIR)
+    # Horizontal stripes 12 px apart: they survive a resize to the poster's 449 rows, not a detour through 100
+    stripes = Image.new("L", (1920, 1080))
+    stripes.putdata([255 if (y // 6) % 2 else 0 for y in range(1080) for _ in range(1920)])
+    Image.merge("RGB", [stripes] * 3).save("thumb.webp", "WEBP", lossless=True)
+    load_rgb = thumbnails.load_rgb
+    decoded = []
+    monkeypatch.setattr(thumbnails, "load_rgb", lambda path, size: decoded.append(size) or load_rgb(path, size))
+
+    written = thumbnails.make_thumbnails("thumb.webp", "movie", {"banner": (1000, 100)})
+    assert decoded == [(1000, thumbnails.POSTER_SIZE[1])]
+    with Image.open(written[0]) as poster:
+        column = [poster.getpixel((400, y))[0] for y in range(100, 350)]
+    assert max(column) - min(column) > 150
+    with Image.open(thumbnails.thumbnail_path("movie", "banner")) as banner:
+        assert banner.size == (1000, 100)
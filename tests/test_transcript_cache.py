@@ -0,0 +1,69 @@
+import wave
+
+import numpy as np
+
+from crux_processor import speech_backends
+from crux_processor.transcript_cache import TranscriptCache
+from crux_processor.video_per_second import CLIP_FRAME_RATE, RequestSpeech
+
+
+class CountingStub(speech_backends.StubBackend):
+    def __init__(self, **settings):
+        super().__init__(**settings)
+        self.calls = 0
+
+    def recognize(self, recognizer, audio):
+        self.calls += 1
+        return super().recognize(recognizer, audio)
+
+
+def write_track(path, clips):
+    """Writes 10 second stereo clips of noise at the decode rate, so decoding is lossless."""
+    with wave.open(str(path), "wb") as w:
+        w.setnchannels(2)
+        w.setsampwidth(2)
+        w.setframerate(CLIP_FRAME_RATE)
+        for seed, amplitude in clips:
+            noise = np.random.default_rng(seed).standard_normal(CLIP_FRAME_RATE * 10) * amplitude
+            w.writeframes(np.repeat(noise.astype(np.int16), 2).tobytes())
+
+
+def test_eviction_keeps_the_most_recently_used(tmp_path):
+    cache = TranscriptCache(str(tmp_path / "cache.sqlite3"), max_entries=20)
+    for n in range(30):
+        cache.put(f"key-{n}", f"text {n}")
+        assert cache.entries <= 20
+    cache.put("key-29", "replaced")
+
+    assert cache.stats()["entries"] == cache.entries
+    assert cache.get("key-29") == (True, "replaced")
+    assert cache.get("key-0") == (False, None)
+    assert cache.evictions == 30 - cache.entries
+    cache.close()
+
+
+def test_entry_count_survives_reopening(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = TranscriptCache(path, max_entries=20)
+    for n in range(5):
+        cache.put(f"key-{n}", None)
+    cache.close()
+    assert TranscriptCache(path, max_entries=20).entries == 5
+
+
+def test_repeated_clip_hits_across_dsp_chunks(tmp_path):
+    # The intro repeats in a chunk with a much louder clip, so the track engine gives it another gain
+    track = tmp_path / "track.wav"
+    write_track(track, [(1, 3000), (2, 3000), (3, 12000), (1, 3000), (4, 3000)])
+    backend = CountingStub()
+    speech = RequestSpeech(speech_backend=backend, streaming=True, dsp_engine="track", dsp_chunk_seconds=20,
+                           vad_enabled=False, transcript_cache_path=str(tmp_path / "cache.sqlite3"))
+
+    sources = list(speech.stream_clip_sources(str(track), str(tmp_path), "movie"))
+    assert len(sources) == 5
+    assert sources[0][1].getvalue() != sources[3][1].getvalue()
+
+    result = speech.transcribe_clips("movie", sources)
+    assert backend.calls == 4
+    assert result["movie-003"] == result["movie-000"]
+    assert len(set(result.values())) == 4
@@ -0,0 +1,193 @@
+import io
+import threading
+import time
+
+import numpy as np
+import speech_recognition as sr
+
+from crux_processor import speech_backends
+from crux_processor.video_per_second import RequestSpeech, write_wav
+
+CLIPS = 12
+
+
+class CountingBackend(speech_backends.StubBackend):
+    """The stub engine, recording every request and the most requests ever in flight at once."""
+
+    def __init__(self, fail_attempts=0, raise_error=None, delays=None, **settings):
+        super().__init__(**settings)
+        self.fail_attempts = fail_attempts  # Leading attempts per clip answered with sr.RequestError
+        self.raise_error = raise_error
+        self.delays = delays or {}
+        self.lock = threading.Lock()
+        self.calls = {}
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def recognize(self, recognizer, audio):
+        key = audio.frame_data
+        with self.lock:
+            self.calls[key] = self.calls.get(key, 0) + 1
+            attempt = self.calls[key]
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            time.sleep(self.delays.get(len(self.calls), 0.02))
+            if self.raise_error:
+                raise self.raise_error
+            if attempt <= self.fail_attempts:
+                raise sr.RequestError("flaky engine")
+            return super().recognize(recognizer, audio)
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+
+class ListStream(object):
+    def __init__(self):
+        self.messages = []
+
+    def send_message(self, message):
+        self.messages.append(message)
+
+
+def make_speech(backend, **options):
+    options = dict(speech_backend=backend, vad_enabled=False, use_transcript_cache=False, retry_backoff=0, **options)
+    return RequestSpeech(**options)
+
+
+def clip_sources(make_clip, count=CLIPS, pulled=None):
+    for ct in range(count):
+        if pulled is not None:
+            pulled.append(ct)
+        yield ct, make_clip(ct), f"clip-{ct}"
+
+
+def test_concurrent_results_match_serial_order(make_clip):
+    serial = make_speech(CountingBackend()).transcribe_clips("movie", clip_sources(make_clip))
+    # Later clips answer first, so completion order is the reverse of submission order
+    backend = CountingBackend(delays={n: 0.01 * (CLIPS - n) for n in range(CLIPS + 1)})
+    concurrent = make_speech(backend, transcription_concurrency=4).transcribe_clips("movie", clip_sources(make_clip))
+
+    assert list(serial) == [f"movie-{ct:03d}" for ct in range(CLIPS)]
+    assert list(concurrent) == list(serial)
+    assert concurrent == serial
+    assert all(text not in ("NO AUDIO", "TRANSCRIPTION ERROR") for text in serial.values())
+
+
+def test_completed_clips_are_merged_in_order(make_clip):
+    completed = {"movie-000": "from the journal", "movie-002": "NO AUDIO"}
+    sources = (source for source in clip_sources(make_clip, 4) if f"movie-{source[0]:03d}" not in completed)
+    backend = CountingBackend()
+    result = make_speech(backend, transcription_concurrency=2).transcribe_clips("movie", sources, completed=completed)
+
+    assert list(result) == ["movie-000", "movie-001", "movie-002", "movie-003"]
+    assert result["movie-000"] == "from the journal"
+    assert result["movie-002"] == "NO AUDIO"
+    assert len(backend.calls) == 2
+
+
+def test_requests_in_flight_are_bounded(make_clip):
+    backend = CountingBackend()
+    pulled, recorded, ahead = [], [], []
+
+    def progress(stage, done, total):
+        recorded.append(done)
+        ahead.append(len(pulled) - len(recorded))
+
+    speech = make_speech(backend, transcription_concurrency=3, progress_callback=progress)
+    speech.transcribe_clips("movie", clip_sources(make_clip, pulled=pulled))
+
+    assert backend.max_in_flight == 3
+    assert len(recorded) == CLIPS
+    # Sources are pulled as slots free up, not drained into the pool up front
+    assert max(ahead) <= 3
+
+
+def test_serial_mode_sends_one_request_at_a_time(make_clip):
+    backend = CountingBackend()
+    make_speech(backend).transcribe_clips("movie", clip_sources(make_clip, 4))
+    assert backend.max_in_flight == 1
+
+
+def test_request_errors_are_retried_until_they_succeed(make_clip):
+    backend = CountingBackend(fail_attempts=2)
+    speech = make_speech(backend, transcription_concurrency=4, request_retries=2)
+    result = speech.transcribe_clips("movie", clip_sources(make_clip))
+
+    assert "TRANSCRIPTION ERROR" not in result.values()
+    assert sorted(backend.calls.values()) == [3] * CLIPS
+    assert speech.job_metrics()["clips"] == {"text": CLIPS, "no_audio": 0, "error": 0}
+
+
+def test_stub_injected_errors_recover_with_retries(make_clip):
+    expected = make_speech("stub").transcribe_clips("movie", clip_sources(make_clip))
+    speech = make_speech("stub", backend_settings={"error_rate": 0.3, "seed": 1}, request_retries=5)
+    assert speech.transcribe_clips("movie", clip_sources(make_clip)) == expected
+
+    speech = make_speech("stub", backend_settings={"error_rate": 0.3, "seed": 1})
+    assert "TRANSCRIPTION ERROR" in speech.transcribe_clips("movie", clip_sources(make_clip)).values()
+
+
+def test_exhausted_retries_mark_the_clip_as_an_error(make_clip):
+    backend = CountingBackend(fail_attempts=10)
+    stream = ListStream()
+    speech = make_speech(backend, transcription_concurrency=2, request_retries=2)
+    result = speech.transcribe_clips("movie", clip_sources(make_clip, 4), stream)
+
+    assert list(result.values()) == ["TRANSCRIPTION ERROR"] * 4
+    assert sorted(backend.calls.values()) == [3] * 4
+    assert sum('"type": "error"' in message for message in stream.messages) == 4
+
+
+def test_other_errors_are_not_retried(make_clip):
+    backend = CountingBackend(raise_error=ValueError("broken clip"))
+    result = make_speech(backend, request_retries=3).transcribe_clips("movie", clip_sources(make_clip, 3))
+
+    assert list(result.values()) == ["TRANSCRIPTION ERROR"] * 3
+    assert sorted(backend.calls.values()) == [1] * 3
+
+
+def test_silent_clips_are_no_audio(make_clip):
+    sources = [(0, make_clip(0), "speech"), (1, make_clip(1, amplitude=0), "silence")]
+    result = make_speech(CountingBackend(), transcription_concurrency=2).transcribe_clips("movie", sources)
+    assert result["movie-001"] == "NO AUDIO"
+    assert result["movie-000"] not in ("NO AUDIO", "TRANSCRIPTION ERROR")
+
+
+def voiced_clip(seconds=3.0, frame_rate=16000):
+    """A speech-like WAV: a 140 Hz harmonic voice with formants near 700 and 1800 Hz, in 3 Hz syllables."""
+    t = np.arange(int(frame_rate * seconds)) / frame_rate
+    harmonics = 140 * np.arange(1, 25)
+    amplitudes = np.exp(-((harmonics - 700) / 300) ** 2) + 0.5 * np.exp(-((harmonics - 1800) / 400) ** 2) + 0.05
+    voice = (amplitudes[:, None] * np.sin(2 * np.pi * harmonics[:, None] * t)).sum(axis=0)
+    syllables = np.clip(np.sin(2 * np.pi * 3 * t), 0, None)
+    buffer = io.BytesIO()
+    write_wav(buffer, (voice / np.abs(voice).max() * syllables * 8000).astype(np.int16), frame_rate)
+    buffer.seek(0)
+    return buffer
+
+
+def test_voice_activity_detection_is_opt_in(make_clip):
+    assert RequestSpeech(speech_backend="stub").vad is None
+
+    backend = CountingBackend()
+    speech = RequestSpeech(speech_backend=backend, vad_enabled=True, use_transcript_cache=False)
+    result = speech.transcribe_clips("movie", [(0, make_clip(0, amplitude=0), "silence")])
+    assert result == {"movie-000": "NO AUDIO"}
+    assert backend.calls == {}
+
+
+def test_voice_activity_detection_skips_only_non_speech(make_clip):
+    backend = CountingBackend()
+    speech = RequestSpeech(speech_backend=backend, vad_enabled=True, use_transcript_cache=False, retry_backoff=0)
+    result = speech.transcribe_clips("movie", [
+        (0, make_clip(0, seconds=3.0), "noise"),
+        (1, voiced_clip(), "voiced"),
+        (2, make_clip(1, seconds=3.0, amplitude=0), "silence"),
+    ])
+
+    assert result["movie-000"] == "NO AUDIO"
+    assert result["movie-002"] == "NO AUDIO"
+    assert result["movie-001"] not in ("NO AUDIO", "TRANSCRIPTION ERROR")
+    assert list(backend.calls.values()) == [1]